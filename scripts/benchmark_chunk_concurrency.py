@@ -0,0 +1,73 @@
+'''
+Benchmark - get_overlay_gdf_generator serial chunk overlay vs thread pool chunk overlay (settings.LAYER_CHUNK_CONCURRENCY),
+for a layer already loaded in SQS.
+
+    python scripts/benchmark_chunk_concurrency.py --name CPT_DBCA_LEGISLATED_TENURE
+    python scripts/benchmark_chunk_concurrency.py --name CPT_DBCA_LEGISLATED_TENURE --how Outside --concurrency 2 4 8
+'''
+import os
+import sys
+import django
+proj_path=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(proj_path)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sqs.settings")
+django.setup()
+
+import time
+from django.conf import settings
+
+from sqs.utils.geoquery_utils import DisturbanceLayerQueryHelper
+from sqs.utils.loader_utils import DbLayerProvider
+from sqs.utils.layer_cache import layer_cache
+from sqs.utils.das_tests.equals import checkbox_equals
+
+
+def overlay(layer_name, how, concurrency, max_in_flight):
+    settings.LAYER_CHUNK_CONCURRENCY = concurrency
+    settings.LAYER_CHUNK_MAX_IN_FLIGHT = max_in_flight
+    layer_cache.clear()
+
+    helper = DisturbanceLayerQueryHelper([], checkbox_equals.GEOJSON, {'id': 0})
+    layer_provider = DbLayerProvider(layer_name, url='')
+    layer_info = layer_provider.get_layer_info()
+    shapefile_gdf = helper.get_shapefile_gdf(dict(buffer=None), layer_info['layer_crs'])
+    column_name = layer_provider.get_layer_obj().attributes[0]
+
+    start = time.time()
+    layer_info, layer_gdf_gen = layer_provider.get_layer_generator(query_gdf=helper.get_query_gdf(shapefile_gdf, how))
+    overlay_gdf = helper.get_overlay_gdf_generator(
+        layer_gdf_gen, shapefile_gdf, how, column_name, layer_name=layer_name, layer_provider=layer_provider
+    )
+    return overlay_gdf, time.time() - start, layer_provider.chunk_stats['chunks_read']
+
+
+def run(layer_name, how='Overlapping', concurrency=(2, 4), max_in_flight=4, repeat=3):
+    print(f'Layer: {layer_name}, how: {how}\n')
+    print(f'{"concurrency":>12} {"chunks":>7} {"time (s)":>9} {"speedup":>8} {"identical":>10}')
+
+    serial_gdf = None
+    serial_time = None
+    for n in [1] + list(concurrency):
+        times = []
+        for _ in range(repeat):
+            overlay_gdf, elapsed, chunks = overlay(layer_name, how, n, max_in_flight)
+            times.append(elapsed)
+        elapsed = min(times)
+
+        if serial_gdf is None:
+            serial_gdf, serial_time = overlay_gdf, elapsed
+        columns = list(serial_gdf.columns.drop('geometry'))
+        identical = serial_gdf[columns].equals(overlay_gdf[columns])
+        print(f'{n:>12} {chunks:>7} {elapsed:>9.3f} {serial_time/max(elapsed, 1e-9):>7.1f}x {str(identical):>10}')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark serial vs thread pool chunk overlay')
+    parser.add_argument('--name', type=str, required=True, help='Layer name')
+    parser.add_argument('--how', type=str, default='Overlapping', choices=['Overlapping', 'Outside', 'Inside'])
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[2, 4])
+    parser.add_argument('--max-in-flight', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.name, args.how, args.concurrency, args.max_in_flight, args.repeat)
@@ -0,0 +1,97 @@
+'''
+Benchmark - DefaultOperator vectorised comparison operators vs the previous row by row (Python loop) evaluation,
+on a synthetic overlay result.
+
+    python scripts/benchmark_default_operator.py
+    python scripts/benchmark_default_operator.py --rows 1000000 --repeat 5
+'''
+import os
+import sys
+import django
+proj_path=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(proj_path)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sqs.settings")
+django.setup()
+
+import time
+import fnmatch
+import numpy as np
+import pandas as pd
+
+from sqs.utils.helper import DefaultOperator
+
+REGIONS = ['Kimberley', 'Pilbara', 'Midwest', 'Goldfields', 'Wheatbelt', 'Swan', 'South West', 'Warren', 'South Coast', None]
+
+OPERATORS = [
+    ('GreaterThan', '500', 'area'),
+    ('LessThan', '500', 'area'),
+    ('Equals', '42', 'area'),
+    ('Equals', 'swan', 'region'),
+    ('Contains', 'west', 'region'),
+    ('Contains', '!west', 'region'),
+    ('Like', 's*', 'region'),
+    ('OR', 'kimberley|pilbara', 'region'),
+    ('OR', '!kimberley|pilbara', 'region'),
+]
+
+
+def loop_row_filter(overlay_result, operator, value):
+    ''' previous row by row evaluation (reference) '''
+    not_difference = value.startswith('!')
+    value = value.strip('!')
+    if operator == 'GreaterThan':
+        return [idx for idx, x in enumerate(overlay_result) if x > float(value)]
+    elif operator == 'LessThan':
+        return [idx for idx, x in enumerate(overlay_result) if x < float(value)]
+    elif operator == 'Equals':
+        try:
+            value_num = float(value)
+        except ValueError:
+            return [idx for idx, x in enumerate(overlay_result) if str(x).lower().strip()==value.lower().strip()]
+        return [idx for idx, x in enumerate(overlay_result) if float(x) == value_num]
+    elif operator in ('Contains', 'Like'):
+        pattern = '*' + value.lower().strip().strip('*') + '*' if operator == 'Contains' else value.lower().strip()
+        return [idx for idx, x in enumerate(overlay_result) if fnmatch.fnmatch(str(x).lower(), pattern) != not_difference]
+    elif operator == 'OR':
+        values_list = {str(x).lower().strip() for x in value.split('|')}
+        return [idx for idx, x in enumerate(overlay_result) if (str(x).lower() in values_list) != not_difference]
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        times.append(time.time() - start)
+    return result, min(times)
+
+
+def run(rows=100000, repeat=3, categorical=False):
+    rng = np.random.default_rng(0)
+    overlay_gdf = pd.DataFrame({
+        'region': pd.Series(rng.choice(np.array(REGIONS, dtype=object), rows), dtype='category' if categorical else object),
+        'area': rng.uniform(0, 1000, rows).round(),
+    })
+
+    print(f'Rows: {rows:,}, categorical region: {categorical}\n')
+    print(f'{"operator":>12} {"value":>20} {"loop (s)":>9} {"vector (s)":>11} {"speedup":>8} {"identical":>10}')
+    for operator, value, column_name in OPERATORS:
+        layer = dict(column_name=column_name, operator=operator, value=value, layer=dict(layer_name='benchmark'))
+        overlay_result = overlay_gdf[column_name].astype(object).where(overlay_gdf[column_name].notna(), None).to_list()
+
+        loop_filter, loop_time = timed(lambda: loop_row_filter(overlay_result, operator, value), repeat)
+        row_filter, vector_time = timed(lambda: DefaultOperator(layer, overlay_gdf, 'checkbox').row_filter, repeat)
+        print(
+            f'{operator:>12} {value:>20} {loop_time:>9.4f} {vector_time:>11.4f} {loop_time/max(vector_time, 1e-9):>7.1f}x '
+            f'{str(loop_filter == row_filter):>10}'
+        )
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark DefaultOperator vectorised vs row by row comparison operators')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--categorical', action='store_true', help='region column as categorical (dictionary-encoded)')
+    args = parser.parse_args()
+    run(args.rows, args.repeat, args.categorical)
@@ -0,0 +1,83 @@
+'''
+Benchmark - overlay intersection (get_overlay_gdf, how='Overlapping') vs geometry tier plus exact refinement,
+on a synthetic high-vertex layer (jagged, coastline-like polygons).
+
+    python scripts/benchmark_geometry_tier.py
+    python scripts/benchmark_geometry_tier.py --features 400 --vertices 20000
+'''
+import os
+import sys
+import django
+proj_path=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(proj_path)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sqs.settings")
+django.setup()
+
+import time
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import Polygon, box
+
+from sqs.utils.geometry_tier import build_geometry_tier, intersecting_rows
+
+CRS = 'epsg:4326'
+
+
+def jagged_polygon(cx, cy, radius, vertices, rng):
+    ''' star-shaped polygon with a noisy (coastline-like) boundary '''
+    angles = np.linspace(0, 2*np.pi, vertices, endpoint=False)
+    radii = radius * (1 + 0.15*rng.standard_normal(vertices).cumsum()/np.sqrt(vertices))
+    radii = np.clip(radii, radius*0.5, radius*1.5)
+    return Polygon(np.column_stack([cx + radii*np.cos(angles), cy + radii*np.sin(angles)]))
+
+
+def layer_gdf(features, vertices, seed=0):
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(features)))
+    geometries = [
+        jagged_polygon(115 + (i % side)*0.5, -35 + (i // side)*0.5, 0.3, vertices, rng) for i in range(features)
+    ]
+    return gpd.GeoDataFrame({'NAME': [f'feature_{i}' for i in range(features)], 'VALUE': np.arange(features)}, geometry=geometries, crs=CRS)
+
+
+def run(features=200, vertices=10000, repeat=3):
+    gdf = layer_gdf(features, vertices)
+    minx, miny, maxx, maxy = gdf.total_bounds
+    proposals = {
+        'small (inside one feature)': box(minx + 0.2, miny + 0.2, minx + 0.25, miny + 0.25),
+        'medium (crosses boundaries)': box(minx, miny, minx + (maxx - minx)/3, miny + (maxy - miny)/3),
+        'large (whole layer)': box(minx - 1, miny - 1, maxx + 1, maxy + 1),
+    }
+
+    start = time.time()
+    tier_gdf = build_geometry_tier(gdf)
+    print(f'Layer: {features} features, {vertices} vertices per feature. Tier built (load time) in {time.time() - start:.2f}s\n')
+
+    print(f'{"proposal":30} {"rows":>6} {"overlay (s)":>12} {"tier (s)":>10} {"speedup":>8} {"identical":>10}')
+    for name, geometry in proposals.items():
+        shapefile_gdf = gpd.GeoDataFrame(geometry=[geometry], crs=CRS)
+
+        start = time.time()
+        for _ in range(repeat):
+            overlay_gdf = gdf.overlay(shapefile_gdf[['geometry']], how='intersection', keep_geom_type=False)
+        time_overlay = (time.time() - start)/repeat
+
+        start = time.time()
+        for _ in range(repeat):
+            tier_res = intersecting_rows(gdf, shapefile_gdf, tier_gdf)
+        time_tier = (time.time() - start)/repeat
+
+        # answers are built from the attribute rows only
+        columns = ['NAME', 'VALUE']
+        identical = overlay_gdf[columns].reset_index(drop=True).equals(tier_res[columns].reset_index(drop=True))
+        print(f'{name:30} {len(tier_res):>6} {time_overlay:>12.3f} {time_tier:>10.3f} {time_overlay/max(time_tier, 1e-9):>7.1f}x {str(identical):>10}')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark overlay intersection vs geometry tier')
+    parser.add_argument('--features', type=int, default=200)
+    parser.add_argument('--vertices', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.features, args.vertices, args.repeat)
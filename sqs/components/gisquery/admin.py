@@ -1,15 +1,15 @@
 from django.contrib import admin
 from django.utils.html import escape, mark_safe
 from django.conf import settings
-from sqs.components.gisquery.models import Layer, LayerRequestLog, Task, earliest_date
+from sqs.components.gisquery.models import Layer, LayerRequestLog, Task, SpatialResultCache, earliest_date
 
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 @admin.register(Layer)
 class LayerAdmin(admin.ModelAdmin):
-    list_display = ["name", "url", "layer_version", "active"] #, 'link_to_geojson']
-    list_filter = ["active"]
+    list_display = ["name", "url", "layer_version", "crs", "canonical_crs", "postgis", "active"] #, 'link_to_geojson']
+    list_filter = ["active", "canonical_crs", "postgis"]
     search_fields = ['name__icontains']
     #readonly_fields = ('geojson_file',)
     #exclude = ['geojson']
@@ -41,6 +41,14 @@ class LayerRequestLogAdmin(admin.ModelAdmin):
     search_fields = ['system', 'app_id', 'when']
 
 
+@admin.register(SpatialResultCache)
+class SpatialResultCacheAdmin(admin.ModelAdmin):
+    list_display = ["layer_name", "layer_version", "hits", "size", "created", "last_used"]
+    list_filter = ["layer_name"]
+    search_fields = ['layer_name', 'key', 'geometry_hash']
+    readonly_fields = ('key', 'geometry_hash', 'layer_name', 'layer_version', 'result', 'size', 'hits', 'created', 'last_used')
+
+
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ['id', 'system', 'app_id', 'request_type', 'script_name', 'task_status', 'priority', 'position', 'link_to_request_log_api', 'created', 'time_queued', 'time_taken']
@@ -14,6 +14,7 @@ from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, BasePermission
 from rest_framework.pagination import PageNumberPagination
 import traceback
+import os
 import json
 from datetime import datetime
 
@@ -201,18 +202,20 @@ class DefaultLayerViewSet(viewsets.ModelViewSet):
             List Layers:
             http://localhost:8002/api/v1/layers/
 
-        Clears layer cache, if exists on SQS
+        Clears the in-process layer cache (sqs.utils.layer_cache) for the layer.
+
+        NOTE: the layer cache is per-process - only the cache of the (gunicorn) worker serving this request is cleared. 
+              The other workers drop their cached entries on first access after the layer version changes (eg. ./manage.py update_layers).
         """
         HelperUtils.log_request(f'{request.user} - {self.__class__.__name__}.{inspect.currentframe().f_code.co_name} - {request.get_full_path()}')
         layer_name = kwargs.get('pk')
 
         layer_provider = DbLayerProvider(layer_name=layer_name, url='')
-        layer_info, layer_gdf = layer_provider.get_from_cache()
-        if layer_info:
-            layer_provider.clear_cache()
-            return  JsonResponse({'message': f'Cache cleared: {layer_name}'})
-
-        return  JsonResponse(data={'error': f'Cache not found: {layer_name}'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = layer_provider.clear_cache()
+        return  JsonResponse({
+            'message': f'Cache cleared: {layer_name} ({entries} entries, worker process {os.getpid()}). '
+                       f'The layer cache is per-process - other workers are not cleared.'
+        })
 
     @action(detail=False, methods=['GET',])
     @basic_exception_handler
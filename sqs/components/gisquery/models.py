@@ -1,7 +1,7 @@
 #from django.db import models
 from django.contrib.gis.db import models
 #from django.contrib.postgres.fields.jsonb import JSONField
-from django.db.models import JSONField, Max
+from django.db.models import JSONField, Max, F, Sum
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.postgres.aggregates.general import ArrayAgg
@@ -12,17 +12,23 @@ import gc
 
 from reversion import revisions
 from reversion.models import Version
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
+from shapely.geometry import box
 import json
+import hashlib
 import os
 from pathlib import Path
+from functools import cached_property
 
 from datetime import datetime, timedelta
 import time
 
 from geojsplit import geojsplit
 from sqs.utils import HelperUtils, DATETIME_FMT
+from sqs.utils.geometry_tier import TIER_DIR
 from sqs.decorators import traceback_exception_handler
 
 
@@ -103,6 +109,10 @@ class GeoJsonFile(models.Model):
     )
     index = models.IntegerField(editable=False, default=0)
     geojson_file= models.FileField(upload_to=geojson_file_path, max_length=512)
+    flatgeobuf_file = models.FileField('FlatGeobuf copy (with spatial index)', upload_to=geojson_file_path, max_length=512, null=True, blank=True)
+    split_manifest = JSONField('Split file extents {split_file: {bbox, feature_count, vertex_count, hull}}', default=dict, blank=True)
+    extent = JSONField('Layer extent [minx, miny, maxx, maxy] (layer CRS)', null=True, blank=True)
+    coverage_hull = models.TextField('Coarse coverage hull - union of the split file convex hulls (WKT, layer CRS)', null=True, blank=True)
 
     class Meta:
         app_label = 'sqs'
@@ -111,11 +121,66 @@ class GeoJsonFile(models.Model):
     def __str__(self):
         return f'File index {self.index} - {self.geojson_file}'
 
+    @property
+    def split_file_paths(self):
+        ''' sorted list of split geojson files. Returns the original (unsplit) file if split files do not exist '''
+        geojson_path = Path(self.geojson_file.path)
+        split_files = [
+            item for item in geojson_path.parent.iterdir()
+            if item.is_file() and item.name != geojson_path.name and item.suffix.lower() == '.geojson'
+        ]
+        if not split_files:
+            # use the original (unsplit) file
+            split_files = [geojson_path]
+
+        return sorted(split_files, key=lambda item: item.name)
+
+    @property
+    def geoparquet_paths(self):
+        ''' returns dict {split_file: geoparquet_path} for the GeoParquet files available on disk '''
+        return {
+            _file.split_file: _file.geoparquet_file.path for _file in self.geoparquet_files.all()
+            if os.path.isfile(_file.geoparquet_file.path)
+        }
+
+    @property
+    def flatgeobuf_path(self):
+        ''' path to the FlatGeobuf copy of the original geojson file. None if it does not exist on disk '''
+        if self.flatgeobuf_file and os.path.isfile(self.flatgeobuf_file.path):
+            return self.flatgeobuf_file.path
+        return None
+
+
+class GeoParquetFile(models.Model):
+    ''' Columnar copy (WKB geometry plus typed attribute columns) of a single GeoJSON split file '''
+    layer = models.ForeignKey(
+        'Layer',
+        related_name='geoparquet_files',
+        on_delete=models.CASCADE
+    )
+    geojson_file = models.ForeignKey(
+        GeoJsonFile,
+        related_name='geoparquet_files',
+        on_delete=models.CASCADE
+    )
+    index = models.IntegerField(editable=False, default=0)
+    split_file = models.CharField('Source GeoJSON split file name', max_length=512)
+    geoparquet_file = models.FileField(upload_to=geojson_file_path, max_length=512)
+
+    class Meta:
+        app_label = 'sqs'
+
+    def __str__(self):
+        return f'File index {self.index} - {self.geoparquet_file}'
+
 class Layer(RevisionedMixin):
 
     name = models.CharField(max_length=128, unique=True)
     url = models.URLField(max_length=1024)
     crs = models.CharField(max_length=24)
+    source_crs = models.CharField('CRS of the layer source (GeoServer)', max_length=24, null=True, blank=True)
+    canonical_crs = models.BooleanField('Reproject layer to settings.CRS at load time', default=False)
+    postgis = models.BooleanField('Store layer in a PostGIS table and run overlays in the database', default=False)
     #geojson = JSONField('Layer GeoJSON')
     #geojson_file= models.FileField(upload_to=geojson_file_path)
     #attributes = models.TextField('Layer Attributes')
@@ -155,6 +220,54 @@ class Layer(RevisionedMixin):
     def attributes(self):
         return [attr_val['attribute'] for attr_val in self.attr_values]
 
+    @classmethod
+    def available_attributes(cls, layer_name, default=None):
+        '''
+        All attribute columns of the layer (from attr_values, not the columns read for a question) - for 'Property Name not 
+        found' error messages. Returns default if the layer does not exist.
+        '''
+        layer = cls.objects.filter(name=layer_name).first()
+        return layer.attributes if layer is not None else default
+
+    @cached_property
+    def categorical_columns(self):
+        '''
+        Low-cardinality string attributes, held as pandas categoricals - dict {attribute: categories}.
+        Derived from attr_values: all values are strings and the number of distinct values is <= settings.LAYER_CATEGORICAL_MAX_VALUES
+        '''
+        max_values = settings.LAYER_CATEGORICAL_MAX_VALUES
+        if not max_values:
+            return {}
+
+        categorical_columns = {}
+        for attr_val in self.attr_values:
+            values = [value for value in attr_val['values'] if value is not None]
+            if 0 < len(values) <= max_values and all(isinstance(value, str) for value in values):
+                categorical_columns[attr_val['attribute']] = values
+        return categorical_columns
+
+    def to_categorical(self, gdf):
+        '''
+        Converts the low-cardinality string columns of gdf to categoricals (in place). Categories are the same for all
+        split files of the layer, so the columns stay categorical when the split file gdfs are concatenated.
+        '''
+        for column, categories in self.categorical_columns.items():
+            if column not in gdf.columns:
+                continue
+
+            series = gdf[column]
+            if isinstance(series.dtype, pd.CategoricalDtype) and list(series.cat.categories) == categories:
+                continue
+
+            categorical = pd.Categorical(series, categories=categories)
+            if categorical.isna().sum() != series.isna().sum():
+                # value not in attr_values - keep the column as is
+                logger.warning(f'Layer {self.name}: values in column {column} not in attr_values. Column not converted to categorical')
+                continue
+
+            gdf[column] = categorical
+        return gdf
+
     @property
     def geojson_file(self):
         ''' returns the first file in the set of files for the given layer '''
@@ -205,7 +318,7 @@ class Layer(RevisionedMixin):
 #        return gdf.set_crs(self.crs, inplace=True)
 
     @traceback_exception_handler
-    def to_gdf_streamed(self, all_features=False):
+    def to_gdf_streamed(self, all_features=False, columns=None):
         start = time.time()
         ''' read gdf from geojson file streamed-by-parts '''
         if not Path(self.geojson_file.path).is_file():
@@ -216,6 +329,8 @@ class Layer(RevisionedMixin):
             features_batch = features.get('features')
             if features_batch:
                 gdf1 = gpd.GeoDataFrame.from_features(features_batch)
+                if columns is not None:
+                    gdf1 = gdf1[self.project_columns(columns) + ['geometry']]
                 gdf = gpd.GeoDataFrame( pd.concat( [gdf, gdf1], ignore_index=True) )
                 HelperUtils.force_gc(gdf1)
                 logger.info(f'{idx} - {self.name}')
@@ -229,26 +344,20 @@ class Layer(RevisionedMixin):
         return gdf
 
     @traceback_exception_handler
-    def to_gdf_split(self, all_features=False):
+    def to_gdf_split(self, all_features=False, columns=None, layer_store=None):
         start = time.time()
         ''' read gdf from existing split geojson files. Read from orig geojson file if split files do not exist '''
         if not Path(self.geojson_file.path).is_file():
             raise Exception(f'File for layer {self.name} Not Found: {self.geojson_file.path}')
 
-        path = '/'.join(self.geojson_file.name.split('/')[:-1])
-        filename = self.geojson_file.name.split('/')[-1]
-        split_files = [name for name in os.listdir(path) if os.path.isfile(path + os.sep + name) and name!=filename]
-        if not split_files:
-            # use the original (unsplit) file
-            split_files = [filename]
-
-        split_files.sort()
+        geojson_file_obj = self.geojson_files.latest('id')
+        geoparquet_paths = geojson_file_obj.geoparquet_paths
         gdf = gpd.GeoDataFrame()
-        for idx, split_file in enumerate(split_files):
-            gdf1 = gpd.read_file(path + os.sep + split_file)
+        for idx, split_path in enumerate(geojson_file_obj.split_file_paths):
+            gdf1 = self.read_split_file(split_path, geoparquet_paths, columns=columns, layer_store=layer_store)
             gdf = gpd.GeoDataFrame( pd.concat( [gdf, gdf1], ignore_index=True) )
             HelperUtils.force_gc(gdf1)
-            logger.info(f'{idx} - {split_file}')
+            logger.info(f'{idx} - {split_path.name}')
             if not all_features:
                 # return the gdf with only the first batch of features (from first split file)
                 gdf.set_crs(self.crs, inplace=True, allow_override=True)
@@ -260,11 +369,20 @@ class Layer(RevisionedMixin):
         return gdf
 
     @traceback_exception_handler
-    def to_gdf_split_generator(self):
+    def to_gdf_split_generator(self, columns=None, query_gdf=None, chunk_stats=None, layer_cache=None, layer_store=None):
         start = time.time()
         '''
         Yield GeoDataFrames from split geojson files one file at a time.
         Falls back to the original geojson file if split files do not exist.
+        Each split file is read from its GeoParquet copy, if one exists.
+
+        columns: list of attribute columns to read (geometry is always read). None reads all columns.
+        query_gdf: query geometry (in the layer CRS). If provided, split files whose extent (from the GeoJsonFile 
+                   split_manifest) cannot intersect query_gdf are skipped. None reads all split files.
+        chunk_stats: dict, updated with the number of split files read and skipped, and the layer_cache hits and misses
+                     dict(chunks_read=0, chunks_skipped=0, cache_hits=0, cache_misses=0)
+        layer_cache: LayerCache. If provided, decoded split files are retrieved from/added to the cache
+        layer_store: MmapLayerStore. If provided, split files are read from (and added to) the store - see read_split_file()
 
         Usage:
             for idx, split_file, gdf in layer.to_gdf_split_generator():
@@ -275,39 +393,117 @@ class Layer(RevisionedMixin):
         if not geojson_path.is_file():
             raise Exception(f'File for layer {self.name} Not Found: {self.geojson_file.path}')
 
-        path = geojson_path.parent
-        filename = geojson_path.name
-        split_files = [
-            item.name for item in path.iterdir()
-            if item.is_file() and item.name != filename and item.suffix.lower() == '.geojson'
-        ]
-        if not split_files:
-            # use the original (unsplit) file
-            split_files = [filename]
-
-        split_files.sort()
-        for idx, split_file in enumerate(split_files):
-            split_path = path / split_file
-            gdf = gpd.read_file(split_path)
-            gdf.set_crs(self.crs, inplace=True, allow_override=True)
+        chunk_stats = chunk_stats if chunk_stats is not None else {}
+        for stat in ['chunks_read', 'chunks_skipped', 'cache_hits', 'cache_misses']:
+            chunk_stats.setdefault(stat, 0)
+
+        geojson_file_obj = self.geojson_files.latest('id')
+        geoparquet_paths = geojson_file_obj.geoparquet_paths
+        split_manifest = geojson_file_obj.split_manifest if query_gdf is not None else {}
+        for idx, split_path in enumerate(geojson_file_obj.split_file_paths):
+            split_file = split_path.name
+            if split_file in split_manifest and not self.chunk_intersects(split_manifest[split_file], query_gdf):
+                chunk_stats['chunks_skipped'] += 1
+                logger.info(f'{idx} - {split_file} skipped, extent does not intersect query geometry')
+                continue
+
+            gdf = self.read_split_file_cached(split_path, geoparquet_paths, columns, layer_cache, chunk_stats, layer_store)
+            chunk_stats['chunks_read'] += 1
             logger.info(f'{idx} - {split_file}')
             yield idx, split_file, gdf
             HelperUtils.force_gc(gdf)
 
+        logger.info(f'{self.name} - split files read: {chunk_stats["chunks_read"]}, skipped: {chunk_stats["chunks_skipped"]}')
         HelperUtils.log_elapsed_time(start, 'to_gdf_split_generator()')
 
+    @staticmethod
+    def chunk_intersects(chunk_manifest, query_gdf):
+        ''' True if the split file extent (bbox) intersects the extent of any query_gdf geometry '''
+        bbox = chunk_manifest.get('bbox')
+        if not bbox:
+            # split file has no geometries
+            return False
+
+        return len(query_gdf.sindex.query(box(*bbox))) > 0
+
+    def extent_intersects(self, query_gdf):
+        '''
+        False if query_gdf (in the layer CRS) cannot intersect any layer feature - checked against the extent and coarse 
+        coverage hull of the layer version (GeoJsonFile.extent/coverage_hull, recorded at load time). True if the layer 
+        extent is not known.
+        '''
+        geojson_file = self.geojson_files.latest('id')
+        if not geojson_file.extent or query_gdf.empty:
+            return True
+
+        if len(query_gdf.sindex.query(box(*geojson_file.extent))) == 0:
+            return False
+
+        if geojson_file.coverage_hull:
+            coverage_hull = shapely.from_wkt(geojson_file.coverage_hull)
+            return bool(shapely.intersects(np.asarray(query_gdf.geometry.values), coverage_hull).any())
+
+        return True
+
+    def estimate_read_cost(self, query_gdf=None):
+        '''
+        Estimated cost of reading the layer, in vertices - sum of the split file manifest vertex counts, for the split 
+        files that can intersect query_gdf (all split files if None). Without a manifest, estimated from the GeoJSON 
+        file size (~40 bytes per vertex).
+        '''
+        geojson_file_obj = self.geojson_files.latest('id')
+        split_manifest = geojson_file_obj.split_manifest
+        if not split_manifest:
+            layer_file = self.geojson_file
+            return layer_file.size // 40 if layer_file else 0
+
+        return sum(
+            chunk_manifest.get('vertex_count', 0) for chunk_manifest in split_manifest.values()
+            if query_gdf is None or self.chunk_intersects(chunk_manifest, query_gdf)
+        )
+
     @traceback_exception_handler
-    def spatial_join_split(self, query_gdf, predicate='intersects'):
+    def to_gdf_bbox_generator(self, bbox, columns=None):
+        start = time.time()
+        '''
+        Yield a single GeoDataFrame with only the features whose bounding boxes intersect bbox. Features are read from 
+        the FlatGeobuf copy of the layer, using its packed Hilbert R-tree, so read cost scales with the size of bbox 
+        rather than the size of the layer.
+
+        bbox: (minx, miny, maxx, maxy) in the layer CRS
+        columns: list of attribute columns to read (geometry is always read). None reads all columns.
+
+        Usage:
+            for idx, filename, gdf in layer.to_gdf_bbox_generator(shapefile_gdf.total_bounds):
+                pass
+        '''
+        flatgeobuf_path = self.flatgeobuf_path
+        if flatgeobuf_path is None:
+            raise Exception(f'FlatGeobuf file for layer {self.name} Not Found')
+
+        gdf = gpd.read_file(flatgeobuf_path, bbox=tuple(bbox), columns=self.project_columns(columns))
+        gdf.set_crs(self.crs, inplace=True, allow_override=True)
+        self.to_categorical(gdf)
+        logger.info(f'0 - {Path(flatgeobuf_path).name}, features in bbox: {len(gdf)}')
+        yield 0, Path(flatgeobuf_path).name, gdf
+        HelperUtils.force_gc(gdf)
+
+        HelperUtils.log_elapsed_time(start, 'to_gdf_bbox_generator()')
+
+    @traceback_exception_handler
+    def spatial_join_split(self, query_gdf, predicate='intersects', chunk_stats=None):
         start = time.time()
         '''
         Spatially join a query GeoDataFrame against split geojson files one file at a time.
         This avoids loading the entire layer into memory before performing the join.
+        Split files whose extent cannot intersect query_gdf are skipped (except for predicate 'disjoint').
         '''
         if query_gdf is None or query_gdf.empty:
             return gpd.GeoDataFrame()
 
+        prune_gdf = query_gdf if predicate != 'disjoint' else None
         result_chunks = []
-        for idx, split_file, layer_gdf in self.to_gdf_split_generator():
+        for idx, split_file, layer_gdf in self.to_gdf_split_generator(query_gdf=prune_gdf, chunk_stats=chunk_stats):
             overlay_res = gpd.sjoin(query_gdf, layer_gdf, predicate=predicate)
             logger.info(f'{idx} - spatial join complete for {split_file}')
             if not overlay_res.empty:
@@ -324,24 +520,137 @@ class Layer(RevisionedMixin):
         return result_gdf
 
     @traceback_exception_handler
-    def to_gdf(self, all_features=False):
+    def to_gdf(self, all_features=False, columns=None, layer_store=None):
         start = time.time()
         if not Path(self.geojson_file.path).is_file():
             raise Exception(f'File for layer {self.name} Not Found: {self.geojson_file.path}')
 
         if settings.USE_LAYER_SPLIT_FILES:
-            gdf = self.to_gdf_split(all_features)
+            gdf = self.to_gdf_split(all_features, columns=columns, layer_store=layer_store)
 
         elif settings.USE_LAYER_STREAMING:
-            gdf = self.to_gdf_streamed(all_features)
+            gdf = self.to_gdf_streamed(all_features, columns=columns)
 
         else:
-            gdf = gpd.read_file(self.geojson_file.path)
-            gdf.set_crs(self.crs, inplace=True, allow_override=True)
+            # GeoParquet copy of the original file only exists when the layer was not split
+            gdf = self.read_split_file(Path(self.geojson_file.path), self.geoparquet_paths, columns=columns, layer_store=layer_store)
             HelperUtils.log_elapsed_time(start, 'to_gdf()')
 
         return gdf
 
+    @property
+    def geoparquet_paths(self):
+        ''' GeoParquet files {split_file: geoparquet_path} for the latest geojson file. Empty if no GeoParquet store exists '''
+        return self.geojson_files.latest('id').geoparquet_paths
+
+    @property
+    def flatgeobuf_path(self):
+        ''' FlatGeobuf file for the latest geojson file. None if it does not exist '''
+        return self.geojson_files.latest('id').flatgeobuf_path
+
+    def project_columns(self, columns):
+        ''' returns the requested columns that exist in the layer, in the requested order. None --> all columns '''
+        if columns is None:
+            return None
+
+        attributes = self.attributes
+        return [column for column in dict.fromkeys(columns) if column in attributes]
+
+    def read_split_file(self, split_path, geoparquet_paths=None, columns=None, layer_store=None):
+        ''' read a single (split) geojson file to gdf - from layer_store or its GeoParquet copy if they exist, otherwise from 
+            the GeoJSON file. Low-cardinality string columns are returned as categoricals.
+
+            columns: list of attribute columns to decode (geometry is always read). None reads all columns.
+            layer_store: MmapLayerStore of this layer version (see DbLayerProvider.layer_store). Populated on first read
+                         of the split file. None reads from GeoParquet/GeoJSON only.
+        '''
+        columns = self.project_columns(columns)
+        if layer_store is not None and layer_store.exists(split_path.name):
+            return self.to_categorical(layer_store.read(split_path.name, columns=columns, crs=self.crs))
+
+        geoparquet_path = geoparquet_paths.get(split_path.name) if geoparquet_paths else None
+        # populate the mmap store (all columns) on first read of the split file for this layer version
+        read_columns = None if layer_store is not None else columns
+
+        if geoparquet_path:
+            gdf = gpd.read_parquet(geoparquet_path, columns=read_columns + ['geometry'] if read_columns is not None else None)
+        else:
+            gdf = gpd.read_file(split_path, columns=read_columns)
+
+        gdf.set_crs(self.crs, inplace=True, allow_override=True)
+        self.to_categorical(gdf)
+        if layer_store is not None:
+            try:
+                layer_store.write(split_path.name, gdf)
+            except Exception as e:
+                logger.error(f'Error writing mmap store for layer {self.name} - {split_path.name}\n{str(e)}')
+
+            if columns is not None:
+                gdf = gdf[columns + ['geometry']]
+
+        return gdf
+
+    def geometry_tier_path(self, split_file):
+        ''' path of the geometry tier (convex hull/representative point per feature) of the split file '''
+        return Path(self.geojson_file.path).parent / TIER_DIR / f'{Path(split_file).stem}.parquet'
+
+    def read_geometry_tier(self, split_file):
+        ''' geometry tier gdf (see sqs.utils.geometry_tier) of the split file. None if it does not exist '''
+        tier_path = self.geometry_tier_path(split_file)
+        if not tier_path.is_file():
+            return None
+        return gpd.read_parquet(tier_path)
+
+    def to_gdf_features(self, feature_index, columns=None, layer_store=None):
+        '''
+        Layer features (with geometry) of an attribute-only overlay result, by its (split_file, feature_idx) index
+        (see sqs.utils.geoquery_utils.attribute_rows()). Only the split files referenced are read.
+
+        columns: list of attribute columns to read. None reads all columns.
+        layer_store: MmapLayerStore - see read_split_file()
+
+        Returns: GeoDataFrame, in the order of (and indexed by) feature_index
+        '''
+        geojson_path = Path(self.geojson_file.path)
+        split_paths = {split_path.name: split_path for split_path in self.geojson_files.latest('id').split_file_paths}
+        split_paths.setdefault(geojson_path.name, geojson_path)
+        geoparquet_paths = self.geoparquet_paths
+
+        split_files = np.asarray(feature_index.get_level_values('split_file'))
+        feature_idxs = np.asarray(feature_index.get_level_values('feature_idx'))
+        chunks = []
+        positions = []
+        for split_file in dict.fromkeys(split_files):
+            rows = np.flatnonzero(split_files == split_file)
+            gdf = self.read_split_file(split_paths[split_file], geoparquet_paths, columns=columns, layer_store=layer_store)
+            chunks.append(gdf.loc[feature_idxs[rows]])
+            positions.append(rows)
+
+        if not chunks:
+            return gpd.GeoDataFrame(geometry=[], crs=self.crs)
+
+        gdf = gpd.GeoDataFrame(pd.concat(chunks), crs=self.crs).iloc[np.argsort(np.concatenate(positions), kind='stable')]
+        gdf.index = feature_index
+        return gdf
+
+    def read_split_file_cached(self, split_path, geoparquet_paths=None, columns=None, layer_cache=None, chunk_stats=None, layer_store=None):
+        ''' read_split_file(), retrieving the decoded gdf from layer_cache if it exists '''
+        if layer_cache is None:
+            return self.read_split_file(split_path, geoparquet_paths, columns=columns, layer_store=layer_store)
+
+        cache_columns = self.project_columns(columns)
+        gdf = layer_cache.get(self.name, self.version, cache_columns, split_path.name)
+        if gdf is not None:
+            if chunk_stats is not None:
+                chunk_stats['cache_hits'] = chunk_stats.get('cache_hits', 0) + 1
+            return gdf
+
+        if chunk_stats is not None:
+            chunk_stats['cache_misses'] = chunk_stats.get('cache_misses', 0) + 1
+        gdf = self.read_split_file(split_path, geoparquet_paths, columns=columns, layer_store=layer_store)
+        layer_cache.set(self.name, self.version, cache_columns, split_path.name, gdf)
+        return gdf
+
     @traceback_exception_handler
     def geojson_generator(self):
         ''' returns Generator to stream geojson from file in parts 
@@ -419,6 +728,7 @@ class LayerRequestLog(models.Model):
     app_id = models.SmallIntegerField('Application ID')
     data = JSONField('Request query from external system')
     response = JSONField('Response from SQS', default=dict)
+    spatial_results = JSONField('(question, layer) results, reused by REFRESH requests (not returned to the external system)', default=list, blank=True)
     when = models.DateTimeField(auto_now_add=True, null=False, blank=False)
 
     @classmethod
@@ -429,6 +739,22 @@ class LayerRequestLog(models.Model):
         log = LayerRequestLog.objects.create(system=system, app_id=app_id, request_type=request_type, data=data)
         return log
 
+    def prior_spatial_results(self):
+        '''
+        (question, layer) results of the previous requests for the same proposal - the latest result for each (question, 
+        layer). Requests are read back to the latest FULL request, so the results of the questions not in a REFRESH_SINGLE/
+        REFRESH_PARTIAL request are still available to the next REFRESH request.
+        '''
+        spatial_results = {}
+        qs = LayerRequestLog.objects.filter(system=self.system, app_id=self.app_id, id__lt=self.id).order_by('-id')
+        for request_type, results in qs.values_list('request_type', 'spatial_results').iterator():
+            for result in results or []:
+                spatial_results.setdefault(tuple(result['key']), result)
+            if request_type == RequestTypeEnum.FULL:
+                break
+
+        return list(spatial_results.values())
+
     def request_details(self, system=None, app_id=None, request_type='FULL', show_layers=False):
         '''
         Get history of layers requested from external systems
@@ -482,6 +808,118 @@ class LayerRequestLog(models.Model):
         ordering = ('-when',)
 
 
+class SpatialResultCache(models.Model):
+    '''
+    Persistent (question, layer) result cache, shared across proposals and systems (settings.USE_SPATIAL_RESULT_CACHE). 
+    Content addressed - keyed by the normalised proposal geometry hash, layer name/version, buffer, how, column_name, 
+    operator, value (and the answer columns). Bounded by settings.SPATIAL_RESULT_CACHE_SIZE (MB), least recently used 
+    entries evicted first - evict() runs once per request (after the results are written), and in the purge_result_cache
+    cron task, not on every write.
+
+    Usage:
+        key = SpatialResultCache.make_key(geometry_hash, layer_info, layer, buffer_size)
+        result = SpatialResultCache.get_result(key)
+        if result is None:
+            SpatialResultCache.set_result(key, geometry_hash, layer_info, result)
+        SpatialResultCache.evict()
+
+        # entries for superseded layer versions
+        SpatialResultCache.purge_superseded()
+    '''
+    key = models.CharField('Result key (sha256)', max_length=64, unique=True)
+    geometry_hash = models.CharField('Normalised proposal geometry hash', max_length=64)
+    layer_name = models.CharField(max_length=128)
+    layer_version = models.IntegerField()
+    result = JSONField('Operator response, proponent and assessor answers', default=dict)
+    size = models.IntegerField('Result size (bytes)', default=0)
+    hits = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'sqs'
+        indexes = [
+            models.Index(fields=['layer_name', 'layer_version'], name='sqs_result_cache_layer_idx'),
+            models.Index(fields=['last_used'], name='sqs_result_cache_used_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.layer_name}|{self.layer_version}|{self.key[:12]}'
+
+    @classmethod
+    def make_key(cls, geometry_hash, layer_info, layer, buffer_size):
+        ''' sha256 of the normalised result key - layer is the question layer definition '''
+        key = dict(
+            geometry_hash=geometry_hash,
+            layer_name=layer_info['layer_name'],
+            layer_version=layer_info['layer_version'],
+            buffer=buffer_size,
+            how=layer['how'],
+            column_name=layer['column_name'],
+            operator=layer['operator'],
+            value=str(layer['value']),
+            # answer columns - part of the proponent/assessor answers
+            proponent_items=layer.get('proponent_items'),
+            assessor_items=layer.get('assessor_items'),
+            visible_to_proponent=layer.get('visible_to_proponent'),
+        )
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    @classmethod
+    def get_result(cls, key):
+        ''' cached result for key, None if not cached '''
+        entry = cls.objects.filter(key=key).values_list('id', 'result').first()
+        if entry is None:
+            return None
+
+        cls.objects.filter(id=entry[0]).update(hits=F('hits') + 1, last_used=timezone.now())
+        return entry[1]
+
+    @classmethod
+    def set_result(cls, key, geometry_hash, layer_info, result):
+        size = len(json.dumps(result))
+        cls.objects.update_or_create(
+            key=key,
+            defaults=dict(
+                geometry_hash=geometry_hash, layer_name=layer_info['layer_name'], layer_version=layer_info['layer_version'], 
+                result=result, size=size,
+            )
+        )
+
+    @classmethod
+    def evict(cls):
+        ''' deletes the least recently used entries while the cache is larger than settings.SPATIAL_RESULT_CACHE_SIZE '''
+        max_bytes = int(settings.SPATIAL_RESULT_CACHE_SIZE * 1024**2)
+        excess = (cls.objects.aggregate(total=Sum('size'))['total'] or 0) - max_bytes
+        if excess <= 0:
+            return 0
+
+        ids = []
+        for entry_id, size in cls.objects.order_by('last_used').values_list('id', 'size').iterator():
+            ids.append(entry_id)
+            excess -= size
+            if excess <= 0:
+                break
+
+        deleted, _ = cls.objects.filter(id__in=ids).delete()
+        logger.info(f'Spatial result cache: {deleted} least recently used entries evicted')
+        return deleted
+
+    @classmethod
+    def purge_superseded(cls, layer_names=None):
+        ''' deletes the entries for superseded layer versions (and deleted layers). Returns the number of entries deleted '''
+        qs = cls.objects.all() if layer_names is None else cls.objects.filter(layer_name__in=layer_names)
+        current_versions = dict(Layer.objects.values_list('name', 'version'))
+
+        deleted = 0
+        for layer_name in qs.values_list('layer_name', flat=True).distinct():
+            layer_qs = qs.filter(layer_name=layer_name)
+            if layer_name in current_versions:
+                layer_qs = layer_qs.exclude(layer_version=current_versions[layer_name])
+            deleted += layer_qs.delete()[0]
+        return deleted
+
+
 class ActiveQueueManager(models.Manager):
     ''' filter queued tasks and omit old (stale) queued tasks '''
     def get_queryset(self):
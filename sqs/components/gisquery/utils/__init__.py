@@ -15,6 +15,30 @@ def clear_cache(key):
         return True
     return False
 
+class RequestCacheStream():
+    '''
+    Records of a streamed request (StreamingHttpResponse) - the request cache key (see set_das_cache()) is deleted when 
+    the response is closed. StreamingHttpResponse calls close() once the response is finished, also if the client 
+    disconnects before the first record is sent (the finally clause of a generator that never started does not run).
+    '''
+
+    def __init__(self, records, cache_key):
+        self.records = records
+        self.cache_key = cache_key
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.records)
+
+    def close(self):
+        try:
+            self.records.close()
+        finally:
+            if self.cache_key:
+                cache.delete(self.cache_key)
+
 def set_das_cache(data):
     ''' check request cache to prevent repeated requests while previous request is still running
     '''
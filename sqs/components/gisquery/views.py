@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from rest_framework import status
 from http import HTTPStatus
 from django.urls import reverse
@@ -27,7 +27,7 @@ from sqs.components.api import models as api_models
 from sqs.components.api import utils as api_utils
 from sqs.decorators import ip_check_required, basic_exception_handler, traceback_exception_handler, apiview_response_exception_handler
 from sqs.exceptions import LayerProviderException
-from sqs.components.gisquery.utils import set_das_cache, clear_cache
+from sqs.components.gisquery.utils import set_das_cache, clear_cache, RequestCacheStream
 from sqs.components.gisquery.utils.schema import is_valid_schema
 from sqs.utils import HelperUtils
 
@@ -45,6 +45,14 @@ class DisturbanceLayerView(View):
         import requests
         from sqs.utils.das_tests.request_log.das_query import DAS_QUERY_JSON
         r = requests.post(url=f'http://localhost:8002/api/v1/das/spatial_query/', data={data: json.dumps(DAS_QUERY_JSON)})
+
+        Streaming response (settings.ALLOW_STREAMING_RESPONSE) - set "stream": true in the request data. Returns NDJSON 
+        records as the query progresses (see DisturbanceLayerQuery.query_stream()), followed by a final 'summary' record
+        with the metrics (or an 'error' record).
+
+        r = requests.post(url=f'http://localhost:8002/api/v1/das/spatial_query/', data={data: json.dumps(dict(DAS_QUERY_JSON, stream=True))}, stream=True)
+        for line in r.iter_lines():
+            record = json.loads(line)
         """
         def get_question_ids():
             try:
@@ -60,6 +68,52 @@ class DisturbanceLayerView(View):
             '''
             return datetime.strptime(datetime.strftime(when, '%Y-%m-%dT%H:%M:%S'), '%Y-%m-%dT%H:%M:%S').replace(tzinfo=pytz.utc)
 
+        def save_response(response):
+            ''' adds the request details and metrics to the query response, and saves the complete response to the request log '''
+            response['sqs_log_url'] = request.build_absolute_uri().replace('das/spatial_query', f'logs/{request_log.id}/request_log')
+            #response['metrics'] = dlq.lq_helper.metrics
+            response['request_type'] = request_type
+            response['when'] = request_log.when.strftime("%Y-%m-%dT%H:%M:%S")
+      
+            request_log.response = response
+            total_time = round(time.time() - start_time, 3)
+            request_log.response.update({
+                'metrics': dict(
+                    #total_query_time=round(time.time() - start_time, 3),
+                    total_query_time=total_time,
+                    #total_query_time=round(dlq.lq_helper.total_query_time, 3),
+                    spatial_query=dlq.lq_helper.metrics,
+                    query_plan=dlq.query_planner.summary(),
+                    skipped_evaluations=dlq.lq_helper.lazy_stats['skipped'],
+                    reused_results=dict(dlq.lq_helper.reuse_stats),
+                )
+            })
+            # (question, layer) results kept in the request log only - reused by subsequent REFRESH requests
+            request_log.spatial_results = dlq.spatial_results
+            request_log.save()
+            return total_time
+
+        def stream_response():
+            ''' NDJSON records - query progress records, then the summary record (the complete response is saved to the request log) '''
+            try:
+                # no query planner - it would run all the layer overlays before the first record
+                for record in dlq.query_stream(use_planner=False):
+                    yield json.dumps(record) + '\n'
+
+                response = dlq.response
+                total_time = save_response(response)
+                if dlq.errors:
+                    # schema walk stopped by an error - the partial response is saved to the request log
+                    yield json.dumps(dict(record='error', errors='\n'.join(dlq.errors), sqs_log_url=response['sqs_log_url'])) + '\n'
+                    return
+
+                summary_keys = ['system', 'add_info_assessor', 'sqs_log_url', 'request_type', 'when', 'metrics']
+                yield json.dumps(dict(record='summary', **{k: response[k] for k in summary_keys if k in response})) + '\n'
+                logger.info(f'Propodal ID {proposal["id"]}: Total Time: {total_time} secs (streamed)')
+            except Exception as e:
+                logger.error(traceback.format_exc())
+                yield json.dumps(dict(record='error', errors=str(e))) + '\n'
+
 
         HelperUtils.log_request(f'{request.user} - {self.__class__.__name__}.{inspect.currentframe().f_code.co_name} - {request.get_full_path()}')
         start_time = time.time()
@@ -107,23 +161,14 @@ class DisturbanceLayerView(View):
             request_log = LayerRequestLog.create_log(data, request_type)
 
             dlq = DisturbanceLayerQuery(masterlist_questions, geojson, proposal)
+            if settings.USE_INCREMENTAL_REFRESH and request_type in [RequestTypeEnum.REFRESH_SINGLE, RequestTypeEnum.REFRESH_PARTIAL]:
+                dlq.set_prior_results(request_log.prior_spatial_results())
+            if settings.ALLOW_STREAMING_RESPONSE and data.get('stream'):
+                # query runs as the response is consumed - the request cache is cleared when the response is closed
+                return StreamingHttpResponse(RequestCacheStream(stream_response(), cache_key), content_type='application/x-ndjson')
+
             response = dlq.query()
-            response['sqs_log_url'] = request.build_absolute_uri().replace('das/spatial_query', f'logs/{request_log.id}/request_log')
-            #response['metrics'] = dlq.lq_helper.metrics
-            response['request_type'] = request_type
-            response['when'] = request_log.when.strftime("%Y-%m-%dT%H:%M:%S")
-      
-            request_log.response = response
-            total_time = round(time.time() - start_time, 3)
-            request_log.response.update({
-                'metrics': dict(
-                    #total_query_time=round(time.time() - start_time, 3),
-                    total_query_time=total_time,
-                    #total_query_time=round(dlq.lq_helper.total_query_time, 3),
-                    spatial_query=dlq.lq_helper.metrics,
-                )
-            })
-            request_log.save()
+            total_time = save_response(response)
 
         except LayerProviderException as e:
             clear_cache(cache_key)
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from sqs.components.gisquery.models import Layer
+from sqs.utils.loader_utils import LayerLoader
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Writes the GeoParquet copy of the layer split files, the FlatGeobuf copy of the layer (if settings.USE_LAYER_FLATGEOBUF),
+    the split file extents manifest and the geometry tier, for layers already in the data_store
+
+    # backfill all layers that are missing GeoParquet files
+    ./manage.py backfill_geoparquet
+
+    # backfill user provided layer names (--name must be last paramenter)
+    ./manage.py backfill_geoparquet --name CPT_DBCA_REGIONS CPT_THREATENED_FAUNA
+
+    # rewrite existing GeoParquet/FlatGeobuf files, split file manifest and geometry tier
+    ./manage.py backfill_geoparquet --force --name CPT_DBCA_REGIONS
+    """
+
+    help = 'Writes GeoParquet/FlatGeobuf files and split file manifest for the latest version of existing layers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', type=str, help='Backfill layer by name', nargs='*') # optional
+        parser.add_argument('--force', action='store_true', help='Rewrite existing GeoParquet/FlatGeobuf files, split file manifest and geometry tier')
+
+    def handle(self, *args, **options):
+        layers = options['name'] if options['name'] else list(Layer.objects.all().values_list('name', flat=True))
+        force = options['force']
+
+        errors = []
+        updates = []
+        logger.info('Running command {}'.format(__name__))
+
+        if not settings.USE_LAYER_GEOPARQUET:
+            logger.warning('settings.USE_LAYER_GEOPARQUET is False. No GeoParquet files written')
+
+        for layer_name in layers:
+            try:
+                layer = Layer.objects.get(name=layer_name)
+                if layer.geojson_file is None:
+                    logger.warning(f'GeoJSON file missing for layer {layer_name}. Skipping ...')
+                    continue
+
+                geojson_file = layer.geojson_files.latest('id')
+                loader = LayerLoader(name=layer_name)
+                geoparquet_files = loader.write_geoparquet(layer, geojson_file, force=force)
+                if geoparquet_files:
+                    logger.info(f'GeoParquet files written: {layer_name}, Version: {layer.version}, Files: {len(geoparquet_files)}')
+                    updates.append([layer_name, len(geoparquet_files)])
+
+                if loader.write_flatgeobuf(layer, geojson_file, force=force):
+                    logger.info(f'FlatGeobuf file written: {layer_name}, Version: {layer.version}')
+
+                loader.write_split_manifest(layer, geojson_file, force=force)
+                loader.write_geometry_tier(layer, geojson_file, force=force)
+
+            except Exception as e:
+                err_msg = 'Error writing GeoParquet files for layer {}'.format(layer_name)
+                logger.error('{}\n{}'.format(err_msg, str(e)))
+                errors.append(err_msg)
+
+        cmd_name = __name__.split('.')[-1].replace('_', ' ').upper()
+        err_str = '<strong style="color: red;">Errors: {}</strong>'.format(len(errors)) if len(errors)>0 else '<strong style="color: green;">Errors: 0</strong>'
+        msg = '<p>{} completed. {}. Layers updated: {}.</p>'.format(cmd_name, err_str, updates)
+        logger.info(msg)
+        print(msg) # will redirect to cron_tasks.log file, by the parent script
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from sqs.components.gisquery.models import Layer
+from sqs.utils.loader_utils import LayerLoader
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Sets the Layer.canonical_crs flag and reloads the layers not yet in the canonical CRS (settings.CRS). The reload uses 
+    the existing layer GeoJSON file (no request to GeoServer) and creates a new layer version.
+
+    # reproject all layers to settings.CRS
+    ./manage.py canonical_crs_layers
+
+    # reproject user provided layer names (--name must be last paramenter)
+    ./manage.py canonical_crs_layers --name CPT_DBCA_REGIONS CPT_THREATENED_FAUNA
+
+    # unset the flag, and reload the layers from GeoServer in their source CRS
+    ./manage.py canonical_crs_layers --disable --name CPT_DBCA_REGIONS
+    """
+
+    help = 'Reprojects existing layers to the canonical CRS (settings.CRS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', type=str, help='Reproject layer by name', nargs='*') # optional
+        parser.add_argument('--disable', action='store_true', help='Unset Layer.canonical_crs and reload layer from GeoServer')
+
+    def handle(self, *args, **options):
+        layers = options['name'] if options['name'] else list(Layer.objects.all().values_list('name', flat=True))
+        disable = options['disable']
+
+        errors = []
+        updates = []
+        logger.info('Running command {}'.format(__name__))
+
+        for layer_name in layers:
+            try:
+                # queryset update - Layer.save() would increment the layer version
+                Layer.objects.filter(name=layer_name).update(canonical_crs=not disable)
+                layer = Layer.objects.get(name=layer_name)
+                loader = LayerLoader(name=layer_name)
+
+                if disable:
+                    if layer.source_crs and layer.source_crs.lower() != layer.crs.lower():
+                        layer = loader.load_layer()
+                        updates.append([layer_name, layer.crs])
+
+                elif layer.crs.lower() != settings.CRS.lower():
+                    if layer.geojson_file is None:
+                        logger.warning(f'GeoJSON file missing for layer {layer_name}. Skipping ...')
+                        continue
+
+                    layer = loader.load_layer(filename=layer.geojson_file.path, copy=True)
+                    logger.info(f'Layer reprojected: {layer_name}, Version: {layer.version}, CRS: {layer.source_crs} --> {layer.crs}')
+                    updates.append([layer_name, layer.crs])
+
+            except Exception as e:
+                err_msg = 'Error reprojecting layer {}'.format(layer_name)
+                logger.error('{}\n{}'.format(err_msg, str(e)))
+                errors.append(err_msg)
+
+        cmd_name = __name__.split('.')[-1].replace('_', ' ').upper()
+        err_str = '<strong style="color: red;">Errors: {}</strong>'.format(len(errors)) if len(errors)>0 else '<strong style="color: green;">Errors: 0</strong>'
+        msg = '<p>{} completed. {}. Layers updated: {}.</p>'.format(cmd_name, err_str, updates)
+        logger.info(msg)
+        print(msg) # will redirect to cron_tasks.log file, by the parent script
@@ -24,6 +24,7 @@ class Command(BaseCommand):
         logger.info('Running command {}'.format(__name__))
         subprocess.call('python manage.py clear_old_tasks' + stdout_redirect, shell=True) 
         subprocess.call('python manage.py update_layers' + stdout_redirect, shell=True) 
+        subprocess.call('python manage.py purge_result_cache' + stdout_redirect, shell=True) 
         #subprocess.call('python manage.py update_active_layers' + stdout_redirect, shell=True) 
         #subprocess.call('python manage.py update_cache' + stdout_redirect, shell=True) 
 
@@ -6,7 +6,7 @@ from datetime import datetime
 from django.utils import timezone
 import pytz
 
-from sqs.components.gisquery.models import Layer, LayerRequestLog, Task
+from sqs.components.gisquery.models import Layer, LayerRequestLog, Task, RequestTypeEnum
 from sqs.utils.das_schema_utils import DisturbanceLayerQuery
 
 import logging
@@ -50,6 +50,8 @@ class Command(BaseCommand):
             request_log = LayerRequestLog.create_log(data, request_type)
 
             dlq = DisturbanceLayerQuery(masterlist_questions, geojson, proposal)
+            if settings.USE_INCREMENTAL_REFRESH and request_type in [RequestTypeEnum.REFRESH_SINGLE, RequestTypeEnum.REFRESH_PARTIAL]:
+                dlq.set_prior_results(request_log.prior_spatial_results())
             response = dlq.query()
             #sqs_log_url = f'http://localhost:8002/api/v1/logs/{request_log.id}/request_log/'
             sqs_log_url = f'{settings.SITE_URL}/api/v1/logs/{request_log.id}/request_log/'
@@ -63,8 +65,13 @@ class Command(BaseCommand):
                 'metrics': dict(
                     total_query_time=total_time,
                     spatial_query=dlq.lq_helper.metrics,
+                    query_plan=dlq.query_planner.summary(),
+                    skipped_evaluations=dlq.lq_helper.lazy_stats['skipped'],
+                    reused_results=dict(dlq.lq_helper.reuse_stats),
                 )
             })
+            # (question, layer) results kept in the request log only - reused by subsequent REFRESH requests
+            request_log.spatial_results = dlq.spatial_results
             request_log.save()
 
             task.request_log_id = request_log.id
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+
+from sqs.components.gisquery.models import Layer
+from sqs.utils.loader_utils import LayerLoader
+from sqs.utils.postgis_store import PostgisLayerStore
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Sets the Layer.postgis flag and bulk loads the latest layer version to a PostGIS table (overlays for the layer then 
+    run in the database). Uses the existing layer GeoJSON files - no new layer version is created.
+
+    # load all layers to PostGIS
+    ./manage.py postgis_layers
+
+    # load user provided layer names (--name must be last paramenter)
+    ./manage.py postgis_layers --name CPT_DBCA_REGIONS CPT_THREATENED_FAUNA
+
+    # reload existing PostGIS tables
+    ./manage.py postgis_layers --force --name CPT_DBCA_REGIONS
+
+    # unset the flag, and drop the PostGIS tables (overlays run in geopandas)
+    ./manage.py postgis_layers --disable --name CPT_DBCA_REGIONS
+    """
+
+    help = 'Loads existing layers to PostGIS tables, for in-database overlays'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', type=str, help='Load layer by name', nargs='*') # optional
+        parser.add_argument('--force', action='store_true', help='Reload existing PostGIS tables')
+        parser.add_argument('--disable', action='store_true', help='Unset Layer.postgis and drop the PostGIS tables')
+
+    def handle(self, *args, **options):
+        layers = options['name'] if options['name'] else list(Layer.objects.all().values_list('name', flat=True))
+        force = options['force']
+        disable = options['disable']
+
+        errors = []
+        updates = []
+        logger.info('Running command {}'.format(__name__))
+
+        for layer_name in layers:
+            try:
+                # queryset update - Layer.save() would increment the layer version
+                Layer.objects.filter(name=layer_name).update(postgis=not disable)
+                layer = Layer.objects.get(name=layer_name)
+
+                if disable:
+                    tables = PostgisLayerStore(layer).drop()
+                    if tables:
+                        updates.append([layer_name, len(tables)])
+                    continue
+
+                if layer.geojson_file is None:
+                    logger.warning(f'GeoJSON file missing for layer {layer_name}. Skipping ...')
+                    continue
+
+                loader = LayerLoader(name=layer_name)
+                count = loader.write_postgis(layer, layer.geojson_files.latest('id'), force=force)
+                if count is not None:
+                    logger.info(f'PostGIS table written: {layer_name}, Version: {layer.version}, Features: {count}')
+                    updates.append([layer_name, count])
+
+            except Exception as e:
+                err_msg = 'Error loading layer {} to PostGIS'.format(layer_name)
+                logger.error('{}\n{}'.format(err_msg, str(e)))
+                errors.append(err_msg)
+
+        cmd_name = __name__.split('.')[-1].replace('_', ' ').upper()
+        err_str = '<strong style="color: red;">Errors: {}</strong>'.format(len(errors)) if len(errors)>0 else '<strong style="color: green;">Errors: 0</strong>'
+        msg = '<p>{} completed. {}. Layers updated: {}.</p>'.format(cmd_name, err_str, updates)
+        logger.info(msg)
+        print(msg) # will redirect to cron_tasks.log file, by the parent script
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from sqs.components.gisquery.models import SpatialResultCache
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Deletes spatial result cache entries (SpatialResultCache) for superseded layer versions and deleted layers, then the 
+    least recently used entries while the cache exceeds settings.SPATIAL_RESULT_CACHE_SIZE.
+    Entries for the current layer versions are kept (unless --all, or evicted for size).
+
+    # purge entries for superseded layer versions, all layers
+    ./manage.py purge_result_cache
+
+    # purge user provided layer names (--name must be last paramenter)
+    ./manage.py purge_result_cache --name CPT_DBCA_REGIONS CPT_THREATENED_FAUNA
+
+    # purge all entries
+    ./manage.py purge_result_cache --all
+    """
+
+    help = 'Deletes spatial result cache entries for superseded layer versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', type=str, help='Purge layer by name', nargs='*') # optional
+        parser.add_argument('--all', action='store_true', help='Purge all entries, including the current layer versions')
+
+    def handle(self, *args, **options):
+        layer_names = options['name'] if options['name'] else None
+
+        errors = []
+        deleted = 0
+        logger.info('Running command {}'.format(__name__))
+
+        try:
+            if options['all']:
+                qs = SpatialResultCache.objects.all() if layer_names is None else SpatialResultCache.objects.filter(layer_name__in=layer_names)
+                deleted, _ = qs.delete()
+            else:
+                deleted = SpatialResultCache.purge_superseded(layer_names=layer_names)
+                deleted += SpatialResultCache.evict()
+        except Exception as e:
+            err_msg = 'Error purging spatial result cache'
+            logger.error('{}\n{}'.format(err_msg, str(e)))
+            errors.append(err_msg)
+
+        cmd_name = __name__.split('.')[-1].replace('_', ' ').upper()
+        err_str = '<strong style="color: red;">Errors: {}</strong>'.format(len(errors)) if len(errors)>0 else '<strong style="color: green;">Errors: 0</strong>'
+        msg = '<p>{} completed. {}. Entries deleted: {}.</p>'.format(cmd_name, err_str, deleted)
+        logger.info(msg)
+        print(msg) # will redirect to cron_tasks.log file, by the parent script
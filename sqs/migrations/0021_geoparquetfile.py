@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import sqs.components.gisquery.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0020_task_request_type_alter_layerrequestlog_request_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoParquetFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField(default=0, editable=False)),
+                ('split_file', models.CharField(max_length=512, verbose_name='Source GeoJSON split file name')),
+                ('geoparquet_file', models.FileField(max_length=512, upload_to=sqs.components.gisquery.models.geojson_file_path)),
+                ('geojson_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geoparquet_files', to='sqs.geojsonfile')),
+                ('layer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geoparquet_files', to='sqs.layer')),
+            ],
+        ),
+    ]
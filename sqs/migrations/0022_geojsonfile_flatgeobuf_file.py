@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 10:05
+
+from django.db import migrations, models
+import sqs.components.gisquery.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0021_geoparquetfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geojsonfile',
+            name='flatgeobuf_file',
+            field=models.FileField(blank=True, max_length=512, null=True, upload_to=sqs.components.gisquery.models.geojson_file_path, verbose_name='FlatGeobuf copy (with spatial index)'),
+        ),
+    ]
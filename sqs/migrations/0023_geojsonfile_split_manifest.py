@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0022_geojsonfile_flatgeobuf_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geojsonfile',
+            name='split_manifest',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Split file extents {split_file: {bbox, feature_count, vertex_count}}'),
+        ),
+    ]
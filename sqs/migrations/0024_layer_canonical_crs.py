@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0023_geojsonfile_split_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='canonical_crs',
+            field=models.BooleanField(default=False, verbose_name='Reproject layer to settings.CRS at load time'),
+        ),
+        migrations.AddField(
+            model_name='layer',
+            name='source_crs',
+            field=models.CharField(blank=True, max_length=24, null=True, verbose_name='CRS of the layer source (GeoServer)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0024_layer_canonical_crs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='postgis',
+            field=models.BooleanField(default=False, verbose_name='Store layer in a PostGIS table and run overlays in the database'),
+        ),
+    ]
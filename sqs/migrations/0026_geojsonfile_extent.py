@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0025_layer_postgis'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='geojsonfile',
+            name='split_manifest',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Split file extents {split_file: {bbox, feature_count, vertex_count, hull}}'),
+        ),
+        migrations.AddField(
+            model_name='geojsonfile',
+            name='extent',
+            field=models.JSONField(blank=True, null=True, verbose_name='Layer extent [minx, miny, maxx, maxy] (layer CRS)'),
+        ),
+        migrations.AddField(
+            model_name='geojsonfile',
+            name='coverage_hull',
+            field=models.TextField(blank=True, null=True, verbose_name='Coarse coverage hull - union of the split file convex hulls (WKT, layer CRS)'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0026_geojsonfile_extent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpatialResultCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Result key (sha256)')),
+                ('geometry_hash', models.CharField(max_length=64, verbose_name='Normalised proposal geometry hash')),
+                ('layer_name', models.CharField(max_length=128)),
+                ('layer_version', models.IntegerField()),
+                ('result', models.JSONField(default=dict, verbose_name='Operator response, proponent and assessor answers')),
+                ('size', models.IntegerField(default=0, verbose_name='Result size (bytes)')),
+                ('hits', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['layer_name', 'layer_version'], name='sqs_result_cache_layer_idx'),
+                    models.Index(fields=['last_used'], name='sqs_result_cache_used_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sqs', '0027_spatialresultcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layerrequestlog',
+            name='spatial_results',
+            field=models.JSONField(blank=True, default=list, verbose_name='(question, layer) results, reused by REFRESH requests (not returned to the external system)'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+import os
+
+
+def init_worker(worker_settings, database_names):
+    '''
+    Process pool worker initializer (see sqs.utils.query_planner.QueryPlanner.execute_pool()). The workers are spawned -
+    each starts from a fresh interpreter, so Django is set up here and the worker opens its own DB connections. The
+    settings and database names of the parent process are then applied, so overridden settings and the test database
+    (./manage.py test) are the same in the workers.
+
+    NOTE: nothing is imported from sqs at module level - this module is imported in the worker before Django is set up.
+    '''
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sqs.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connections
+
+    for name, value in worker_settings.items():
+        setattr(settings, name, value)
+
+    for alias, name in database_names.items():
+        settings.DATABASES[alias]['NAME'] = name
+        connections[alias].settings_dict['NAME'] = name
+    # any connection opened by django.setup() (AppConfig.ready()) used the database names of the settings module
+    connections.close_all()
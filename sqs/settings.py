@@ -64,6 +64,31 @@ USE_LAYER_STREAMING = env('USE_LAYER_STREAMING', False)
 USE_LAYER_SPLIT_FILES = env('USE_LAYER_SPLIT_FILES', True)
 MAX_GEOJSPLIT_SIZE = env('MAX_GEOJSPLIT_SIZE', 50) # MB
 GEOJSON_SPLIT_GEOMETRY_COUNT = env('GEOJSON_SPLIT_GEOMETRY_COUNT', 5000)
+USE_LAYER_GEOPARQUET = env('USE_LAYER_GEOPARQUET', True) # write/read columnar GeoParquet copy of the layer split files
+USE_LAYER_COLUMN_PROJECTION = env('USE_LAYER_COLUMN_PROJECTION', True) # load only the layer columns needed by the question
+USE_LAYER_FLATGEOBUF = env('USE_LAYER_FLATGEOBUF', False) # write FlatGeobuf copy of the layer, and read only the features in the proposal bbox
+LAYER_CANONICAL_CRS = env('LAYER_CANONICAL_CRS', False) # new layers reprojected to settings.CRS at load time (per-layer flag Layer.canonical_crs)
+USE_LAYER_GEOMETRY_TIER = env('USE_LAYER_GEOMETRY_TIER', False) # convex hull/representative point per feature, to classify features before the exact intersects check
+USE_QUERY_PLANNER = env('USE_QUERY_PLANNER', False) # layer overlays for the whole DAS payload planned and run up-front, once per (layer, buffer, how, columns). Plans all questions - bypasses USE_LAZY_EVALUATION
+LAYER_PROCESS_POOL_SIZE = env('LAYER_PROCESS_POOL_SIZE', 0) # processes evaluating the planned layer work units of a request concurrently. 0 or 1 - serial
+LAYER_PROCESS_POOL_MIN_FREE_MEM = env('LAYER_PROCESS_POOL_MIN_FREE_MEM', 1024) # MB, system memory kept free when admitting layer work units to the process pool
+OVERLAY_MEMO_SIZE = env('OVERLAY_MEMO_SIZE', 128) # MB, request overlay memo (attribute columns only) - least recently used entries evicted. 0 to disable
+LAYER_CHUNK_CONCURRENCY = env('LAYER_CHUNK_CONCURRENCY', 1) # threads overlaying layer split chunks concurrently. 1 - serial
+LAYER_CHUNK_MAX_IN_FLIGHT = env('LAYER_CHUNK_MAX_IN_FLIGHT', 4) # max layer split chunks held in memory when LAYER_CHUNK_CONCURRENCY > 1
+LAYER_OVERLAY_ENGINE = env('LAYER_OVERLAY_ENGINE', 'overlay') # 'overlay' - full gpd.overlay, 'sindex' - matching layer rows from spatial index/prepared geometry predicates
+USE_LAYER_ATTRIBUTE_ONLY = env('USE_LAYER_ATTRIBUTE_ONLY', False) # 'Outside'/'Inside' overlay results hold the layer feature index and attribute columns only, no geometry
+USE_PROPOSAL_PREPROCESSING = env('USE_PROPOSAL_PREPROCESSING', False) # proposal GeoJSON parsed from the feature dicts, repaired and dissolved into a single (prepared) multipart geometry
+USE_LAYER_EXTENT_PREFILTER = env('USE_LAYER_EXTENT_PREFILTER', True) # layers whose extent/coverage hull cannot intersect the buffered proposal are not overlaid
+USE_INCREMENTAL_REFRESH = env('USE_INCREMENTAL_REFRESH', False) # REFRESH_SINGLE/REFRESH_PARTIAL reuse prior (question, layer) results if the proposal geometry and layer version are unchanged
+USE_SPATIAL_RESULT_CACHE = env('USE_SPATIAL_RESULT_CACHE', False) # DB cache of (question, layer) results keyed by proposal geometry hash and layer version, shared across proposals
+SPATIAL_RESULT_CACHE_SIZE = env('SPATIAL_RESULT_CACHE_SIZE', 256) # MB, spatial result cache size - least recently used entries evicted
+USE_LAZY_EVALUATION = env('USE_LAZY_EVALUATION', True) # radiobutton/select questions evaluated in option order, stopping at the first option found
+ALLOW_STREAMING_RESPONSE = env('ALLOW_STREAMING_RESPONSE', True) # DAS spatial_query requests with "stream": true return NDJSON records as the query progresses (StreamingHttpResponse)
+USE_LAYER_MMAP_STORE = env('USE_LAYER_MMAP_STORE', False) # on-disk store of decoded layer split files, mmap'd and shared by all processes on the node
+USE_LAYER_POSTGIS = env('USE_LAYER_POSTGIS', False) # new layers bulk-loaded to a PostGIS table, overlays run in the database (per-layer flag Layer.postgis)
+LAYER_POSTGIS_SCHEMA = env('LAYER_POSTGIS_SCHEMA', 'layer_store') # DB schema of the PostGIS layer tables
+LAYER_CATEGORICAL_MAX_VALUES = env('LAYER_CATEGORICAL_MAX_VALUES', 1000) # string attributes with <= distinct values (from Layer.attr_values) held as categoricals. 0 to disable
+LAYER_CACHE_SIZE = env('LAYER_CACHE_SIZE', 0) # MB, in-process LRU cache of decoded layer gdfs (per worker process). 0 - disabled
 GC_ITER_LOOP = env('GC_ITER_LOOP', 5)
 MAX_RETRIES = env('MAX_RETRIES', 3)
 STALE_TASKS_DAYS = env('STALE_TASKS_DAYS', 7)
@@ -1,9 +1,12 @@
+from django.conf import settings
+
 import traceback
 import os
 import json
 import copy
 
 from sqs.utils.geoquery_utils import DisturbanceLayerQueryHelper
+from sqs.utils.query_planner import QueryPlanner
 from sqs.utils.schema_search  import SchemaSearch
 #from sqs.utils.helper  import SchemaSearch
 from sqs.exceptions import LayerProviderException
@@ -41,19 +44,79 @@ class DisturbanceLayerQuery(object):
     def __init__(self, masterlist_questions, geojson, proposal):
         self.lq_helper = DisturbanceLayerQueryHelper(masterlist_questions, geojson, proposal)
         self.prefill_obj = DisturbancePrefillData(self.lq_helper)
+        self.query_planner = QueryPlanner(self.lq_helper)
+        self.errors = []
+
+    def set_prior_results(self, spatial_results):
+        '''
+        REFRESH_SINGLE/REFRESH_PARTIAL requests (settings.USE_INCREMENTAL_REFRESH) - reuse the (question, layer) results 
+        of the prior request for the proposal (LayerRequestLog.prior_spatial_results()) that are not stale
+        '''
+        self.lq_helper.set_prior_results(spatial_results)
 
     def query(self):
+        for record in self.query_stream():
+            pass
+        return self.response
+
+    def query_stream(self, use_planner=None):
+        '''
+        Generator version of query() - yields the records below as they complete (NDJSON streaming response, see 
+        DisturbanceLayerView). The complete query() response is set in self.response once the generator is exhausted.
+
+            dict(record='query_plan', query_plan=[...])             -- use_planner, once the plan has executed
+            dict(record='layer_result', **layer_data)               -- one per question layer result (see response 'layer_data')
+            dict(record='question_group', name=..., data={...})     -- one per completed top-level proposal schema item
+
+        use_planner: run the query planner before the schema walk. Defaults to settings.USE_QUERY_PLANNER. Streamed 
+                     requests pass False - the planner runs all the layer overlays before the first record is yielded.
+
+        self.errors -- errors that stopped the schema walk (self.response is then the partial response)
+        '''
+        use_planner = settings.USE_QUERY_PLANNER if use_planner is None else use_planner
+        self.response = None
+        self.errors = []
         self.lq_helper.processed_questions = []
         self.lq_helper.unprocessed_questions = []
-        prefill_data = self.prefill_obj.prefill_data_from_shape()
+
+        layer_data = self.prefill_obj.layer_data
+        idx = 0
+        try:
+            if use_planner:
+                try:
+                    # layer overlays for all masterlist_questions run up-front, once per work unit (layer, buffer, how, columns)
+                    self.query_planner.plan()
+                    self.query_planner.execute()
+                except Exception as e:
+                    # overlays not in the request overlay memo are run by the schema walk
+                    logger.error(f'Query planner error, running the schema walk without the plan\n{str(e)}')
+                yield dict(record='query_plan', query_plan=self.query_planner.summary())
+
+            for item, item_data in self.prefill_obj.prefill_items():
+                # layer results added by the schema item
+                for ld in layer_data[idx:]:
+                    yield dict(record='layer_result', **ld)
+                idx = len(layer_data)
+                yield dict(record='question_group', name=item.get('name'), data=item_data)
+        except Exception as e:
+            traceback.print_exc()
+            self.errors.append(str(e))
+
+        # spatial result cache size checked once per request, not on every result written
+        self.lq_helper.evict_result_cache()
 
         res = dict(
             system='DAS',
-            data=prefill_data,
-            layer_data=self.prefill_obj.layer_data,
+            data=[self.prefill_obj.data],
+            layer_data=layer_data,
             add_info_assessor=self.prefill_obj.add_info_assessor,
         )
-        return res
+        self.response = res
+
+    @property
+    def spatial_results(self):
+        ''' (question, layer) results of the query - saved to LayerRequestLog.spatial_results (not the response), reused by subsequent REFRESH requests '''
+        return list(self.lq_helper.spatial_results.values()) if settings.USE_INCREMENTAL_REFRESH else []
 
 
 class DisturbancePrefillData(object):
@@ -74,15 +137,22 @@ class DisturbancePrefillData(object):
         self.add_info_assessor = {}
 
     def prefill_data_from_shape(self):
-        schema = self.layer_query_helper.proposal.get('schema')
-
         try:
-            for item in schema:
-                self.data.update(self._populate_data_from_item(item, 0, ''))
+            for item, item_data in self.prefill_items():
+                pass
         except:
             traceback.print_exc()
         return [self.data]
 
+    def prefill_items(self):
+        ''' generator - (item, item_data) for each top-level schema item, as it is completed '''
+        schema = self.layer_query_helper.proposal.get('schema')
+
+        for item in schema:
+            item_data = self._populate_data_from_item(item, 0, '')
+            self.data.update(item_data)
+            yield item, item_data
+
     def _populate_data_from_item(self, item, repetition, suffix, sqs_value=None):
         item_data = {}
         sqs_dict = None
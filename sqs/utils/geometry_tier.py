@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+import logging
+logger = logging.getLogger(__name__)
+
+TIER_DIR = 'tier'
+REP_POINT = 'rep_point'
+POLYGON_GEOM_TYPES = ['Polygon', 'MultiPolygon']
+
+
+def build_geometry_tier(gdf):
+    '''
+    Low resolution geometry tier of a layer (split file), one row per feature, in the same row order as gdf:
+        geometry  -- convex hull of the feature (contains the feature) --> hull does not intersect  ==> feature is definitely out
+        rep_point -- point guaranteed to be inside the feature         --> rep_point intersects     ==> feature is definitely in
+
+    rep_point is None for invalid and empty geometries - these always need an exact check.
+
+    Returns: GeoDataFrame
+    '''
+    geometry = np.asarray(gdf.geometry.values)
+    valid = shapely.is_valid(geometry) & ~shapely.is_empty(geometry)
+
+    rep_point = np.full(len(gdf), None, dtype=object)
+    rep_point[valid] = shapely.point_on_surface(geometry[valid])
+
+    return gpd.GeoDataFrame(
+        {REP_POINT: gpd.GeoSeries(rep_point, crs=gdf.crs)},
+        geometry=gpd.GeoSeries(shapely.convex_hull(geometry), crs=gdf.crs),
+    )
+
+
+def make_valid(geometry):
+    ''' same rule as gpd.overlay(make_valid=True) - invalid geometries made valid, only if all geometries are polygons '''
+    geometry = gpd.GeoSeries(geometry).reset_index(drop=True)
+    if geometry.geom_type.isin(POLYGON_GEOM_TYPES).all():
+        invalid = ~geometry.is_valid
+        if invalid.any():
+            geometry = geometry.copy()
+            geometry[invalid] = geometry[invalid].make_valid()
+    return np.asarray(geometry.values)
+
+
+def intersecting_rows(layer_gdf, shapefile_gdf, tier_gdf, clip=True):
+    '''
+    Rows of layer_gdf for the (layer feature, shapefile feature) pairs that intersect - the same rows, in the same order
+    (sorted by layer row, then shapefile row), as
+
+        layer_gdf.overlay(shapefile_gdf[['geometry']], how='intersection', keep_geom_type=False)
+
+    Features are classified using tier_gdf (see build_geometry_tier()):
+        1. hull does not intersect the shapefile feature  --> definitely out
+        2. rep_point intersects the shapefile feature     --> definitely in
+        3. otherwise, exact intersects check against the full resolution geometry
+
+    The attribute columns are the same as the overlay result. The geometry column holds the intersection geometry of each
+    pair (as the overlay result) if clip, otherwise the layer feature geometry - for callers that only read the attribute
+    columns, skipping the intersection of the matching features.
+
+    Returns: GeoDataFrame, or None if the tier cannot be used (caller must use gpd.overlay)
+    '''
+    if tier_gdf is None or len(tier_gdf) != len(layer_gdf):
+        return None
+
+    geom_types = pd.concat([layer_gdf.geom_type, shapefile_gdf.geom_type])
+    if (geom_types == 'GeometryCollection').any():
+        # gpd.overlay raises an error for GeometryCollections
+        return None
+
+    shapefile_geometry = make_valid(shapefile_gdf.geometry)
+    shapely.prepare(shapefile_geometry)
+
+    # 1. hull --> candidate pairs (tree index is the layer row)
+    tree = shapely.STRtree(np.asarray(tier_gdf.geometry.values))
+    idx_shapefile, idx_layer = tree.query(shapefile_geometry, predicate='intersects')
+
+    # 2. rep_point --> definitely in
+    rep_point = np.asarray(tier_gdf[REP_POINT].values)[idx_layer]
+    has_rep_point = ~shapely.is_missing(rep_point)
+    definitely_in = np.zeros(len(idx_layer), dtype=bool)
+    definitely_in[has_rep_point] = shapely.intersects(shapefile_geometry[idx_shapefile[has_rep_point]], rep_point[has_rep_point])
+
+    # 3. exact check for the remaining candidate pairs
+    exact = ~definitely_in
+    intersects = definitely_in.copy()
+    layer_geometry = make_valid(layer_gdf.geometry) if exact.any() or clip else None
+    if exact.any():
+        intersects[exact] = shapely.intersects(shapefile_geometry[idx_shapefile[exact]], layer_geometry[idx_layer[exact]])
+
+    idx_layer = idx_layer[intersects]
+    idx_shapefile = idx_shapefile[intersects]
+    order = np.lexsort((idx_shapefile, idx_layer))
+
+    logger.debug(
+        f'Geometry tier: features {len(layer_gdf)}, candidates {len(exact)}, definitely in {definitely_in.sum()}, exact checks {exact.sum()}'
+    )
+    rows_gdf = layer_gdf.iloc[idx_layer[order]].reset_index(drop=True)
+    if clip:
+        geometry = shapely.intersection(layer_geometry[idx_layer[order]], shapefile_geometry[idx_shapefile[order]])
+        rows_gdf[rows_gdf.geometry.name] = gpd.GeoSeries(geometry, index=rows_gdf.index, crs=layer_gdf.crs)
+    return rows_gdf
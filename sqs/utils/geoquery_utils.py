@@ -13,12 +13,24 @@ import os
 import io
 import pytz
 import traceback
+import hashlib
+from pathlib import Path
 from datetime import datetime
 import time
 import itertools
-
-from sqs.components.gisquery.models import Layer #, Feature#, LayerHistory
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from collections import deque, OrderedDict
+from functools import lru_cache, cached_property
+from pyproj import CRS, Transformer
+from concurrent.futures import ThreadPoolExecutor
+
+from sqs.components.gisquery.models import Layer, SpatialResultCache #, Feature#, LayerHistory
 from sqs.utils.loader_utils import DbLayerProvider, print_system_memory_stats
+from sqs.utils.layer_cache import LayerCache
+from sqs.utils.geometry_tier import intersecting_rows
+from sqs.utils import predicate_engine
 from sqs.utils.helper import (
     DefaultOperator,
     #HelperUtils,
@@ -44,17 +56,77 @@ DATETIME_FMT = '%Y-%m-%d %H:%M:%S'
 RESPONSE_LEN = 75
 
 
+@lru_cache(maxsize=64)
+def get_transformer(src_crs, dst_crs):
+    ''' pyproj Transformer for (src_crs, dst_crs), reused across layers and requests - creating it is costly, using it is not '''
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def to_crs(gdf, crs):
+    ''' Same as gdf.to_crs(crs), using a reused pyproj Transformer. Returns a new gdf (gdf is not modified) '''
+    crs = CRS.from_user_input(crs)
+    if gdf.crs == crs:
+        return gdf.copy()
+
+    transformer = get_transformer(gdf.crs, crs)
+    geometry = shapely.transform(np.asarray(gdf.geometry.values), transformer.transform, include_z=None, interleaved=False)
+    return gdf.set_geometry(gpd.GeoSeries(geometry, index=gdf.index, crs=crs, name=gdf.geometry.name))
+
+
+def attribute_rows(layer_gdf, mask, split_file=None):
+    '''
+    Attribute-only overlay result - the layer rows mask, without the geometry column. Indexed by (split_file, feature_idx),
+    the feature index within the layer split file (or whole layer file), so the geometries can be materialised by a caller 
+    that needs them (DbLayerProvider.get_features()).
+
+    Returns: pd.DataFrame
+    '''
+    columns = layer_gdf.columns.drop(layer_gdf.geometry.name)
+    attr_df = pd.DataFrame(layer_gdf.loc[mask, columns])
+    attr_df.index = pd.MultiIndex.from_arrays([[split_file] * len(attr_df), attr_df.index], names=['split_file', 'feature_idx'])
+    return attr_df
+
+
+def attribute_result(overlay_gdf):
+    '''
+    Overlay result without the geometry column - held in the request overlay memo, and pickled back to the parent process
+    by the query planner pool workers ('Outside' results are close to a full copy of the layer). DefaultOperator only reads 
+    the attribute columns (the projected columns, see DisturbanceLayerQueryHelper.get_layer_columns()).
+    '''
+    if isinstance(overlay_gdf, gpd.GeoDataFrame):
+        return pd.DataFrame(overlay_gdf.drop(columns=overlay_gdf.geometry.name))
+    return overlay_gdf
+
+
 class DisturbanceLayerQueryHelper():
 
     def __init__(self, masterlist_questions, geojson, proposal):
         self.masterlist_questions = masterlist_questions
-        self.geojson = self.read_geojson(geojson)
         self.proposal = proposal
+        self.proposal_geojson = geojson # as received - the query planner pool workers read it again (see sqs.utils.query_planner)
+        self.proposal_part_bounds = None
+        self.geojson = self.read_geojson(geojson)
         self.unprocessed_questions = []
         self.metrics = []
+        self.shapefile_gdfs = {}
+        self.overlay_memo = OrderedDict() # {overlay memo key: (attribute-only overlay result, size in bytes)}
+        self.overlay_memo_bytes = 0
+        self.overlay_memo_stats = dict(hits=0, misses=0)
+        self.planner_chunk_stats = {} # {overlay memo key: chunk_stats} of the query planner work units not yet reported
+        self.planner_stats = dict(executed=0, errors=0) # query planner work units - not counted as overlay memo lookups
+        self.layer_disjoint = {}
+        self.prior_results = {}
+        self.spatial_results = {}
+        self.reuse_stats = dict(reused=0, recomputed=0)
+        self.result_cache_lookups = {}
+        self.result_cache_stats = dict(hits=0, misses=0)
+        self.lazy_stats = dict(evaluated=0, skipped=0)
 
     def read_geojson(self, geojson):
         """ geojson is the user specified shapefile/polygon, used to intersect the layers """
+        if settings.USE_PROPOSAL_PREPROCESSING:
+            return self.preprocess_geojson(geojson)
+
         try:
             shapefile_gdf = gpd.read_file(json.dumps(geojson))
         except Exception as e:
@@ -62,6 +134,139 @@ class DisturbanceLayerQueryHelper():
 
         return shapefile_gdf
 
+    def preprocess_geojson(self, geojson):
+        '''
+        Proposal geometry preprocessing stage (settings.USE_PROPOSAL_PREPROCESSING):
+            1. geometries built directly from the GeoJSON feature dicts (no GDAL round trip)
+            2. invalid geometries repaired (shapely.make_valid)
+            3. dissolved into a single multipart geometry - proposals uploaded from shapefiles often hold hundreds of
+               small/overlapping parts, each of which would otherwise be intersected with every layer feature
+            4. prepared once
+
+        The layer overlays return the same attribute values - the 'Overlapping' rows are one per layer feature instead of
+        one per (layer feature, proposal part) pair, and the answers are de-duplicated downstream.
+
+        self.proposal_part_bounds -- bounding boxes (minx, miny, maxx, maxy) of the dissolved proposal parts, in the proposal
+                                     CRS. Used (in the layer CRS, see get_part_bounds()) to prune layer split files.
+
+        Returns: GeoDataFrame, a single row (no rows if the proposal has no geometries)
+        '''
+        try:
+            if geojson.get('type') == 'FeatureCollection':
+                features = geojson['features']
+            elif geojson.get('type') == 'Feature':
+                features = [geojson]
+            else:
+                features = [dict(geometry=geojson)]
+
+            geometry = np.array([shape(f['geometry']) for f in features if f.get('geometry')], dtype=object)
+            # GeoJSON (RFC 7946) coordinates are WGS84, unless the (legacy) crs member is specified
+            crs = (geojson.get('crs') or {}).get('properties', {}).get('name', 'EPSG:4326')
+        except Exception as e:
+            raise Exception(f'Error reading geojson file: {str(e)}')
+
+        parts_before = int(shapely.get_num_geometries(geometry).sum())
+        vertices_before = int(shapely.get_num_coordinates(geometry).sum())
+
+        invalid = ~shapely.is_valid(geometry)
+        if invalid.any():
+            geometry[invalid] = shapely.make_valid(geometry[invalid])
+
+        geometry = [shapely.union_all(geometry)] if len(geometry) > 0 else []
+        shapefile_gdf = gpd.GeoDataFrame(geometry=geometry, crs=crs)
+        shapely.prepare(np.asarray(shapefile_gdf.geometry.values))
+        self.proposal_part_bounds = self.get_part_bounds(shapefile_gdf)
+
+        logger.info(
+            f'Proposal ID {self.proposal.get("id")}: proposal geometry preprocessed - '
+            f'{invalid.sum()} invalid geometries repaired, parts {parts_before} --> {len(self.proposal_part_bounds)}, '
+            f'vertices {vertices_before} --> {int(shapely.get_num_coordinates(np.asarray(shapefile_gdf.geometry.values)).sum())}'
+        )
+        return shapefile_gdf
+
+    def get_part_bounds(self, shapefile_gdf):
+        ''' bounding boxes (minx, miny, maxx, maxy) of the (multipart) geometry parts of shapefile_gdf. Returns: numpy array (n, 4) '''
+        parts = shapely.get_parts(np.asarray(shapefile_gdf.geometry.values))
+        return shapely.bounds(parts[~shapely.is_empty(parts)]).reshape(-1, 4)
+
+    @cached_property
+    def geometry_hash(self):
+        ''' hash of the normalised (dissolved, normalize()'d) proposal geometry and its CRS '''
+        geometry = shapely.normalize(shapely.union_all(np.asarray(self.geojson.geometry.values)))
+        return hashlib.sha256(shapely.to_wkb(geometry, output_dimension=2) + str(self.geojson.crs).encode()).hexdigest()
+
+    def get_result_key(self, cddp_question, layer):
+        ''' key of a (question, answer, layer definition) result - see set_prior_results() '''
+        return (cddp_question['masterlist_question']['question'], cddp_question['answer_mlq'], json.dumps(layer, sort_keys=True))
+
+    def set_prior_results(self, spatial_results):
+        '''
+        (question, layer) results of the previous requests for the proposal (LayerRequestLog.spatial_results, merged back to
+        the latest FULL request by LayerRequestLog.prior_spatial_results()). spatial_join_gbq() reuses the results computed for the same proposal geometry (geometry_hash) and layer version, 
+        and only recomputes the stale results.
+        '''
+        self.prior_results = {
+            tuple(result['key']): result for result in spatial_results or [] if result.get('geometry_hash') == self.geometry_hash
+        }
+        logger.info(f'Proposal ID {self.proposal.get("id")}: {len(self.prior_results)} prior results for the same proposal geometry')
+
+    def get_prior_result(self, cddp_question, layer, layer_info):
+        ''' prior result of the (question, layer), if the layer version is unchanged. None otherwise '''
+        result = self.prior_results.get(self.get_result_key(cddp_question, layer))
+        if result is not None and result['layer_version'] == layer_info['layer_version']:
+            return result
+        return None
+
+    def get_cached_result(self, layer, layer_info):
+        '''
+        (question, layer) result from the spatial result cache (settings.USE_SPATIAL_RESULT_CACHE) - shared across proposals
+        and systems, see SpatialResultCache. Looked up once per request. None if not cached.
+
+        Returns: dict(operator_response, proponent_answer, assessor_answer)
+        '''
+        if not settings.USE_SPATIAL_RESULT_CACHE:
+            return None
+
+        buffer_size = layer['buffer'] if layer['buffer'] else settings.DEFAULT_BUFFER
+        key = SpatialResultCache.make_key(self.geometry_hash, layer_info, layer, buffer_size)
+        if key not in self.result_cache_lookups:
+            try:
+                self.result_cache_lookups[key] = SpatialResultCache.get_result(key)
+            except Exception as e:
+                logger.error(f'Error reading spatial result cache {layer_info["layer_name"]}\n{str(e)}')
+                self.result_cache_lookups[key] = None
+        return self.result_cache_lookups[key]
+
+    def set_cached_result(self, layer, layer_info, result):
+        ''' adds the (question, layer) result to the spatial result cache (settings.USE_SPATIAL_RESULT_CACHE) '''
+        if not settings.USE_SPATIAL_RESULT_CACHE:
+            return
+
+        self.result_cache_stats['misses'] += 1
+        buffer_size = layer['buffer'] if layer['buffer'] else settings.DEFAULT_BUFFER
+        key = SpatialResultCache.make_key(self.geometry_hash, layer_info, layer, buffer_size)
+        try:
+            SpatialResultCache.set_result(key, self.geometry_hash, layer_info, result)
+            self.result_cache_lookups[key] = result
+        except Exception as e:
+            logger.error(f'Error writing spatial result cache {layer_info["layer_name"]}\n{str(e)}')
+
+    def evict_result_cache(self):
+        ''' evicts the least recently used spatial result cache entries, if results were added by the request - once per request '''
+        if not settings.USE_SPATIAL_RESULT_CACHE or self.result_cache_stats['misses'] == 0:
+            return 0
+
+        try:
+            return SpatialResultCache.evict()
+        except Exception as e:
+            logger.error(f'Error evicting spatial result cache entries\n{str(e)}')
+        return 0
+
+    @property
+    def result_cache_hit_rate(self):
+        lookups = self.result_cache_stats['hits'] + self.result_cache_stats['misses']
+        return round(self.result_cache_stats['hits'] / lookups, 3) if lookups else 0.0
+
     def get_shapefile_gdf(self, layer, layer_crs):
         '''
         1. Converts Polar Projection from EPSG:xxxx (eg. EPSG:4326) in deg to Cartesian Projection (in meters),
@@ -72,14 +277,28 @@ class DisturbanceLayerQueryHelper():
 
         Input: buffer_size -- in meters
 
-        Returns the the original shapefile, perimeter increased/decreased by the buffer size and converted to a common CRS
+        Returns the the original shapefile, perimeter increased/decreased by the buffer size and converted to a common CRS.
+        The result is computed once per request for each (layer_crs, buffer_size) - layers reprojected to the canonical 
+        settings.CRS (Layer.canonical_crs) share the same shapefile_gdf.
+
+        NOTE: the returned gdf (prepared geometries) is shared between layers and must not be modified
         '''
+        buffer_size = layer['buffer'] if layer['buffer'] else settings.DEFAULT_BUFFER
+        key = (layer_crs.lower(), buffer_size)
+        if key not in self.shapefile_gdfs:
+            shapefile_gdf = self._get_shapefile_gdf(layer_crs, buffer_size)
+            # prepared once - reused by the overlay predicates of every layer (and chunk thread) using this gdf
+            shapely.prepare(np.asarray(shapefile_gdf.geometry.values))
+            self.shapefile_gdfs[key] = shapefile_gdf
+        return self.shapefile_gdfs[key]
+
+    def _get_shapefile_gdf(self, layer_crs, buffer_size):
 
         #shapefile_gdf = self.geojson[['geometry']] if 'geometry' in self.geojson else self.geojson
         shapefile_gdf = self.geojson
         if layer_crs.lower() != shapefile_gdf.crs.srs.lower():
             # need a common CRS before overlaying shapefile with layer
-            shapefile_gdf.to_crs(layer_crs, inplace=True)
+            shapefile_gdf = to_crs(shapefile_gdf, layer_crs)
 
         if 'POLYGON' not in str(shapefile_gdf):
             logger.warn(f'Proposal ID {self.proposal.get("id")}: Uploaded Shapefile/Polygon is NOT a POLYGON\n {shapefile_gdf}.')
@@ -87,16 +306,15 @@ class DisturbanceLayerQueryHelper():
         try:
             # if buffer specified in layer definition, increase the perimeter by the buffer amount. Otherwise, 
             # reduce the perimeter by settings.DEFAULT_BUFFER
-            buffer_size = layer['buffer'] if layer['buffer'] else settings.DEFAULT_BUFFER
             if buffer_size and buffer_size != 0:
                 crs_orig =  shapefile_gdf.crs
 
                 # convert to new projection so that buffer can be added in meters
-                shapefile_cart_gdf = shapefile_gdf.to_crs(settings.CRS_CARTESIAN)
+                shapefile_cart_gdf = to_crs(shapefile_gdf, settings.CRS_CARTESIAN)
                 shapefile_cart_gdf['geometry'] = shapefile_cart_gdf['geometry'].buffer(buffer_size)
 
                 # revert to original projection
-                shapefile_buffer_gdf = shapefile_cart_gdf.to_crs(crs_orig)
+                shapefile_buffer_gdf = to_crs(shapefile_cart_gdf, crs_orig)
 
                 return shapefile_buffer_gdf
             
@@ -114,6 +332,97 @@ class DisturbanceLayerQueryHelper():
         attrs = pd.DataFrame(attrs).drop_duplicates().to_dict('r')
         return attrs
 
+    def get_overlay_memo_key(self, layer, layer_info, how, column_name, columns):
+        '''
+        Key of the request-scoped overlay memo - the overlay result for a layer version, buffer and how is computed once 
+        per request and shared by all questions/answers querying the same layer.
+
+        column_name is part of the key for 'Outside' and 'Inside' only (the layer rows selected depend on the column values). 
+        columns (projected attribute columns) is part of the key, since the overlay result holds only those columns.
+        '''
+        buffer_size = layer['buffer'] if layer['buffer'] else settings.DEFAULT_BUFFER
+        column_key = column_name if how in ['Outside', 'Inside'] else None
+        columns_key = tuple(columns) if columns is not None else None
+        return (layer_info['layer_name'], layer_info['layer_version'], buffer_size, how, column_key, columns_key)
+
+    def get_overlay_memo(self, key):
+        ''' attribute-only overlay result in the request overlay memo, or None '''
+        if key not in self.overlay_memo:
+            return None
+        self.overlay_memo.move_to_end(key)
+        return self.overlay_memo[key][0]
+
+    def set_overlay_memo(self, key, overlay_gdf):
+        '''
+        Adds the overlay result (without the geometry column) to the request overlay memo. The least recently used entries 
+        are evicted once the memo exceeds settings.OVERLAY_MEMO_SIZE (MB) - an evicted overlay is re-run by the next question 
+        using it. A result larger than the memo is not stored.
+
+        Returns: the attribute-only overlay result
+        '''
+        attr_df = attribute_result(overlay_gdf)
+        max_bytes = settings.OVERLAY_MEMO_SIZE * 1024**2
+        size = LayerCache.gdf_size(attr_df)
+        if key in self.overlay_memo:
+            self.overlay_memo_bytes -= self.overlay_memo.pop(key)[1]
+        if size > max_bytes:
+            return attr_df
+
+        self.overlay_memo[key] = (attr_df, size)
+        self.overlay_memo_bytes += size
+        while self.overlay_memo_bytes > max_bytes:
+            evicted_key, (evicted_df, evicted_size) = self.overlay_memo.popitem(last=False)
+            self.overlay_memo_bytes -= evicted_size
+            logger.info(f'Overlay memo: evicted {evicted_key[0]}, how {evicted_key[3]} ({evicted_size:,} bytes)')
+        return attr_df
+
+    @property
+    def overlay_memo_hit_rate(self):
+        lookups = self.overlay_memo_stats['hits'] + self.overlay_memo_stats['misses']
+        return round(self.overlay_memo_stats['hits'] / lookups, 3) if lookups else 0.0
+
+    def get_layer_columns(self, layer):
+        '''
+        Layer attribute columns needed to answer the question - layer['column_name'], the proponent_items 'answer' 
+        columns and the assessor_items 'info' columns. Only these columns (plus geometry) are loaded from the layer.
+
+        Returns None (load all columns) if settings.USE_LAYER_COLUMN_PROJECTION is False
+        '''
+        if not settings.USE_LAYER_COLUMN_PROJECTION:
+            return None
+
+        columns = [layer['column_name']]
+        columns += [i['answer'].strip() for i in layer.get('proponent_items', []) if 'answer' in i and i['answer']]
+        columns += [i['info'].strip() for i in layer.get('assessor_items', []) if 'info' in i and i['info']]
+        return list(dict.fromkeys([column for column in columns if column]))
+
+    def get_query_bbox(self, shapefile_gdf, how):
+        '''
+        Bounding box (minx, miny, maxx, maxy) of the buffered proposal geometry, used to read only the layer features 
+        that can intersect it. 
+
+        Returns None (read all features) for how='Outside' and how='Inside' - these need the layer features 
+        outside the proposal to evaluate the column values, so a bbox filtered read would change the result.
+        '''
+        if how in ['Outside', 'Inside'] or shapefile_gdf.empty:
+            return None
+
+        return tuple(shapefile_gdf.total_bounds)
+
+    def get_query_gdf(self, shapefile_gdf, how):
+        '''
+        Query geometry used to skip layer split files whose extent cannot intersect the proposal. 
+
+        Returns None (read all split files) for how='Outside' - features in the skipped split files would be part of the result.
+        'Inside' is evaluated per split file, and a split file outside the proposal contributes no features.
+        '''
+        if how == 'Outside':
+            return None
+
+        # bounding boxes of the proposal parts - the extent of a dissolved multipart proposal would not prune split files 
+        # in the gaps between the parts
+        return gpd.GeoDataFrame(geometry=shapely.box(*self.get_part_bounds(shapefile_gdf).T), crs=shapefile_gdf.crs)
+
     def get_grouped_questions(self, question):
         """
         Return the entire question group. 
@@ -129,14 +438,28 @@ class DisturbanceLayerQueryHelper():
 
         return []
 
-    def set_metrics(self, cddp_question, layer_provider, expired, condition, time_retrieve_layer, time_taken, error):
+    def set_metrics(self, cddp_question, layer_provider, expired, condition, time_retrieve_layer, time_taken, error, overlay_memo_hit=False, 
+                    extent_skipped=False, reused=False, result_cache_hit=False, chunk_stats=None):
+        ''' chunk_stats: layer read stats of the overlay, if it was not run by layer_provider (query planner work unit) '''
+        chunk_stats = chunk_stats if chunk_stats is not None else layer_provider.chunk_stats
         self.metrics.append(
             dict(
                 question=cddp_question['masterlist_question']['question'],
                 answer_mlq=cddp_question['answer_mlq'],
                 expired=expired,
                 layer_name=layer_provider.layer_name,
-                #layer_cached=layer_provider.layer_cached,
+                layer_cached=DbLayerProvider.is_layer_cached(chunk_stats),
+                chunks_read=chunk_stats['chunks_read'],
+                chunks_skipped=chunk_stats['chunks_skipped'],
+                cache_hits=chunk_stats['cache_hits'],
+                cache_misses=chunk_stats['cache_misses'],
+                overlay_memo_hit=overlay_memo_hit,
+                overlay_memo_hit_rate=self.overlay_memo_hit_rate,
+                extent_skipped=extent_skipped,
+                extent_skipped_layers=sum(self.layer_disjoint.values()),
+                reused=reused,
+                result_cache_hit=result_cache_hit,
+                result_cache_hit_rate=self.result_cache_hit_rate,
                 condition=condition,
                 time_retrieve_layer=round(time_retrieve_layer, 3),
                 time=round(time_taken, 3),
@@ -148,53 +471,225 @@ class DisturbanceLayerQueryHelper():
         )
         return self.metrics
 
-    def get_overlay_gdf(self, layer_gdf, shapefile_gdf, how, column_name, layer_name=''):
+    def get_overlay_gdf(self, layer_gdf, shapefile_gdf, how, column_name, layer_name='', tier_gdf=None, split_file=None):
         ''' how = ['intersection','symmetric_difference','difference']
+
+            tier_gdf: geometry tier of layer_gdf (see sqs.utils.geometry_tier). If provided, the intersecting layer rows are 
+                      found from the tier plus exact checks, and the intersection geometries computed for those rows only. 
+            split_file: layer split file of layer_gdf - index of the attribute-only result
+
+            settings.LAYER_OVERLAY_ENGINE:
+                'sindex'  -- matching layer rows from the layer spatial index and prepared proposal geometry predicates, 
+                             intersection geometries computed for the matching rows only (see sqs.utils.predicate_engine)
+                'overlay' -- gpd.overlay intersection/difference
+
+            settings.USE_LAYER_ATTRIBUTE_ONLY:
+                'Outside' and 'Inside' return a DataFrame of the matching layer rows without geometry (see attribute_rows()) - 
+                DefaultOperator only reads the attribute columns, and the geometry is most of the size of these results.
         '''
+        attribute_only = settings.USE_LAYER_ATTRIBUTE_ONLY and how in ['Outside', 'Inside']
 
-        # how='Overlapping' - get layer features 'intersected by' shapefile_gdf
-        overlay_gdf = layer_gdf.overlay(shapefile_gdf[['geometry']], how='intersection', keep_geom_type=False)
-        if how=='Outside':
-            # all layer features completely outside shapefile_gdf
-            overlay_gdf = layer_gdf[~layer_gdf[column_name].isin( overlay_gdf[column_name].unique() )]
+        if settings.LAYER_OVERLAY_ENGINE == predicate_engine.SINDEX:
+            if attribute_only:
+                mask = predicate_engine.overlay_mask(layer_gdf, shapefile_gdf, how, column_name, tier_gdf=tier_gdf)
+                overlay_gdf = attribute_rows(layer_gdf, mask, split_file)
+            else:
+                overlay_gdf = predicate_engine.overlay_rows(layer_gdf, shapefile_gdf, how, column_name, tier_gdf=tier_gdf)
 
-        elif how=='Inside':
-            # all layer features completely within/inside shapefile_gdf
-            diff_gdf = layer_gdf.overlay(shapefile_gdf[['geometry']], how='difference', keep_geom_type=False)
-            overlay_gdf = layer_gdf[~layer_gdf[column_name].isin( diff_gdf[column_name].unique() )]
+        else:
+            # how='Overlapping' - get layer features 'intersected by' shapefile_gdf
+            # intersection geometries not needed for 'Outside' (column_name values only)
+            overlay_gdf = intersecting_rows(layer_gdf, shapefile_gdf, tier_gdf, clip=how!='Outside') if tier_gdf is not None else None
+            if overlay_gdf is None:
+                overlay_gdf = layer_gdf.overlay(shapefile_gdf[['geometry']], how='intersection', keep_geom_type=False)
+            if how=='Outside':
+                # all layer features completely outside shapefile_gdf
+                mask = ~layer_gdf[column_name].isin( overlay_gdf[column_name].unique() )
+                overlay_gdf = attribute_rows(layer_gdf, mask, split_file) if attribute_only else layer_gdf[mask]
+
+            elif how=='Inside':
+                # all layer features completely within/inside shapefile_gdf
+                diff_gdf = layer_gdf.overlay(shapefile_gdf[['geometry']], how='difference', keep_geom_type=False)
+                mask = ~layer_gdf[column_name].isin( diff_gdf[column_name].unique() )
+                overlay_gdf = attribute_rows(layer_gdf, mask, split_file) if attribute_only else layer_gdf[mask]
 
         #if column_name not in overlay_gdf.columns:
         if not overlay_gdf.empty and column_name not in overlay_gdf.columns:
-            _list = HelperUtils.pop_list(overlay_gdf.columns.to_list())
+            # full layer column set - overlay_gdf only holds the columns read for the question (USE_LAYER_COLUMN_PROJECTION)
+            _list = HelperUtils.pop_list(Layer.available_attributes(layer_name, default=overlay_gdf.columns.to_list()))
             error_msg = f'Property Name "{column_name}" not found in layer "{layer_name}".\nAvailable properties are "{_list}".'
             logger.error(error_msg)
 
         return overlay_gdf
 
-    def get_overlay_gdf_generator(self, layer_gdf_gen, shapefile_gdf, how, column_name, layer_name=''):
+    def get_overlay_gdf_generator(self, layer_gdf_gen, shapefile_gdf, how, column_name, layer_name='', layer_provider=None):
         '''
         Build overlay results from a layer generator one chunk at a time.
         This avoids loading the full layer into memory before overlaying.
-        '''
-        overlay_chunks = []
-        overlay_template = None
 
-        for idx, split_file, layer_gdf in layer_gdf_gen:
+        layer_provider: DbLayerProvider, provides the geometry tier of each chunk (not used for how='Inside')
+
+        settings.LAYER_CHUNK_CONCURRENCY > 1 -- chunks are overlaid concurrently in a thread pool (shapely 2 releases the GIL 
+            for the vectorised predicates and set operations). Chunks are still read one at a time from the generator, and 
+            at most settings.LAYER_CHUNK_MAX_IN_FLIGHT chunks are held in memory. Results are concatenated in chunk order.
+        '''
+        def overlay_chunk(idx, split_file, layer_gdf):
+            start_time = time.time()
             logger.info(f'[CHUNKED_LAYER_PATH] layer={layer_name} split_file={split_file} idx={idx}')
             print_system_memory_stats(f'Processing split layer chunk {split_file}')
-            overlay_gdf = self.get_overlay_gdf(layer_gdf, shapefile_gdf, how, column_name, layer_name)
-            if overlay_template is None:
-                overlay_template = overlay_gdf.iloc[0:0].copy()
-            if not overlay_gdf.empty:
-                overlay_chunks.append(overlay_gdf)
-
-            HelperUtils.force_gc([layer_gdf, overlay_gdf])
+            tier_gdf = layer_provider.get_geometry_tier(split_file) if layer_provider and how != 'Inside' else None
+            overlay_gdf = self.get_overlay_gdf(
+                layer_gdf, shapefile_gdf, how, column_name, layer_name, tier_gdf=tier_gdf, split_file=split_file
+            )
+            return overlay_gdf, time.time() - start_time
+
+        start_time = time.time()
+        concurrency = settings.LAYER_CHUNK_CONCURRENCY
+        results = []
+        if concurrency > 1:
+            # shared proposal geometries must be prepared before they are used by several threads (no-op if already prepared)
+            shapely.prepare(np.asarray(shapefile_gdf.geometry.values))
+
+            in_flight = deque()
+            max_in_flight = max(settings.LAYER_CHUNK_MAX_IN_FLIGHT, concurrency)
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for idx, split_file, layer_gdf in layer_gdf_gen:
+                    in_flight.append(executor.submit(overlay_chunk, idx, split_file, layer_gdf))
+                    del layer_gdf
+                    while len(in_flight) >= max_in_flight:
+                        # oldest chunk first - results stay in chunk order
+                        results.append(in_flight.popleft().result())
+
+                while in_flight:
+                    results.append(in_flight.popleft().result())
+            HelperUtils.force_gc()
+        else:
+            for idx, split_file, layer_gdf in layer_gdf_gen:
+                results.append(overlay_chunk(idx, split_file, layer_gdf))
+                HelperUtils.force_gc([layer_gdf])
+
+        chunk_time = sum(elapsed for _, elapsed in results)
+        logger.info(
+            f'Chunk overlay {layer_name}: {len(results)} chunks, concurrency {concurrency}, time {round(time.time() - start_time, 3)}s, '
+            f'serial chunk time {round(chunk_time, 3)}s'
+        )
 
+        overlay_template = results[0][0].iloc[0:0].copy() if results else None
+        overlay_chunks = [overlay_gdf for overlay_gdf, _ in results if not overlay_gdf.empty]
+        if overlay_chunks and not isinstance(overlay_chunks[0], gpd.GeoDataFrame):
+            # attribute-only results - keep the (split_file, feature_idx) index
+            return pd.concat(overlay_chunks)
         if overlay_chunks:
             return gpd.GeoDataFrame(pd.concat(overlay_chunks, ignore_index=True), crs=shapefile_gdf.crs)
 
         return overlay_template if overlay_template is not None else gpd.GeoDataFrame()
 
+    def is_layer_expired(self, layer, today):
+        ''' True if the question layer definition has expired (layer['expiry'] before today) '''
+        layer_question_expiry = datetime.strptime(layer['expiry'], DATE_FMT).date() if layer['expiry'] else None
+        return layer_question_expiry is not None and layer_question_expiry < today.date()
+
+    def get_layer_disjoint_key(self, layer, layer_info):
+        buffer_size = layer['buffer'] if layer['buffer'] else settings.DEFAULT_BUFFER
+        return (layer_info['layer_name'], layer_info['layer_version'], buffer_size)
+
+    def is_extent_skipped(self, layer, layer_info):
+        '''
+        True if the layer overlay was run without spatial predicates (see get_layer_overlay_gdf()) - the result of the
+        is_layer_disjoint() check already run for the overlay, the check is not run again
+        '''
+        return self.layer_disjoint.get(self.get_layer_disjoint_key(layer, layer_info), False)
+
+    def is_layer_disjoint(self, layer, layer_provider, layer_info):
+        '''
+        True if the buffered proposal cannot intersect any feature of the layer version (settings.USE_LAYER_EXTENT_PREFILTER) - 
+        checked against the layer extent and coverage hull recorded at load time, before any layer split file is read. 
+        Memoised per (layer name, version, buffer).
+        '''
+        if not settings.USE_LAYER_EXTENT_PREFILTER:
+            return False
+
+        key = self.get_layer_disjoint_key(layer, layer_info)
+        if key not in self.layer_disjoint:
+            shapefile_gdf = self.get_shapefile_gdf(layer, layer_info['layer_crs'])
+            self.layer_disjoint[key] = not layer_provider.get_layer_obj().extent_intersects(shapefile_gdf)
+            if self.layer_disjoint[key]:
+                logger.info(f'Layer {layer_info["layer_name"]} (version {layer_info["layer_version"]}) skipped - extent does not intersect the proposal')
+        return self.layer_disjoint[key]
+
+    def get_disjoint_overlay_gdf(self, layer, layer_provider, columns):
+        '''
+        Overlay result for a layer the proposal cannot intersect (see is_layer_disjoint()), without any spatial predicates:
+
+            Overlapping, Inside -- no layer rows (no layer split files read)
+            Outside             -- all layer rows (no layer feature column_name value intersects the proposal)
+
+        Returns: layer_info, overlay_gdf
+        '''
+        layer_obj = layer_provider.get_layer_obj()
+        if layer['how'] != 'Outside':
+            attributes = layer_obj.project_columns(columns) if columns is not None else layer_obj.attributes
+            overlay_gdf = gpd.GeoDataFrame(columns=attributes + ['geometry'], geometry='geometry', crs=layer_obj.crs)
+            return layer_provider.get_layer_info(), overlay_gdf
+
+        layer_info, layer_gdf_gen = layer_provider.get_layer_generator(columns=columns)
+        overlay_chunks = []
+        for idx, split_file, layer_gdf in layer_gdf_gen:
+            if settings.USE_LAYER_ATTRIBUTE_ONLY:
+                overlay_chunks.append(attribute_rows(layer_gdf, np.ones(len(layer_gdf), dtype=bool), split_file))
+            else:
+                overlay_chunks.append(layer_gdf)
+
+        if overlay_chunks and settings.USE_LAYER_ATTRIBUTE_ONLY:
+            return layer_info, pd.concat(overlay_chunks)
+        if overlay_chunks:
+            return layer_info, gpd.GeoDataFrame(pd.concat(overlay_chunks, ignore_index=True), crs=layer_obj.crs)
+        return layer_info, gpd.GeoDataFrame()
+
+    def get_layer_overlay_gdf(self, layer, layer_provider, layer_info, columns):
+        '''
+        Overlay of the proposal with the layer of the question layer definition - without spatial predicates if the proposal 
+        cannot intersect the layer (settings.USE_LAYER_EXTENT_PREFILTER), evaluated in PostGIS (Layer.postgis), from the 
+        layer split files (settings.USE_LAYER_SPLIT_FILES), or from the whole layer gdf
+
+        Returns: layer_info, overlay_gdf
+        '''
+        layer_name = layer['layer']['layer_name']
+        how = layer['how']
+        column_name = layer['column_name']
+
+        shapefile_gdf = self.get_shapefile_gdf(layer, layer_info['layer_crs'])
+        if self.is_layer_disjoint(layer, layer_provider, layer_info):
+            layer_info, overlay_gdf = self.get_disjoint_overlay_gdf(layer, layer_provider, columns)
+        elif layer_provider.use_postgis:
+            # overlay evaluated in the PostGIS layer table
+            layer_info, overlay_gdf = layer_provider.get_overlay_gdf(shapefile_gdf, how, column_name, columns=columns)
+        elif settings.USE_LAYER_SPLIT_FILES:
+            bbox = self.get_query_bbox(shapefile_gdf, how)
+            query_gdf = self.get_query_gdf(shapefile_gdf, how)
+            layer_info, layer_gdf_gen = layer_provider.get_layer_generator(columns=columns, bbox=bbox, query_gdf=query_gdf)
+            overlay_gdf = self.get_overlay_gdf_generator(
+                layer_gdf_gen, shapefile_gdf, how, column_name, layer_name=layer_name, layer_provider=layer_provider
+            )
+        else:
+            layer_info, layer_gdf = layer_provider.get_layer(columns=columns)
+            # mem_usage = round(float(layer_gdf.memory_usage(index=True).sum()/1024**2), 2)
+            # print_system_memory_stats(f'{layer_name}, gdf mem_usage {mem_usage} MB')
+            layer_filename = Path(layer_provider.get_layer_obj().geojson_file.path).name
+            overlay_gdf = self.get_overlay_gdf(layer_gdf, shapefile_gdf, how, column_name, layer_name, split_file=layer_filename)
+            HelperUtils.force_gc([layer_gdf])
+
+        return layer_info, overlay_gdf
+
+    def get_ordered_questions(self, cddp_questions, answers):
+        ''' cddp_questions in the order of answers (schema option labels) - questions not answering any of the options are excluded '''
+        ordered = []
+        for answer in answers:
+            for cddp_question in cddp_questions:
+                if cddp_question['answer_mlq'].casefold() == answer.casefold() and not any(q is cddp_question for q in ordered):
+                    ordered.append(cddp_question)
+        return ordered
+
     def spatial_join_gbq(self, question, widget_type):
         '''
         Process new Question (grouping by like-questions) and results stored in cache 
@@ -204,6 +699,19 @@ class DisturbanceLayerQueryHelper():
               It is CPU cost effective to query all questions for the same layer now, and cache results for 
               subsequent potential question/answer queries.
         '''
+        return list(self.spatial_join_gbq_iter(question, widget_type))
+
+    def spatial_join_gbq_iter(self, question, widget_type, answers=None):
+        '''
+        Generator version of spatial_join_gbq() - yields the result for each question in the question group, as it is 
+        evaluated (all layers of the question). The caller stops the evaluation by not consuming the remaining results
+        (eg. find_radiobutton()/find_select() stop at the first option found).
+
+        answers: schema option labels - questions are evaluated in the order of the options, questions not answering any 
+                 option are not evaluated. All questions, in question group order, if None.
+
+        The (question, layer) pairs not evaluated are counted in self.lazy_stats['skipped'].
+        '''
 
         def unique_list(_list):
             return list(set(_list))
@@ -217,16 +725,22 @@ class DisturbanceLayerQueryHelper():
             layer_info = {}
             expired = False
             layer_res = []
-            question_group_res = []
+            evaluated = 0
+            total = 0
 
             grouped_questions = self.get_grouped_questions(question)
             if len(grouped_questions)==0:
-                return question_group_res
+                return
+
+            cddp_questions = grouped_questions['questions']
+            total = sum(len(cddp_question['layers']) for cddp_question in cddp_questions)
+            if answers is not None:
+                cddp_questions = self.get_ordered_questions(cddp_questions, answers)
 
 #            if grouped_questions['questions'][0]['masterlist_question']['question'] == '2.0 What is the land tenure or classification?':
 #                import ipdb; ipdb.set_trace()
 
-            for cddp_question in grouped_questions['questions']:
+            for cddp_question in cddp_questions:
                 start_time = time.time()
 
                 layer_res = []
@@ -236,7 +750,7 @@ class DisturbanceLayerQueryHelper():
                     layer_url = layer['layer']['layer_url']
 
                     layer_question_expiry = datetime.strptime(layer['expiry'], DATE_FMT).date() if layer['expiry'] else None
-                    if layer_question_expiry is None or layer_question_expiry >= today.date():
+                    if not self.is_layer_expired(layer, today):
 
                         start_time_retrieve_layer = time.time()
 
@@ -249,6 +763,7 @@ class DisturbanceLayerQueryHelper():
                         column_name = layer['column_name']
                         operator = layer['operator']
                         value = layer['value']
+                        columns = self.get_layer_columns(layer)
 
                         print_system_memory_stats(f'Ready to load layer {layer_name}')
                         layer_provider = DbLayerProvider(layer_name, url=layer_url)
@@ -257,33 +772,70 @@ class DisturbanceLayerQueryHelper():
                         #print_system_memory_stats(f'{layer_name}, gdf mem_usage {mem_usage} MB')
                         #overlay_gdf = self.get_overlay_gdf(layer_gdf, shapefile_gdf, how, column_name)
                         logger.info(f'USE_LAYER_SPLIT_FILES: {settings.USE_LAYER_SPLIT_FILES}')
-                        if settings.USE_LAYER_SPLIT_FILES:
-                            layer_info, layer_gdf_gen = layer_provider.get_layer_generator()
-                            shapefile_gdf = self.get_shapefile_gdf(layer, layer_info['layer_crs'])
-                            overlay_gdf = self.get_overlay_gdf_generator(layer_gdf_gen, shapefile_gdf, how, column_name, layer_name=layer_name)
-                            layer_gdf = None
+                        layer_info = layer_provider.get_layer_info()
+                        result_key = self.get_result_key(cddp_question, layer)
+                        prior_result = self.get_prior_result(cddp_question, layer, layer_info)
+                        if prior_result is not None:
+                            # REFRESH request - same proposal geometry and layer version as the prior request
+                            self.reuse_stats['reused'] += 1
+                            res = dict(prior_result['res'], reused=True)
+                            layer_res.append(res)
+                            self.spatial_results[result_key] = dict(prior_result, res=res)
+                            self.set_metrics(
+                                cddp_question, layer_provider, expired, res['condition'][1], time_retrieve_layer, time.time() - start_time, 
+                                error=None, reused=True
+                            )
+                            logger.info(f'Result reused from prior request {layer_name}, version {layer_info["layer_version"]}')
+                            continue
+
+                        self.reuse_stats['recomputed'] += 1
+                        overlay_gdf = None
+                        overlay_memo_hit = False
+                        chunk_stats = None
+                        cached_result = self.get_cached_result(layer, layer_info)
+                        result_cache_hit = cached_result is not None
+                        if result_cache_hit:
+                            # same proposal geometry, layer version and question layer definition - any proposal/system
+                            self.result_cache_stats['hits'] += 1
+                            operator_result = cached_result['operator_response']
+                            proponent_answer = cached_result['proponent_answer']
+                            assessor_answer = cached_result['assessor_answer']
+                            logger.info(f'Result retrieved from spatial result cache {layer_name}, version {layer_info["layer_version"]}')
                         else:
-                            layer_info, layer_gdf = layer_provider.get_layer()
-                            shapefile_gdf = self.get_shapefile_gdf(layer, layer_info['layer_crs'])
-                            # mem_usage = round(float(layer_gdf.memory_usage(index=True).sum()/1024**2), 2)
-                            # print_system_memory_stats(f'{layer_name}, gdf mem_usage {mem_usage} MB')
-                            overlay_gdf = self.get_overlay_gdf(layer_gdf, shapefile_gdf, how, column_name, layer_name)
-
-                        op = DefaultOperator(layer, overlay_gdf, widget_type)
-                        # Existing behavior kept for reference (prefix was always added, even for empty spatial results):
-                        # operator_result  = op.answer_prefix('proponent_items') + unique_list(op.operator_result())
-                        # proponent_answer = to_str(op.answer_prefix('proponent_items') + unique_list(op.proponent_answer()))
-                        # assessor_answer  = to_str(op.answer_prefix('assessor_items') + unique_list(op.assessor_answer()))
-
-                        # Only include prefixes when there is at least one real result row.
-                        # This prevents prefix-only responses from being treated as a valid intersection result.
-                        operator_values = unique_list(op.operator_result())
-                        proponent_values = unique_list(op.proponent_answer())
-                        assessor_values = unique_list(op.assessor_answer())
-
-                        operator_result = op.answer_prefix('proponent_items') + operator_values if operator_values else []
-                        proponent_answer = to_str(op.answer_prefix('proponent_items') + proponent_values) if proponent_values else ''
-                        assessor_answer = to_str(op.answer_prefix('assessor_items') + assessor_values) if assessor_values else ''
+                            memo_key = self.get_overlay_memo_key(layer, layer_info, how, column_name, columns)
+                            overlay_gdf = self.get_overlay_memo(memo_key)
+                            overlay_memo_hit = overlay_gdf is not None
+                            if overlay_memo_hit:
+                                # same layer version/buffer/how already overlaid for another question/answer in this request
+                                self.overlay_memo_stats['hits'] += 1
+                                # overlay run by the query planner - its layer reads are reported against the first question using it
+                                chunk_stats = self.planner_chunk_stats.pop(memo_key, None)
+                                logger.info(f'Overlay result retrieved from request memo {layer_name}, version {layer_info["layer_version"]}')
+                            else:
+                                self.overlay_memo_stats['misses'] += 1
+                                layer_info, overlay_gdf = self.get_layer_overlay_gdf(layer, layer_provider, layer_info, columns)
+                                overlay_gdf = self.set_overlay_memo(memo_key, overlay_gdf)
+
+                            op = DefaultOperator(layer, overlay_gdf, widget_type)
+                            # Existing behavior kept for reference (prefix was always added, even for empty spatial results):
+                            # operator_result  = op.answer_prefix('proponent_items') + unique_list(op.operator_result())
+                            # proponent_answer = to_str(op.answer_prefix('proponent_items') + unique_list(op.proponent_answer()))
+                            # assessor_answer  = to_str(op.answer_prefix('assessor_items') + unique_list(op.assessor_answer()))
+
+                            # Only include prefixes when there is at least one real result row.
+                            # This prevents prefix-only responses from being treated as a valid intersection result.
+                            operator_values = unique_list(op.operator_result())
+                            proponent_values = unique_list(op.proponent_answer())
+                            assessor_values = unique_list(op.assessor_answer())
+
+                            operator_result = op.answer_prefix('proponent_items') + operator_values if operator_values else []
+                            proponent_answer = to_str(op.answer_prefix('proponent_items') + proponent_values) if proponent_values else ''
+                            assessor_answer = to_str(op.answer_prefix('assessor_items') + assessor_values) if assessor_values else ''
+
+                            self.set_cached_result(
+                                layer, layer_info, 
+                                dict(operator_response=operator_result, proponent_answer=proponent_answer, assessor_answer=assessor_answer)
+                            )
 
                         logger.info(f'Operator Result: {operator_result}'[:200])
                         condition = f'{column_name} -- {operator}'
@@ -300,35 +852,45 @@ class DisturbanceLayerQueryHelper():
                                 operator_response=operator_result,
                                 proponent_answer=proponent_answer,
                                 assessor_answer=assessor_answer,
+                                reused=False,
                             )
                         layer_res.append(res)
+                        self.spatial_results[result_key] = dict(
+                            key=list(result_key), geometry_hash=self.geometry_hash, layer_version=layer_info['layer_version'], res=res
+                        )
 
-                        self.set_metrics(cddp_question, layer_provider, expired, condition, time_retrieve_layer, time.time() - start_time, error=None)
+                        self.set_metrics(
+                            cddp_question, layer_provider, expired, condition, time_retrieve_layer, time.time() - start_time, error=None, 
+                            overlay_memo_hit=overlay_memo_hit, extent_skipped=not result_cache_hit and self.is_extent_skipped(layer, layer_info), 
+                            result_cache_hit=result_cache_hit, chunk_stats=chunk_stats
+                        )
                         logger.info(f'Time Taken: {round(time.time() - start_time, 3)} secs')
 
-                        HelperUtils.force_gc([layer_gdf, overlay_gdf, shapefile_gdf])
+                        HelperUtils.force_gc([overlay_gdf])
                     else:
                         logger.warn(f'Expired {layer_question_expiry}: Ignoring question {cddp_question["masterlist_question"]["question"]} - {layer_name}')
                         expired = True
 
-                question_group_res.append(
-                    dict(
-                        question=cddp_question['masterlist_question']['question'],
-                        answer=cddp_question['answer_mlq'],
-                        other_data=cddp_question['other_data'],
-                        layers=layer_res,
-                    )
+                evaluated += len(cddp_question['layers'])
+                self.lazy_stats['evaluated'] += len(cddp_question['layers'])
+                yield dict(
+                    question=cddp_question['masterlist_question']['question'],
+                    answer=cddp_question['answer_mlq'],
+                    other_data=cddp_question['other_data'],
+                    layers=layer_res,
                 )
 
         except Exception as e: 
             logger.error(e)
             #self.set_metrics(cddp_question, layer_provider, expired, condition, time_retrieve_layer, time.time() - start_time, error=e)
 
+        finally:
+            # (question, layer) pairs not evaluated - generator closed early, or questions not answering the options
+            self.lazy_stats['skipped'] += total - evaluated
+
 #        if grouped_questions['questions'][0]['masterlist_question']['question'] == '2.0 What is the land tenure or classification?':
 #            import ipdb; ipdb.set_trace()
 
-        return question_group_res
-
     def query_question(self, item, answer_type):
 
         def set_metric_result(response):
@@ -390,67 +952,74 @@ class DisturbanceLayerQueryHelper():
         '''
         response = {}
         question = {}
+        question_iter = None
         try:
             schema_question  = item['label']
             schema_section = item['name']
             item_options   = item['options']
 
             #processed_questions = self.get_processed_question(schema_question, widget_type=item['type'])
-            processed_questions = self.spatial_join_gbq(schema_question, widget_type=item['type'])
-            if len(processed_questions)==0:
-                return {}
+            #processed_questions = self.spatial_join_gbq(schema_question, widget_type=item['type'])
+            # questions evaluated in the order the rb's appear in 'item_options' (schema question) - the first question with 
+            # an operator_response is the first checked radiobutton, the remaining questions are not evaluated
+            question_iter = self.spatial_join_gbq_iter(
+                schema_question, widget_type=item['type'], answers=[i['label'] for i in item_options]
+            )
+            processed_questions = question_iter if settings.USE_LAZY_EVALUATION else list(question_iter)
 
-            layer_details=[]
-            for item in item_options:
+            for question in processed_questions:
+                # first option answered by the question
+                item = next(i for i in item_options if i['label'].casefold() == question['answer'].casefold())
                 label = item['label']
                 value = item['value']
-                # return first checked radiobutton in order rb's appear in 'item_option_labels' (schema question)
-                for question in processed_questions:
-                    for layer in question['layers']:
-                        #details = question['layer_details']
-                        details = layer['layer_details']
-                        #if label not in result and label.casefold() == question['answer'].casefold() and len(layer['operator_response'])>0:
-                        if label.casefold() == question['answer'].casefold() and len(layer['operator_response'])>0:
+                for layer in question['layers']:
+                    #details = question['layer_details']
+                    details = layer['layer_details']
+                    if len(layer['operator_response'])>0:
 
-                            raw_data = layer
-                            # details = raw_data.pop('layer_details', None)
-                            # to avoid missing the original layer details when pop() mutates the layer dict, we use get() instead to read layer_details without mutating the original dict.
-                            details = raw_data.get('layer_details', None)
+                        raw_data = layer
+                        # details = raw_data.pop('layer_details', None)
+                        # to avoid missing the original layer details when pop() mutates the layer dict, we use get() instead to read layer_details without mutating the original dict.
+                        details = raw_data.get('layer_details', None)
 
-                            # Returned immediately with only the single matching layer's details,
-                            # meaning layer_name in details reflected only one layer even when multiple
-                            response =  dict(
-                                result=label,
-                                assessor_info=[],
-                                layer_details=[dict(name=schema_section, label=value, details=details, question=question)],
-                            )
+                        # Returned immediately with only the single matching layer's details,
+                        # meaning layer_name in details reflected only one layer even when multiple
+                        response =  dict(
+                            result=label,
+                            assessor_info=[],
+                            layer_details=[dict(name=schema_section, label=value, details=details, question=question)],
+                        )
 
-                            # this was the first solution tried to aggregate all matched layers for the question for showing all the intersected layers in the UI but now done in frontend as we were already getting layer_details in dict.
-                            # Override details['layer_name'] with the aggregated list
-                            # instead of only the single matched layer's name.
-                            # Aggregate first, before mutating the matched layer with pop().
-                            # If we pop first, the current layer may lose layer_details and be excluded.
-                            # layer_name_agg = list(set([
-                            #     lyr['layer_details']['layer_name']
-                            #     for lyr in question['layers']
-                            #     if lyr.get('operator_response') and lyr.get('layer_details')
-                            # ]))
-                            # if not layer_name_agg and details and details.get('layer_name'):
-                            #     layer_name_agg = [details.get('layer_name')]
-                            # details_with_agg = dict(details, layer_name=layer_name_agg) if details else {'layer_name': layer_name_agg}
-                            # response = dict(
-                            #     result=label,
-                            #     assessor_info=[],
-                            #     layer_details=[dict(name=schema_section, label=value, details=details_with_agg, question=question)],
-                            # )
-
-                            return response
-                        else:
-                            #logger.warn(f'Iterating Layers - \'{question["question"][:25]} ...\': operator_response {layer["operator_response"]} not found from layer details["layer_name"]')
-                            pass
+                        # this was the first solution tried to aggregate all matched layers for the question for showing all the intersected layers in the UI but now done in frontend as we were already getting layer_details in dict.
+                        # Override details['layer_name'] with the aggregated list
+                        # instead of only the single matched layer's name.
+                        # Aggregate first, before mutating the matched layer with pop().
+                        # If we pop first, the current layer may lose layer_details and be excluded.
+                        # layer_name_agg = list(set([
+                        #     lyr['layer_details']['layer_name']
+                        #     for lyr in question['layers']
+                        #     if lyr.get('operator_response') and lyr.get('layer_details')
+                        # ]))
+                        # if not layer_name_agg and details and details.get('layer_name'):
+                        #     layer_name_agg = [details.get('layer_name')]
+                        # details_with_agg = dict(details, layer_name=layer_name_agg) if details else {'layer_name': layer_name_agg}
+                        # response = dict(
+                        #     result=label,
+                        #     assessor_info=[],
+                        #     layer_details=[dict(name=schema_section, label=value, details=details_with_agg, question=question)],
+                        # )
+
+                        return response
+                    else:
+                        #logger.warn(f'Iterating Layers - \'{question["question"][:25]} ...\': operator_response {layer["operator_response"]} not found from layer details["layer_name"]')
+                        pass
 
         except Exception as e:
             logger.error(f'RADIOBUTTON: Searching Question in SQS processed_questions dict: \'{question}\'\n{e}')
+        finally:
+            if question_iter is not None:
+                # stops the evaluation of the remaining questions (counted as skipped, see spatial_join_gbq_iter())
+                question_iter.close()
 
         return response
 
@@ -514,13 +1083,17 @@ class DisturbanceLayerQueryHelper():
         '''
         response = {}
         question = {}
+        question_iter = None
         try:
             schema_question  = item['label']
             schema_section = item['name']
             item_options   = item['options']
 
             #processed_questions = self.get_processed_question(schema_question, widget_type=item['type'])
-            processed_questions = self.spatial_join_gbq(schema_question, widget_type=item['type'])
+            #processed_questions = self.spatial_join_gbq(schema_question, widget_type=item['type'])
+            # questions evaluated in question group order - the remaining questions are not evaluated once a label is found
+            question_iter = self.spatial_join_gbq_iter(schema_question, widget_type=item['type'])
+            processed_questions = question_iter if settings.USE_LAZY_EVALUATION else list(question_iter)
 #            if len(processed_questions) != 1:
 #                # for multi-select questions, there must be only one question
 #                logger.error(f'SELECT: For select question, there must be only one question, {len(processed_questions)} found: \'{question}\'')
@@ -560,6 +1133,10 @@ class DisturbanceLayerQueryHelper():
 
         except Exception as e:
             logger.error(f'SELECT: Searching Question in SQS processed_questions dict: \'{question}\'\n{e}')
+        finally:
+            if question_iter is not None:
+                # stops the evaluation of the remaining questions (counted as skipped, see spatial_join_gbq_iter())
+                question_iter.close()
 
         return response
 
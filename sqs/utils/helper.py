@@ -3,14 +3,14 @@ import json
 import fnmatch
 import geopandas as gpd
 import pandas as pd
+import numpy as np
 
 from sqs.utils import (
     HelperUtils,
     TEXT,
-    INT,
-    FLOAT,
     TEXT_WIDGETS
 )
+from sqs.components.gisquery.models import Layer
 
 import logging
 logger = logging.getLogger(__name__)
@@ -37,30 +37,6 @@ class DefaultOperator():
         self.widget_type = widget_type
         self.row_filter = self._comparison_result()
 
-    def _cast_list(self, value, overlay_result):
-        ''' cast all array items to value type, discarding thos that cannot be cast '''
-        def cast_list_to_float(string):
-            return [float(x) for x in overlay_result if HelperUtils.get_type(x)==FLOAT and "." in str(x)]
-
-        def cast_list_to_int(string):
-            return [int(x) for x in overlay_result if HelperUtils.get_type(x)==INT or HelperUtils.get_type(x)==FLOAT]
-
-        def cast_list_to_str(string):
-            _list = [str(x).strip() for x in overlay_result if HelperUtils.get_type(x)==TEXT]
-
-            # convert all string elements to lowercase, for case-insensitive comparison tests
-            return list(map(lambda x: x.lower(), _list))
-
-        _list = []
-        if HelperUtils.get_type(value)==INT:
-            _list = cast_list_to_int(value)
-        elif HelperUtils.get_type(value)==FLOAT:
-            _list = cast_list_to_float(value)
-        else:
-            _list = cast_list_to_str(value)
-
-        return _list
-
     def _get_overlay_result_df(self, column_names):
         ''' Return (filtered) overlay result gdf for given columns/attributes from the gdf 
             self.row_filter contains row indexes of overlay_gdf that match the operator_compare criteria
@@ -73,7 +49,8 @@ class DefaultOperator():
             overlay_result_df = overlay_gdf[column_names]
         except KeyError as e:
             layer_name = self.layer['layer']['layer_name']
-            _list = HelperUtils.pop_list(self.overlay_gdf.columns)
+            # full layer column set - overlay_gdf only holds the columns read for the question (USE_LAYER_COLUMN_PROJECTION)
+            _list = HelperUtils.pop_list(Layer.available_attributes(layer_name, default=self.overlay_gdf.columns))
             logger.error(f'Property Name "{column_names}" not found in layer "{layer_name}".\nAvailable properties are "{_list}".')
 
         return overlay_result_df
@@ -83,7 +60,11 @@ class DefaultOperator():
             self.row_filter contains row indexes of overlay_gdf that match the operator_compare criteria
             Returns --> list
         '''
-        return self._get_overlay_result_df(column_name).to_list()
+        overlay_result = self._get_overlay_result_df(column_name)
+        if isinstance(overlay_result.dtype, pd.CategoricalDtype):
+            # missing values as None (as for object columns), not NaN
+            return overlay_result.astype(object).where(overlay_result.notna(), None).to_list()
+        return overlay_result.to_list()
 
     def _comparison_result(self):
         '''
@@ -97,49 +78,52 @@ class DefaultOperator():
             fnmatch.filter(['kimberley', 'midwest', 'pilbara', 'pilbara', 'swan', 'swan'], '*e?*'.lower())
             --> ['kimberley', 'midwest']
 
+        The operators are evaluated as vectorised masks over the overlay result column - numeric operators on
+        pd.to_numeric(errors='coerce') values (non-numeric values never match), text operators on the casefolded values,
+        with the fnmatch patterns translated to regex (fnmatch.translate).
+
         Returns --> list of geo dataframe row indices where comparison ooperator returned True.
                     This list is used to filter to original self.overlay_gdf.
         '''
 
-        def get_filtered_idxs(pattern):
-            # overlay_result_lower = list(map(lambda x: str(x).lower(), overlay_result))
-            # #pattern = '*' + value.lower().strip().strip('*') + '*'
-            # overlay_result_match = fnmatch.filter(overlay_result_lower, pattern)
-            #
-            # if NOT_DIFFERENCE:
-            #     # Contains NOT
-            #     overlay_result_match = list(set(overlay_result_lower).difference(overlay_result_match))
-            #
-            # # get index positions of found results in ORIG overlay_result list
-            # return [overlay_result_lower.index(x) for x in overlay_result_match]
-
-            overlay_result_lower = [str(x).lower() for x in overlay_result]
-            #pattern = '*' + value.lower().strip().strip('*') + '*'
-            overlay_result_match = set(fnmatch.filter(overlay_result_lower, pattern))
+        def match_rows(match):
+            ''' row indices where the vectorised mask match(series) is True. For categorical (dictionary-encoded) columns
+                match() is evaluated on the categories only, and the result mapped to the rows by the category codes
+            '''
+            series = self._get_overlay_result_df(column_name)
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # code -1 (missing value) --> last element, None
+                categories = pd.Series(list(series.cat.categories) + [None], dtype=object)
+                matched = match(categories).fillna(False).to_numpy(dtype=bool)
+                return np.flatnonzero(matched[series.cat.codes.to_numpy()]).tolist()
 
+            return np.flatnonzero(match(series).fillna(False).to_numpy(dtype=bool)).tolist()
+
+        def as_text(series):
+            ''' str(x).casefold() for each value (None --> 'none', as for the str(x).lower() comparison) '''
+            return series.astype(str).str.casefold()
+
+        def as_numeric(series):
+            ''' float(x) for each value, NaN where the value cannot be cast (eg. 'T' in a column of numeric codes) '''
+            return pd.to_numeric(series, errors='coerce')
+
+        def get_filtered_idxs(pattern):
+            # fnmatch pattern --> anchored regex, eg. '*imb*' --> '(?s:.*imb.*)\Z'
+            regex = fnmatch.translate(pattern)
             if NOT_DIFFERENCE:
                 # Contains NOT
-                return [idx for idx, x in enumerate(overlay_result_lower) if x not in overlay_result_match]
+                return match_rows(lambda s: ~as_text(s).str.match(regex))
 
             # Preserve row order and repeated matches instead of collapsing to unique values.
-            return [idx for idx, x in enumerate(overlay_result_lower) if x in overlay_result_match]
+            return match_rows(lambda s: as_text(s).str.match(regex))
 
 
-        overlay_result = []
         column_name = None
         operator = None
         value = None
 
         try:
 
-            # NOT_DIFFERENCE = False
-            # column_name   = self.layer.get('column_name')
-            # operator   = self.layer.get('operator')
-            # value      = str(self.layer.get('value'))
-            # if value.startswith('!'):
-            #     value = value.strip('!')
-            #     NOT_DIFFERENCE = True
-
             NOT_DIFFERENCE = False
             column_name   = self.layer.get('column_name')
             operator   = self.layer.get('operator')
@@ -151,88 +135,56 @@ class DefaultOperator():
             value_type = HelperUtils.get_type(value)
 
             self.row_filter = None
-            overlay_result = self._get_overlay_result(column_name)
-
-            cast_overlay_result = self._cast_list(value, overlay_result)
-            if len(overlay_result) == 0:
-                # list is empty
-                pass
             if operator == ISNULL: 
                 # TODO
                 pass
             else:
                 if operator == ISNOTNULL:
                     # list is not empty
-                    self.row_filter = [idx for idx,x in enumerate(overlay_result) if str(x).strip() != '']
+                    self.row_filter = match_rows(lambda s: s.astype(str).str.strip() != '')
 
                 elif operator == GREATER_THAN:
-                    self.row_filter = [idx for idx,x in enumerate(overlay_result) if x > float(value)]
+                    value_num = float(value)
+                    self.row_filter = match_rows(lambda s: as_numeric(s) > value_num)
 
                 elif operator == LESS_THAN:
-                    self.row_filter = [idx for idx,x in enumerate(overlay_result) if x < float(value)]
+                    value_num = float(value)
+                    self.row_filter = match_rows(lambda s: as_numeric(s) < value_num)
 
                 elif operator == EQUALS:
-                    # Old behavior (kept for reference):
-                    # if value_type != TEXT:
-                    #     # cast to INTs then compare (ignore decimals in comparison). int(x) will truncate x.
-                    #     self.row_filter = [idx for idx,x in enumerate(overlay_result) if int(float(x))==int(float(value))]
-                    # else:
-                    #     # comparing strings
-                    #     self.row_filter = [idx for idx,x in enumerate(overlay_result) if str(x).lower().strip()==value.lower().strip()]
-
                     if value_type != TEXT:
                         # Mixed columns (e.g. 'T' plus numeric codes) should not fail the whole comparison.
                         # Compare numerically only where both sides can be cast.
                         value_num = float(value)
-                        matched_idxs = []
-                        for idx, x in enumerate(overlay_result):
-                            try:
-                                if float(x) == value_num:
-                                    matched_idxs.append(idx)
-                            except (TypeError, ValueError):
-                                # Skip non-numeric values (e.g. 'T') when testing numeric equals.
-                                continue
-                        self.row_filter = matched_idxs
+                        self.row_filter = match_rows(lambda s: as_numeric(s) == value_num)
                     else:
                         # comparing strings (case-insensitive)
-                        self.row_filter = [idx for idx,x in enumerate(overlay_result) if str(x).lower().strip()==value.lower().strip()]
+                        value_text = value.casefold().strip()
+                        self.row_filter = match_rows(lambda s: as_text(s).str.strip() == value_text)
 
                 elif operator == CONTAINS:
-                    pattern = '*' + value.lower().strip().strip('*') + '*'
+                    pattern = '*' + value.casefold().strip().strip('*') + '*'
                     self.row_filter = get_filtered_idxs(pattern)
 
                 elif operator == LIKE:
-                    pattern = value.lower().strip()
+                    pattern = value.casefold().strip()
                     self.row_filter = get_filtered_idxs(pattern)
 
                 elif operator == OR:
-                    # overlay_result_lower = list(map(lambda x: str(x).lower(), overlay_result))
-                    # values_list = list(map(lambda x: str(x).lower().strip(), value.split('|')))
-                    # overlay_result_match = list(set(overlay_result_lower).intersection(values_list))
-                    #
-                    # if NOT_DIFFERENCE:
-                    #     # OR NOT
-                    #     overlay_result_match = list(set(overlay_result_lower).difference(overlay_result_match))
-                    #
-                    # # get index positions of found results in ORIG overlay_result list
-                    # self.row_filter = [overlay_result_lower.index(x) for x in overlay_result_match]
-
-                    overlay_result_lower = [str(x).lower() for x in overlay_result]
-                    values_list = {str(x).lower().strip() for x in value.split('|')}
+                    values_list = list({str(x).casefold().strip() for x in value.split('|')})
 
                     if NOT_DIFFERENCE:
                         # OR NOT
-                        self.row_filter = [idx for idx, x in enumerate(overlay_result_lower) if x not in values_list]
+                        self.row_filter = match_rows(lambda s: ~as_text(s).isin(values_list))
                     else:
                         # Preserve row order and repeated matches instead of collapsing to unique values.
-                        self.row_filter = [idx for idx, x in enumerate(overlay_result_lower) if x in values_list]
+                        self.row_filter = match_rows(lambda s: as_text(s).isin(values_list))
 
             return self.row_filter
         except ValueError as e:
-            logger.error(f'Error casting to INT or FLOAT: Overlay Result {overlay_result}\n \
-                           Layer column_name: {column_name}, operator: {operator}, value: {value}\n{str(e)}')
+            logger.error(f'Error casting to INT or FLOAT: Layer column_name: {column_name}, operator: {operator}, value: {value}\n{str(e)}')
         except Exception as e:
-            logger.error(f'Error determining operator result: Overlay Result {overlay_result}, Operator {operator}, Value {value}\n{str(e)}')
+            logger.error(f'Error determining operator result: Layer column_name: {column_name}, Operator {operator}, Value {value}\n{str(e)}')
 
         return self.row_filter
 
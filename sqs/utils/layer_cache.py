@@ -0,0 +1,147 @@
+from django.conf import settings
+
+from collections import OrderedDict
+import threading
+import shapely
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class LayerCache():
+    '''
+    In-process LRU cache of decoded layer GeoDataFrames, bounded by settings.LAYER_CACHE_SIZE (MB).
+
+    Entries are keyed by (layer_name, layer_version, columns, part):
+        columns -- tuple of projected attribute columns, None for all columns
+        part    -- split file name, None for the whole layer
+
+    A lookup for a projected column subset is served from the all-columns entry, if one exists.
+    Entries for a layer_name are dropped when a different layer version is requested or cached.
+
+    get() returns a shallow copy of the cached GeoDataFrame - the caller may add, drop or rename columns, or set the index,
+    without changing the entry. The column data is shared between requests and must not be modified in place.
+
+    Usage:
+        from sqs.utils.layer_cache import layer_cache
+
+        gdf = layer_cache.get(layer.name, layer.version, columns, split_file)
+        if gdf is None:
+            gdf = layer.read_split_file(split_path, columns=columns)
+            layer_cache.set(layer.name, layer.version, columns, split_file, gdf)
+
+        layer_cache.stats()
+        layer_cache.clear('CPT_DBCA_REGIONS')
+    '''
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self):
+        max_size = self.max_size if self.max_size is not None else settings.LAYER_CACHE_SIZE
+        return int(max_size * 1024**2) if max_size else 0
+
+    @staticmethod
+    def gdf_size(gdf):
+        '''
+        Memory used by gdf in bytes. DataFrame.memory_usage() counts only the pointers for the geometry column,
+        so the coordinate buffers of the geometries are added (16 bytes per 2D coordinate)
+        '''
+        size = int(gdf.memory_usage(index=True, deep=True).sum())
+        if hasattr(gdf, 'geometry') and len(gdf) > 0:
+            size += int(shapely.get_num_coordinates(gdf.geometry.values).sum()) * 16
+        return size
+
+    def get(self, layer_name, version, columns=None, part=None):
+        if not self.max_bytes:
+            return None
+
+        columns = tuple(columns) if columns is not None else None
+        with self._lock:
+            self._invalidate_versions(layer_name, version)
+
+            key = (layer_name, version, columns, part)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0].copy(deep=False)
+
+            full_key = (layer_name, version, None, part)
+            if columns is not None and full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return self._entries[full_key][0][list(columns) + ['geometry']]
+
+            self.misses += 1
+
+        return None
+
+    def set(self, layer_name, version, columns, part, gdf):
+        max_bytes = self.max_bytes
+        if not max_bytes or gdf is None:
+            return False
+
+        size = self.gdf_size(gdf)
+        if size > max_bytes:
+            logger.info(f'Layer {layer_name} ({part}) not cached: {round(size/1024**2, 2)} MB exceeds LAYER_CACHE_SIZE')
+            return False
+
+        columns = tuple(columns) if columns is not None else None
+        with self._lock:
+            self._invalidate_versions(layer_name, version)
+            key = (layer_name, version, columns, part)
+            self._pop(key)
+
+            # evict least recently used entries until new entry fits
+            while self._entries and self.size + size > max_bytes:
+                evict_key = next(iter(self._entries))
+                self._pop(evict_key)
+                logger.info(f'Layer cache evicted {evict_key[0]}, version {evict_key[1]} ({evict_key[3]})')
+
+            # shallow copy - the caller keeps using gdf
+            self._entries[key] = (gdf.copy(deep=False), size)
+            self.size += size
+
+        return True
+
+    def clear(self, layer_name=None):
+        ''' Removes the entries for layer_name (all entries if None). Returns the number of entries removed '''
+        with self._lock:
+            keys = [key for key in self._entries if layer_name is None or key[0] == layer_name]
+            for key in keys:
+                self._pop(key)
+        return len(keys)
+
+    def layer_names(self):
+        with self._lock:
+            return list(dict.fromkeys(key[0] for key in self._entries))
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                entries=len(self._entries),
+                size_mb=round(self.size/1024**2, 2),
+                max_size_mb=round(self.max_bytes/1024**2, 2),
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+    def _invalidate_versions(self, layer_name, version):
+        ''' drop entries of other versions of layer_name '''
+        for key in [key for key in self._entries if key[0] == layer_name and key[1] != version]:
+            self._pop(key)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+# single cache per process
+layer_cache = LayerCache()
@@ -7,10 +7,12 @@ from django.db.models import Max
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_202_ACCEPTED, HTTP_304_NOT_MODIFIED, HTTP_404_NOT_FOUND
 
 import geopandas as gpd
+import shapely
 import requests
 import json
 import os
 import sys
+import shutil
 import math
 from datetime import datetime
 from dateutil import parser
@@ -20,15 +22,23 @@ from pathlib import Path
 from argparse import Namespace
 from geojsplit import cli as geojsplit_cli
 import ijson
+from osgeo import gdal
 
-from sqs.components.gisquery.models import Layer, GeoJsonFile
+from sqs.components.gisquery.models import Layer, GeoJsonFile, GeoParquetFile
 from sqs.exceptions import LayerProviderException
+from sqs.utils.layer_cache import layer_cache
+from sqs.utils.geometry_tier import build_geometry_tier
+from sqs.utils.postgis_store import PostgisLayerStore
+from sqs.utils.mmap_store import MmapLayerStore
 from sqs.utils import HelperUtils, DATE_FMT, DATETIME_FMT, DATETIME_T_FMT
 
 import logging
 logger = logging.getLogger(__name__)
 logger_stats = logging.getLogger('sys_stats')
 
+GEOPARQUET_DIR = 'geoparquet'
+FLATGEOBUF_SUFFIX = '.fgb'
+
 
 #def layer_latest(layer_name):
 #    qs = Layer.objects.filter(name=layer_name)
@@ -354,7 +364,229 @@ class LayerLoader():
 
         return output
     
-    def load_layer(self, filename=None, geojson=None):
+    def write_geoparquet(self, layer, geojson_file, force=False):
+        '''
+        Writes a GeoParquet copy (WKB geometry plus typed attribute columns) of each split geojson file to
+        <layer version dir>/geoparquet/, and registers them against the GeoJsonFile. Layer.to_gdf*() reads the 
+        GeoParquet copy when it exists, and falls back to the GeoJSON file when it does not.
+
+        Returns: list of GeoParquetFile
+        '''
+        geoparquet_files = []
+        if not settings.USE_LAYER_GEOPARQUET:
+            return geoparquet_files
+
+        if force:
+            geojson_file.geoparquet_files.all().delete()
+
+        existing_split_files = list(geojson_file.geoparquet_files.values_list('split_file', flat=True))
+        geoparquet_dir = Path(geojson_file.geojson_file.path).parent / GEOPARQUET_DIR
+        os.makedirs(geoparquet_dir, exist_ok=True)
+
+        for idx, split_path in enumerate(geojson_file.split_file_paths):
+            if split_path.name in existing_split_files:
+                continue
+
+            try:
+                # low-cardinality string columns dictionary-encoded in the GeoParquet file
+                gdf = layer.to_categorical(gpd.read_file(split_path))
+                geoparquet_path = geoparquet_dir / f'{split_path.stem}.parquet'
+                gdf.to_parquet(geoparquet_path, index=False)
+                HelperUtils.force_gc(gdf)
+
+                geoparquet_name = str(Path(geojson_file.geojson_file.name).parent / GEOPARQUET_DIR / geoparquet_path.name)
+                geoparquet_files.append(
+                    GeoParquetFile.objects.create(
+                        layer=layer, geojson_file=geojson_file, index=idx, split_file=split_path.name, geoparquet_file=geoparquet_name
+                    )
+                )
+                logger.info(f'{idx} - GeoParquet file written {geoparquet_path}')
+            except Exception as e:
+                # GeoJSON split file will be used for this chunk
+                logger.error(f'Error writing GeoParquet file for layer {self.name} - {split_path.name}\n{str(e)}')
+
+        return geoparquet_files
+
+    def write_split_manifest(self, layer, geojson_file, force=False):
+        '''
+        Records the extent (bbox), feature count, vertex count and convex hull of each split geojson file in 
+        GeoJsonFile.split_manifest. Layer.to_gdf_split_generator() uses the manifest to skip split files 
+        whose extent cannot intersect the query geometry.
+
+        Also records the extent of the layer version (GeoJsonFile.extent), and the union of the split file convex hulls 
+        (GeoJsonFile.coverage_hull) - used to skip layers the proposal cannot intersect (Layer.extent_intersects()). 
+        coverage_hull is not set if a split file manifest entry has no hull (written before hulls were recorded, 
+        rewrite with force=True).
+
+        Returns: dict split_manifest
+        '''
+        split_manifest = {} if force else dict(geojson_file.split_manifest or {})
+        geoparquet_paths = geojson_file.geoparquet_paths
+
+        for idx, split_path in enumerate(geojson_file.split_file_paths):
+            if split_path.name in split_manifest:
+                continue
+
+            try:
+                # geometry only
+                gdf = layer.read_split_file(split_path, geoparquet_paths, columns=[])
+                geometries = gdf.geometry[~(gdf.geometry.isna() | gdf.geometry.is_empty)]
+                split_manifest[split_path.name] = dict(
+                    bbox=[float(i) for i in geometries.total_bounds] if not geometries.empty else None,
+                    feature_count=len(gdf),
+                    vertex_count=int(shapely.get_num_coordinates(geometries.values).sum()),
+                    hull=shapely.convex_hull(shapely.multipoints(shapely.get_coordinates(geometries.values))).wkt if not geometries.empty else None,
+                )
+                HelperUtils.force_gc([gdf, geometries])
+            except Exception as e:
+                # no manifest entry - split file will always be read
+                logger.error(f'Error reading extent of split file for layer {self.name} - {split_path.name}\n{str(e)}')
+
+        chunk_manifests = [chunk_manifest for chunk_manifest in split_manifest.values() if chunk_manifest.get('bbox')]
+        hulls = [chunk_manifest.get('hull') for chunk_manifest in chunk_manifests]
+        geojson_file.split_manifest = split_manifest
+        geojson_file.extent = [
+            min(chunk_manifest['bbox'][0] for chunk_manifest in chunk_manifests),
+            min(chunk_manifest['bbox'][1] for chunk_manifest in chunk_manifests),
+            max(chunk_manifest['bbox'][2] for chunk_manifest in chunk_manifests),
+            max(chunk_manifest['bbox'][3] for chunk_manifest in chunk_manifests),
+        ] if chunk_manifests else None
+        geojson_file.coverage_hull = shapely.union_all(shapely.from_wkt(hulls)).wkt if chunk_manifests and all(hulls) else None
+        geojson_file.save()
+        logger.info(f'Split file manifest written for layer {self.name}: {len(split_manifest)} files')
+        return split_manifest
+
+    def write_geometry_tier(self, layer, geojson_file, force=False):
+        '''
+        Writes the low resolution geometry tier (convex hull and representative point per feature) of each split geojson 
+        file to <layer version dir>/tier/. Used to classify layer features as definitely in/out of the proposal before 
+        the exact check against the full resolution geometry (see sqs.utils.geometry_tier).
+
+        Returns: list of tier file paths written
+        '''
+        tier_paths = []
+        if not settings.USE_LAYER_GEOMETRY_TIER:
+            return tier_paths
+
+        geoparquet_paths = geojson_file.geoparquet_paths
+        for idx, split_path in enumerate(geojson_file.split_file_paths):
+            tier_path = layer.geometry_tier_path(split_path.name)
+            if tier_path.is_file() and not force:
+                continue
+
+            try:
+                # geometry only
+                gdf = layer.read_split_file(split_path, geoparquet_paths, columns=[])
+                os.makedirs(tier_path.parent, exist_ok=True)
+                build_geometry_tier(gdf).to_parquet(tier_path, index=False)
+                tier_paths.append(tier_path)
+                HelperUtils.force_gc(gdf)
+            except Exception as e:
+                # no tier - exact overlay will be used for this split file
+                logger.error(f'Error writing geometry tier for layer {self.name} - {split_path.name}\n{str(e)}')
+
+        logger.info(f'Geometry tier written for layer {self.name}: {len(tier_paths)} files')
+        return tier_paths
+
+    def write_flatgeobuf(self, layer, geojson_file, force=False):
+        '''
+        Writes a FlatGeobuf copy of the original geojson file, with a packed Hilbert R-tree spatial index, to 
+        <layer version dir>/<layer name>.fgb and registers it against the GeoJsonFile. Layer.to_gdf_bbox_generator() 
+        reads only the features whose bounding boxes intersect the query bbox.
+
+        Returns: GeoJsonFile (None if not written)
+        '''
+        if not settings.USE_LAYER_FLATGEOBUF:
+            return None
+
+        if geojson_file.flatgeobuf_path and not force:
+            return None
+
+        try:
+            geojson_path = Path(geojson_file.geojson_file.path)
+            flatgeobuf_path = geojson_path.with_suffix(FLATGEOBUF_SUFFIX)
+
+            gdal.UseExceptions()
+            ds = gdal.VectorTranslate(
+                str(flatgeobuf_path),
+                str(geojson_path),
+                format='FlatGeobuf',
+                layerCreationOptions=['SPATIAL_INDEX=YES'],
+            )
+            ds = None # flush and close the FlatGeobuf file
+
+            geojson_file.flatgeobuf_file = str(Path(geojson_file.geojson_file.name).with_suffix(FLATGEOBUF_SUFFIX))
+            geojson_file.save()
+            logger.info(f'FlatGeobuf file written {flatgeobuf_path}')
+            return geojson_file
+
+        except Exception as e:
+            # GeoJSON/GeoParquet split files will be used for this layer
+            logger.error(f'Error writing FlatGeobuf file for layer {self.name}\n{str(e)}')
+
+        return None
+
+    def is_canonical_crs(self):
+        ''' Layer.canonical_crs flag for existing layers. settings.LAYER_CANONICAL_CRS for new layers '''
+        canonical_crs = Layer.objects.filter(name=self.name).values_list('canonical_crs', flat=True).first()
+        return canonical_crs if canonical_crs is not None else settings.LAYER_CANONICAL_CRS
+
+    def is_postgis(self):
+        ''' Layer.postgis flag for existing layers. settings.USE_LAYER_POSTGIS for new layers '''
+        postgis = Layer.objects.filter(name=self.name).values_list('postgis', flat=True).first()
+        return postgis if postgis is not None else settings.USE_LAYER_POSTGIS
+
+    def write_postgis(self, layer, geojson_file, force=False):
+        '''
+        Bulk loads the layer version to a PostGIS table with a GiST index (if Layer.postgis), and drops the tables of the
+        previous layer versions. DbLayerProvider runs the layer overlays in the database (see sqs.utils.postgis_store).
+
+        Returns: number of features written (None if not written)
+        '''
+        if not layer.postgis:
+            return None
+
+        store = PostgisLayerStore(layer)
+        try:
+            if store.exists() and not force:
+                return None
+
+            count = store.write(geojson_file.split_file_paths)
+            store.drop(keep_current=True)
+            return count
+        except Exception as e:
+            # no table - overlays will run in geopandas from the layer files
+            logger.error(f'Error writing PostGIS table for layer {self.name}\n{str(e)}')
+
+        return None
+
+    def reproject_file(self, filename, src_crs, dst_crs):
+        ''' Reprojects the GeoJSON file (in place) from src_crs to dst_crs. Only called on the layer version copy (see load_layer()) '''
+        tmp_filename = f'{filename}.tmp'
+        gdal.UseExceptions()
+        ds = gdal.VectorTranslate(tmp_filename, filename, format='GeoJSON', srcSRS=src_crs, dstSRS=dst_crs)
+        ds = None # flush and close the GeoJSON file
+        os.replace(tmp_filename, filename)
+
+    def copy_to_layer_version(self, src_filename):
+        ''' Copies a GeoJSON file to a new layer version directory <settings.DATA_STORE>/<layer name>/<datetime>/. Returns: filename '''
+        dt_str = datetime.now().strftime(DATETIME_T_FMT)
+        path = f'{settings.DATA_STORE}/{self.name}/{dt_str}'
+        os.makedirs(path, exist_ok=True)
+
+        filename = f'{path}/{self.name}.geojson'
+        shutil.copyfile(src_filename, filename)
+        return filename
+
+    def load_layer(self, filename=None, geojson=None, copy=False):
+        '''
+        Loads a new version of the layer from GeoServer, or from filename.
+
+        copy: filename is copied to a new layer version directory (see copy_to_layer_version()), and the layer files 
+              (split, GeoParquet, FlatGeobuf, tier, mmap) are written there. Otherwise they are written next to filename.
+              A file from filename is always copied before it is reprojected to the canonical CRS - the input file is 
+              never modified.
+        '''
 
         HelperUtils.force_gc()
         layer = None
@@ -363,12 +595,27 @@ class LayerLoader():
             return layer
 
         try:
-            if filename is None:
+            retrieved = filename is None
+            if retrieved:
                 # get GeoJSON from file
                 logger.info('Retrieving layer from geoserver %s', filename)
                 filename = self.retrieve_layer_to_file()
             logger.info('Getting crs from file: %s', filename)
             crs = self.get_crs_from_file(filename)
+            source_crs = crs
+
+            canonical_crs = self.is_canonical_crs()
+            postgis = self.is_postgis()
+            reproject = canonical_crs and crs.lower() != settings.CRS.lower()
+            if copy or (reproject and not retrieved):
+                # the file is reprojected in place - only the new layer version copy is modified
+                logger.info('Copying layer file to layer version directory %s', filename)
+                filename = self.copy_to_layer_version(filename)
+
+            if reproject:
+                logger.info('Reprojecting layer from %s to %s: %s', crs, settings.CRS, filename)
+                self.reproject_file(filename, crs, settings.CRS)
+                crs = settings.CRS
 
             qs_layer = Layer.objects.filter(name=self.name)
             with transaction.atomic():
@@ -386,10 +633,15 @@ class LayerLoader():
                 logger.info('creating a layer object %s', filename)
                 layer, created = Layer.objects.update_or_create(
                     name=self.name,
-                    defaults={'crs': crs, 'version': version, 'url': self.url, 'attr_values': attr_values},
+                    defaults={
+                        'crs': crs, 'source_crs': source_crs, 'canonical_crs': canonical_crs, 'postgis': postgis, 'version': version, 
+                        'url': self.url, 'attr_values': attr_values
+                    },
                 )
 
                 geojson_file = GeoJsonFile.objects.create(layer=layer, geojson_file=filename)
+                # new layer version - cached gdfs of the previous version are stale
+                layer_cache.clear(self.name)
 
                 msg = dict(status=HTTP_201_CREATED, data=f'Layer created/updated: {self.name}')
                 logger.info(msg)
@@ -398,6 +650,19 @@ class LayerLoader():
             err_msg = f'Error getting layer from GeoServer {self.name} from:\n{self.url}\n{str(e)}'
             logger.error(err_msg)
             raise LayerProviderException(err_msg, code='load_layer_retrieve_error' )
+
+        # outside the transaction - layer is still available from the GeoJSON files if this fails
+        logger.info('Writing GeoParquet files %s', filename)
+        self.write_geoparquet(layer, geojson_file)
+        logger.info('Writing FlatGeobuf file %s', filename)
+        self.write_flatgeobuf(layer, geojson_file)
+        logger.info('Writing split file manifest %s', filename)
+        self.write_split_manifest(layer, geojson_file)
+        logger.info('Writing geometry tier %s', filename)
+        self.write_geometry_tier(layer, geojson_file)
+        if layer.postgis:
+            logger.info('Writing PostGIS table %s', filename)
+            self.write_postgis(layer, geojson_file)
         
         return  layer
 
@@ -544,14 +809,14 @@ class DbLayerProvider():
         url='https://kmi.dbca.wa.gov.au/geoserver/cddp/ows?service=WFS&version=1.0.0&request=GetFeature&typeName=cddp:local_gov_authority&maxFeatures=50&outputFormat=application%2Fjson'
         layer_info, layer_gdf = DbLayerProvider(layer_name, url=layer_url).get_layer()
     '''
-    LAYER_CACHE = "LAYER_CACHE_{}"
-    LAYER_DETAILS_CACHE = "LAYER_DETAILS_CACHE_{}"
-
     def __init__(self, layer_name, url):
         self.layer_name = layer_name
         self.url = url
         #self.layer_cached = False
         self.layer_geojson = None
+        self.layer = None
+        self.chunk_stats = dict(chunks_read=0, chunks_skipped=0, cache_hits=0, cache_misses=0)
+        self.layer_reader = None # reader of the last get_layer_generator() - 'flatgeobuf', 'split' or 'geojson'
 
     def _reload_layer_if_missing_file(self, layer, source='DB'):
         '''
@@ -567,8 +832,10 @@ class DbLayerProvider():
             layer = loader.load_layer()
         return layer
 
-    def get_layer(self, from_geoserver=True):
+    def get_layer(self, from_geoserver=True, columns=None):
         '''
+        columns: list of attribute columns to load (geometry is always loaded). None loads all columns.
+
         Returns: layer_info, layer_gdf
         '''
         try:
@@ -593,16 +860,16 @@ class DbLayerProvider():
                 # try getting from DB; if file is missing after DB refresh, rebuild from GeoServer
                 layer = Layer.objects.get(name=self.layer_name)
                 if layer.geojson_file is None and from_geoserver:
-                    layer_info, layer_gdf = self.get_layer_from_geoserver()
+                    layer_info, layer_gdf = self.get_layer_from_geoserver(columns=columns)
                     if layer_gdf is not None:
                         logger.info(f'Layer reloaded from GeoServer {self.layer_name} - missing local file')
                 else:
-                    layer_info, layer_gdf = self.get_from_db()
+                    layer_info, layer_gdf = self.get_from_db(columns=columns)
                     if layer_gdf is not None:
                         logger.info(f'Layer retrieved from DB {self.layer_name}')
             elif from_geoserver:
                 # Get from Geoserver, store in DB and set in cache
-                layer_info, layer_gdf = self.get_layer_from_geoserver()
+                layer_info, layer_gdf = self.get_layer_from_geoserver(columns=columns)
                 if layer_gdf is not None:
                     logger.info(f'Layer retrieved from GeoServer {self.layer_name} - from:\n{self.url}')
 
@@ -633,7 +900,7 @@ class DbLayerProvider():
 #                self.set_cache(layer_info, layer.geojson)
 
             loader = LayerLoader(name=self.layer_name)
-            layer = loader.load_layer(filename=filename, force_load=True)
+            layer = loader.load_layer(filename=filename)
             if self.exclude_layer(layer):
                 return None, None 
 
@@ -647,7 +914,7 @@ class DbLayerProvider():
 
         return layer_info, layer_gdf
 
-    def get_layer_from_geoserver(self):
+    def get_layer_from_geoserver(self, columns=None):
         '''
         Returns: layer_info, layer_gdf
         '''
@@ -658,7 +925,7 @@ class DbLayerProvider():
             if self.exclude_layer(layer):
                 return None, None 
 
-            layer_gdf = layer.to_gdf(all_features=True)
+            layer_gdf = self.to_gdf_cached(layer, columns=columns)
             layer_info = self.layer_info(layer)
             #self.set_cache(layer_info, layer_gdf)
 #            self.set_cache(layer_info, layer.geojson)
@@ -671,7 +938,7 @@ class DbLayerProvider():
         return layer_info, layer_gdf
 
      
-    def get_from_db(self):
+    def get_from_db(self, columns=None):
         '''
         Get Layer Objects from cache if exists, otherwise get from DB and set the cache
         '''
@@ -682,7 +949,7 @@ class DbLayerProvider():
             if self.exclude_layer(layer):
                 return None, None 
 
-            layer_gdf = layer.to_gdf(all_features=True)
+            layer_gdf = self.to_gdf_cached(layer, columns=columns)
 
             layer_info = self.layer_info(layer)
             #self.set_cache(layer_info, layer_gdf)
@@ -695,33 +962,98 @@ class DbLayerProvider():
 
         return layer_info, layer_gdf
 
-    def get_layer_generator(self):
+    def get_layer_obj(self):
         '''
-        Return generator to load layer data in batches/parts.
+        Returns the Layer object - from DB if it exists (reloaded from GeoServer if the backing GeoJSON file is missing), 
+        otherwise loads the layer from GeoServer. Retrieved once per DbLayerProvider instance.
         '''
-        try:
+        if self.layer is None:
             if Layer.objects.filter(name=self.layer_name).exists():
                 layer = Layer.objects.get(name=self.layer_name)
-                layer = self._reload_layer_if_missing_file(layer)
             else:
                 loader = LayerLoader(name=self.layer_name)
                 layer = loader.load_layer()
 
-            layer = self._reload_layer_if_missing_file(layer)
+            self.layer = self._reload_layer_if_missing_file(layer)
+
+        return self.layer
+
+    @property
+    def layer_store(self):
+        '''
+        Storage backend for the decoded layer split files - MmapLayerStore of the layer version directory 
+        (settings.USE_LAYER_MMAP_STORE), shared by all processes on the node. None reads from GeoParquet/GeoJSON.
+        '''
+        if not settings.USE_LAYER_MMAP_STORE:
+            return None
+
+        layer = self.get_layer_obj()
+        return MmapLayerStore(Path(layer.geojson_file.path).parent) if layer and layer.geojson_file else None
+
+    def get_geometry_tier(self, split_file):
+        '''
+        geometry tier of the layer split file (see sqs.utils.geometry_tier). None if not available.
+
+        The tier rows are in the split file (source) order, so the tier is only returned for chunks from the split 
+        file/GeoParquet readers - FlatGeobuf bbox chunks are in spatial index order, and a subset of the layer.
+        '''
+        if not settings.USE_LAYER_GEOMETRY_TIER or self.layer_reader not in ['split', 'geojson']:
+            return None
+
+        try:
+            return self.get_layer_obj().read_geometry_tier(split_file)
+        except Exception as e:
+            logger.warning(f'Error reading geometry tier {self.layer_name} - {split_file}\n{str(e)}')
+        return None
+
+    def get_layer_info(self):
+        '''
+        Returns layer_info (name, version, crs, dates) without reading the layer features. 
+        Allows the caller to build the query geometry in the layer CRS before reading the layer.
+        '''
+        try:
+            layer_info = self.layer_info(self.get_layer_obj())
+        except Exception as e:
+            err_msg = f'Error getting layer {self.layer_name} from DB\n{str(e)}'
+            logger.error(err_msg)
+            raise LayerProviderException(err_msg, code='db_layer_retrieve_error' )
+
+        return layer_info
+
+    def get_layer_generator(self, columns=None, bbox=None, query_gdf=None):
+        '''
+        Return generator to load layer data in batches/parts.
+
+        columns: list of attribute columns to load (geometry is always loaded). None loads all columns.
+        bbox: (minx, miny, maxx, maxy) in the layer CRS. If provided, and the layer has a FlatGeobuf file, only the 
+              features whose bounding boxes intersect bbox are loaded. None loads all features.
+        query_gdf: query geometry in the layer CRS. If provided, split files whose extent cannot intersect query_gdf 
+                   are skipped. Split files read/skipped are counted in self.chunk_stats
+        '''
+        try:
+            layer = self.get_layer_obj()
 
             if self.exclude_layer(layer):
                 return None, None
 
             #layer_gen = layer.geojson_generator()
-            if settings.USE_LAYER_SPLIT_FILES:
-                layer_gen = layer.to_gdf_split_generator()
+            if bbox is not None and settings.USE_LAYER_FLATGEOBUF and layer.flatgeobuf_path:
+                self.layer_reader = 'flatgeobuf'
+                layer_gen = layer.to_gdf_bbox_generator(bbox, columns=columns)
+            elif settings.USE_LAYER_SPLIT_FILES:
+                self.layer_reader = 'split'
+                layer_gen = layer.to_gdf_split_generator(
+                    columns=columns, query_gdf=query_gdf, chunk_stats=self.chunk_stats, layer_cache=layer_cache,
+                    layer_store=self.layer_store
+                )
             else:
                 def single_layer_generator():
-                    layer_gdf = layer.to_gdf(all_features=True)
+                    layer_gdf = self.to_gdf_cached(layer, columns=columns)
                     layer_file = layer.geojson_file
                     layer_filename = Path(layer_file.path).name if layer_file else self.layer_name
                     yield 0, layer_filename, layer_gdf
 
+                self.layer_reader = 'geojson'
                 layer_gen = single_layer_generator()
 
             layer_info = self.layer_info(layer)
@@ -736,28 +1068,79 @@ class DbLayerProvider():
         return layer_info, layer_gen
 
 
-#    def get_from_cache(self):
-#        '''
-#        Get GeoJSON from cache if exists then creates a gdf form the GeoJSON
-#        '''
-#        # try to get from cached 
-#        #layer_gdf = cache.get(self.LAYER_CACHE.format(self.layer_name))
-#        self.layer_geojson = cache.get(self.LAYER_CACHE.format(self.layer_name))
-#        layer_info = cache.get(self.LAYER_DETAILS_CACHE.format(self.layer_name))
-#
-#        layer_gdf = gpd.read_file(json.dumps(self.layer_geojson)) if self.layer_geojson else None 
-#        self.layer_cached = True if layer_gdf is not None else False
-#        return layer_info, layer_gdf
-#
-#    def clear_cache(self):
-#        # Clear the cache 
-#        cache.delete(self.LAYER_CACHE.format(self.layer_name))
-#        cache.delete(self.LAYER_DETAILS_CACHE.format(self.layer_name))
-#
-#    def set_cache(self, layer_info, layer_geojson):
-#        # set the cache 
-#        cache.set(self.LAYER_CACHE.format(self.layer_name), layer_geojson, settings.CACHE_TIMEOUT)
-#        cache.set(self.LAYER_DETAILS_CACHE.format(self.layer_name), layer_info, settings.CACHE_TIMEOUT)
+    @property
+    def use_postgis(self):
+        ''' True if the layer overlays run in the database - Layer.postgis is set and the layer version table exists '''
+        layer = self.get_layer_obj()
+        return layer.postgis and PostgisLayerStore(layer).exists()
+
+    def get_overlay_gdf(self, shapefile_gdf, how, column_name, columns=None):
+        '''
+        Overlay of shapefile_gdf (in the layer CRS) with the layer, evaluated in the PostGIS layer table. Results are
+        equivalent to DisturbanceLayerQueryHelper.get_overlay_gdf() for the attribute columns.
+
+        columns: list of attribute columns to return. None returns all columns.
+
+        Returns: layer_info, overlay_gdf
+        '''
+        try:
+            layer = self.get_layer_obj()
+            columns = columns if columns is not None else layer.attributes
+            overlay_gdf = PostgisLayerStore(layer).overlay(shapefile_gdf, how, column_name, columns)
+            layer_info = self.layer_info(layer)
+
+        except Exception as e:
+            err_msg = f'Error querying layer {self.layer_name} from PostGIS\n{str(e)}'
+            logger.error(err_msg)
+            raise LayerProviderException(err_msg, code='postgis_layer_query_error' )
+
+        return layer_info, overlay_gdf
+
+    def get_features(self, overlay_df, columns=None):
+        '''
+        Materialise the layer geometries of an attribute-only overlay result (settings.USE_LAYER_ATTRIBUTE_ONLY), for a 
+        caller that needs them. Results that already hold a geometry column are returned unchanged.
+
+        columns: list of attribute columns to return. None returns all columns.
+
+        Returns: GeoDataFrame
+        '''
+        if isinstance(overlay_df, gpd.GeoDataFrame):
+            return overlay_df
+
+        try:
+            return self.get_layer_obj().to_gdf_features(overlay_df.index, columns=columns, layer_store=self.layer_store)
+        except Exception as e:
+            err_msg = f'Error materialising layer features {self.layer_name}\n{str(e)}'
+            logger.error(err_msg)
+            raise LayerProviderException(err_msg, code='db_layer_retrieve_error' )
+
+    def to_gdf_cached(self, layer, columns=None):
+        ''' Whole layer gdf - from the in-process layer cache if it exists, otherwise from file (and set the cache) '''
+        cache_columns = layer.project_columns(columns)
+        layer_gdf = layer_cache.get(layer.name, layer.version, cache_columns)
+        if layer_gdf is not None:
+            self.chunk_stats['cache_hits'] += 1
+            logger.info(f'Layer retrieved from cache {self.layer_name}, version {layer.version}')
+            return layer_gdf
+
+        self.chunk_stats['cache_misses'] += 1
+        layer_gdf = layer.to_gdf(all_features=True, columns=columns, layer_store=self.layer_store)
+        layer_cache.set(layer.name, layer.version, cache_columns, None, layer_gdf)
+        return layer_gdf
+
+    @property
+    def layer_cached(self):
+        ''' True if all the layer data for the last request was retrieved from the layer cache '''
+        return self.is_layer_cached(self.chunk_stats)
+
+    @staticmethod
+    def is_layer_cached(chunk_stats):
+        return chunk_stats['cache_hits'] > 0 and chunk_stats['cache_misses'] == 0
+
+    def clear_cache(self):
+        ''' Clear the in-process layer cache for this layer. Returns the number of cache entries removed '''
+        return layer_cache.clear(self.layer_name)
 
     def layer_info(self, layer):
         return dict(
@@ -810,14 +1193,24 @@ def get_layer_size(layers=None):
         print(f'{item["size"]}\t{item["layer_name"]}')
 
 
+def get_system_memory_stats():
+    ''' System memory (MB) and CPU readings - dict(avail_mem, total_mem, mem_avail_perc, mem_used_perc, cpu_used_perc) '''
+    info = psutil.virtual_memory()
+    avail_mem = int(info.available / 1024**2)
+    total_mem = int(info.total /1024**2)
+    return dict(
+        avail_mem=avail_mem,
+        total_mem=total_mem,
+        mem_avail_perc=round(avail_mem * 100 / total_mem, 2),
+        mem_used_perc=round(info.percent, 2),
+        cpu_used_perc=round(psutil.cpu_percent(), 2),
+    )
+
+
 def print_system_memory_stats(msg=None):
     if settings.SHOW_SYS_MEM_STATS:
-        info = psutil.virtual_memory()
-        avail_mem = int(psutil.virtual_memory().available / 1024**2)
-        total_mem = int(psutil.virtual_memory().total /1024**2)
-        mem_avail_perc = round(avail_mem * 100 / total_mem, 2)
-        mem_used_perc = round(psutil.virtual_memory().percent, 2)
-        cpu_used_perc = round(psutil.cpu_percent(), 2)
-
-        logger_stats.debug(f'{msg} - Mem Avail %: {mem_avail_perc} ({avail_mem:,}/{total_mem:,} MB), CPU Used %: {cpu_used_perc}')
+        stats = get_system_memory_stats()
+        logger_stats.debug(
+            f'{msg} - Mem Avail %: {stats["mem_avail_perc"]} ({stats["avail_mem"]:,}/{stats["total_mem"]:,} MB), CPU Used %: {stats["cpu_used_perc"]}'
+        )
 
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import pyarrow as pa
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import logging
+logger = logging.getLogger(__name__)
+
+MMAP_DIR = 'mmap'
+META_FILE = 'meta.json'
+GEOMETRY = 'geometry'
+
+
+class MmapLayerStore():
+    '''
+    On-disk store of decoded split files for a single layer version, read with numpy mmap.
+
+    All processes on a node (gunicorn workers, das_intersection_query subprocesses) map the same files, so the
+    store files are shared from the OS page cache rather than held as private copies. Numeric and categorical columns
+    of the GeoDataFrame read are zero-copy views of the mmap'd files (the frame is built with copy=False), so they stay
+    shared. String and geometry columns are decoded from the mmap'd buffers in a single vectorised pass (pyarrow arrays,
+    shapely.from_wkb) into Python str objects and GEOS geometries - these are private to the process, and for most
+    layers they are the bulk of the decoded size. The store lives in the layer version directory, and survives process
+    restarts.
+
+    Storage backend of DbLayerProvider (settings.USE_LAYER_MMAP_STORE) - passed to the Layer read methods as layer_store.
+
+    Layout, one directory per split file - <layer version dir>/mmap/<split file stem>/
+        meta.json             -- feature count and column definitions
+        geometry.buf.npy      -- uint8 WKB buffer, all geometries concatenated
+        geometry.offsets.npy  -- int64 offsets into the WKB buffer (feature count + 1)
+        <idx>.npy             -- numeric/bool/datetime attribute column, or the codes of a categorical column (categories in meta.json)
+        <idx>.buf.npy, <idx>.offsets.npy, <idx>.null.npy  -- other attribute columns, as buffer/offsets/null mask
+                                                            (utf-8 for string columns, json for mixed type columns)
+
+    Usage:
+        from sqs.utils.mmap_store import MmapLayerStore
+
+        store = MmapLayerStore(Path(layer.geojson_file.path).parent)
+        if not store.exists(split_path.name):
+            store.write(split_path.name, gpd.read_file(split_path))
+        gdf = store.read(split_path.name, columns=['NAME'], crs=layer.crs)
+
+        # or, via the Layer read methods (populates the store on first read)
+        gdf = layer.read_split_file(split_path, columns=['NAME'], layer_store=store)
+    '''
+
+    def __init__(self, layer_dir):
+        self.store_dir = Path(layer_dir) / MMAP_DIR
+
+    def part_dir(self, split_file):
+        return self.store_dir / Path(split_file).stem
+
+    def exists(self, split_file):
+        return (self.part_dir(split_file) / META_FILE).is_file()
+
+    @staticmethod
+    def _is_numpy_column(series):
+        ''' columns stored as a plain numpy array (no python objects) '''
+        return isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufM'
+
+    @staticmethod
+    def _write_buffer(path_prefix, values):
+        ''' list of bytes (None --> null) to buffer/offsets pair '''
+        lengths = np.array([len(v) if v is not None else 0 for v in values], dtype=np.int64)
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        buf = np.frombuffer(b''.join(v for v in values if v is not None), dtype=np.uint8)
+        np.save(f'{path_prefix}.buf.npy', buf)
+        np.save(f'{path_prefix}.offsets.npy', offsets)
+
+    @staticmethod
+    def _read_buffer(path_prefix, arrow_type=None, null=None):
+        '''
+        buffer/offsets pair to a pyarrow (large) binary/string array. The array is built over the mmap'd buffers (no copy,
+        no per-row slicing in python), so decoding is vectorised over the whole column.
+
+        arrow_type: pa.large_binary() (default) or pa.large_string()
+        null: bool array of null values. None treats zero-length values as null
+        '''
+        offsets = np.load(f'{path_prefix}.offsets.npy', mmap_mode='r')
+        if null is None:
+            null = offsets[1:] == offsets[:-1]
+        # np.load(mmap_mode='r') fails on a zero length buffer (all values null/empty)
+        buf = np.load(f'{path_prefix}.buf.npy', mmap_mode='r') if offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        validity = pa.py_buffer(np.packbits(~np.asarray(null, dtype=bool), bitorder='little'))
+        return pa.Array.from_buffers(
+            arrow_type or pa.large_binary(), len(offsets) - 1, [validity, pa.py_buffer(offsets), pa.py_buffer(buf)]
+        )
+
+    def write(self, split_file, gdf):
+        '''
+        Writes gdf (all columns) for split_file to the store. Written to a temporary directory first, then renamed,
+        so concurrent readers never see a partial part directory.
+        '''
+        part_dir = self.part_dir(split_file)
+        if part_dir.is_dir():
+            return False
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.store_dir, prefix=f'.{part_dir.name}_'))
+        try:
+            geometry = gdf.geometry.values
+            wkb = shapely.to_wkb(geometry)
+            self._write_buffer(tmp_dir / GEOMETRY, [bytes(v) if v is not None else None for v in wkb])
+
+            columns = []
+            for idx, column in enumerate(gdf.columns.drop(gdf.geometry.name)):
+                series = gdf[column]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    np.save(tmp_dir / f'{idx}.npy', series.cat.codes.to_numpy())
+                    columns.append(dict(name=column, kind='category', dtype=str(series.dtype), categories=series.cat.categories.tolist()))
+                elif self._is_numpy_column(series):
+                    np.save(tmp_dir / f'{idx}.npy', series.to_numpy())
+                    columns.append(dict(name=column, kind='numpy', dtype=str(series.dtype)))
+                else:
+                    null = series.isna().to_numpy()
+                    if all(isinstance(v, str) for v, n in zip(series, null) if not n):
+                        kind, encode = 'str', lambda v: v.encode('utf-8')
+                    else:
+                        # preserve bool/int/float values in object columns
+                        kind, encode = 'json', lambda v: json.dumps(v, default=str).encode('utf-8')
+
+                    self._write_buffer(tmp_dir / str(idx), [encode(v) if not n else None for v, n in zip(series, null)])
+                    np.save(tmp_dir / f'{idx}.null.npy', null)
+                    columns.append(dict(name=column, kind=kind, dtype=str(series.dtype)))
+
+            with open(tmp_dir / META_FILE, 'w') as f:
+                json.dump(dict(count=len(gdf), columns=columns), f)
+
+            os.rename(tmp_dir, part_dir)
+            return True
+
+        except OSError as e:
+            # part written by another process in the meantime
+            logger.info(f'mmap store part not written {part_dir}: {str(e)}')
+        finally:
+            if tmp_dir.is_dir():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return False
+
+    def read(self, split_file, columns=None, crs=None):
+        '''
+        Reads split_file from the store to gdf.
+
+        columns: list of attribute columns to read (geometry is always read). None reads all columns.
+        '''
+        part_dir = self.part_dir(split_file)
+        with open(part_dir / META_FILE) as f:
+            meta = json.load(f)
+
+        data = {}
+        for idx, column in enumerate(meta['columns']):
+            if columns is not None and column['name'] not in columns:
+                continue
+
+            if column['kind'] == 'category':
+                codes = np.load(part_dir / f'{idx}.npy', mmap_mode='r')
+                data[column['name']] = pd.Categorical.from_codes(codes, categories=column['categories'])
+            elif column['kind'] == 'numpy':
+                data[column['name']] = np.load(part_dir / f'{idx}.npy', mmap_mode='r')
+            else:
+                null = np.load(part_dir / f'{idx}.null.npy', mmap_mode='r')
+                if column['kind'] == 'str':
+                    values = self._read_buffer(part_dir / str(idx), pa.large_string(), null).to_pandas()
+                else:
+                    # mixed type (json) columns - rare, decoded per value
+                    values = [json.loads(v) if v is not None else None for v in self._read_buffer(part_dir / str(idx), null=null).to_pylist()]
+                data[column['name']] = pd.Series(values, dtype=object)
+
+        wkb = self._read_buffer(part_dir / GEOMETRY).to_numpy(zero_copy_only=False)
+        geometry = shapely.from_wkb(wkb)
+
+        if columns is not None:
+            # in the requested order - selecting the columns from the frame would copy the mmap'd columns
+            data = {column: data[column] for column in columns if column in data}
+        df = pd.DataFrame(data, index=pd.RangeIndex(meta['count']), copy=False)
+        return gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
+
+    def clear(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+import pandas as pd
+import geopandas as gpd
+import shapely
+import json
+import csv
+import io
+import re
+
+from sqs.utils.geometry_tier import make_valid
+
+import logging
+logger = logging.getLogger(__name__)
+
+TABLE_PREFIX = 'layer_'
+COPY_BATCH_SIZE = 5000
+
+
+class PostgisLayerStore():
+    '''
+    PostGIS table of a single layer version, used to run the layer overlays in the database (Layer.postgis).
+
+    One table per layer version - settings.LAYER_POSTGIS_SCHEMA.layer_<layer name>_v<version>
+        fid        -- feature position in the layer GeoJSON file (same row order as Layer.to_gdf())
+        properties -- feature properties (jsonb)
+        geom       -- feature geometry in the layer CRS, GiST indexed
+
+    Overlay results are equivalent to DisturbanceLayerQueryHelper.get_overlay_gdf() - same rows, in the same order,
+    for the attribute columns. Only the requested attribute columns are returned; the geometry column is empty.
+
+    Usage:
+        from sqs.utils.postgis_store import PostgisLayerStore
+
+        store = PostgisLayerStore(layer)
+        if not store.exists():
+            store.write(geojson_file.split_file_paths)
+        overlay_gdf = store.overlay(shapefile_gdf, how='Overlapping', column_name='region', columns=['region', 'office'])
+    '''
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.schema = settings.LAYER_POSTGIS_SCHEMA
+        self.table_prefix = f'{TABLE_PREFIX}{re.sub(r"[^a-z0-9_]", "_", layer.name.lower())}'[:48]
+        self.table_name = f'{self.table_prefix}_v{layer.version}'
+
+    @property
+    def srid(self):
+        return int(self.layer.crs.split(':')[-1])
+
+    @property
+    def table(self):
+        return f'{connection.ops.quote_name(self.schema)}.{connection.ops.quote_name(self.table_name)}'
+
+    def exists(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [f'{self.schema}.{self.table_name}'])
+            return cursor.fetchone()[0]
+
+    def write(self, split_file_paths):
+        '''
+        Bulk loads the layer (split) GeoJSON files to the layer version table (COPY to a staging table, then geometries
+        built from the GeoJSON in the database), and creates the GiST index. Table is replaced if it exists.
+
+        Returns: number of features written
+        '''
+        count = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(self.schema)}')
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+            cursor.execute(f'CREATE TABLE {self.table} (fid bigint PRIMARY KEY, properties jsonb, geom geometry(Geometry, {self.srid}))')
+            cursor.execute('CREATE TEMP TABLE layer_staging (fid bigint, properties jsonb, geometry text) ON COMMIT DROP')
+
+            for split_path in split_file_paths:
+                with open(split_path) as f:
+                    features = json.load(f)['features']
+
+                for idx in range(0, len(features), COPY_BATCH_SIZE):
+                    buf = io.StringIO()
+                    writer = csv.writer(buf)
+                    for feature in features[idx:idx + COPY_BATCH_SIZE]:
+                        geometry = json.dumps(feature['geometry']) if feature.get('geometry') else None
+                        writer.writerow([count, json.dumps(feature.get('properties') or {}), geometry])
+                        count += 1
+                    buf.seek(0)
+                    cursor.copy_expert('COPY layer_staging (fid, properties, geometry) FROM STDIN WITH (FORMAT csv)', buf)
+
+            cursor.execute(
+                f'INSERT INTO {self.table} (fid, properties, geom) '
+                f'SELECT fid, properties, ST_SetSRID(ST_GeomFromGeoJSON(geometry), %s) FROM layer_staging',
+                [self.srid]
+            )
+            cursor.execute(f'CREATE INDEX ON {self.table} USING GIST (geom)')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {self.table}')
+
+        logger.info(f'PostGIS table written for layer {self.layer.name}, version {self.layer.version}: {count} features')
+        return count
+
+    def drop(self, keep_current=False):
+        ''' Drops the tables of all versions of the layer (except the current version, if keep_current). Returns the tables dropped '''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT table_name FROM information_schema.tables WHERE table_schema=%s AND table_name ~ %s',
+                [self.schema, f'^{re.escape(self.table_prefix)}_v[0-9]+$']
+            )
+            tables = [row[0] for row in cursor.fetchall() if not (keep_current and row[0] == self.table_name)]
+            for table_name in tables:
+                cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(self.schema)}.{connection.ops.quote_name(table_name)}')
+
+        return tables
+
+    def overlay(self, shapefile_gdf, how, column_name, columns):
+        '''
+        Layer features for the overlay of shapefile_gdf (in the layer CRS), evaluated in the database:
+            Overlapping -- one row per (layer feature, shapefile feature) pair that intersect (ST_Intersects), sorted by
+                           layer feature, then shapefile feature - as gpd.overlay(how='intersection')
+            Outside     -- layer features whose column_name value is not a value of the 'Overlapping' features
+            Inside      -- layer features whose column_name value is not a value of the features not covered by the
+                           shapefile (ST_CoveredBy, for the features in the shapefile bbox only) - as 
+                           gpd.overlay(how='difference')
+
+        columns: attribute columns returned (column_name is always returned)
+
+        Returns: GeoDataFrame
+        '''
+        columns = list(dict.fromkeys([column_name] + list(columns)))
+        shapefile_geometry = shapely.set_srid(make_valid(shapefile_gdf.geometry), self.srid)
+        params = [shapely.to_wkb(shapefile_geometry, hex=True, include_srid=True).tolist()]
+
+        # json null and missing property are both null (NaN in the gdf)
+        select = ', '.join(["NULLIF(l.properties->%s, 'null'::jsonb)"] * len(columns))
+        value = "NULLIF(l.properties->%s, 'null'::jsonb)"
+        query = 'WITH q AS (SELECT wkb::geometry AS geom, idx FROM unnest(%s::text[]) WITH ORDINALITY AS q(wkb, idx)) '
+
+        if how == 'Outside':
+            query += (
+                f', hits AS (SELECT DISTINCT {value} AS val FROM {self.table} l JOIN q ON ST_Intersects(l.geom, q.geom)) '
+                f'SELECT {select} FROM {self.table} l '
+                f'WHERE NOT EXISTS (SELECT 1 FROM hits WHERE hits.val IS NOT DISTINCT FROM {value}) ORDER BY l.fid'
+            )
+            params += [column_name] + columns + [column_name]
+
+        elif how == 'Inside':
+            query += (
+                f', u AS (SELECT ST_Union(geom) AS geom FROM q) '
+                # exact ST_CoveredBy test only for the features in the proposal bbox (spatial index) - features outside it
+                # are not covered (bbox test only), empty geometries are never in the difference
+                f', diff AS ('
+                f'SELECT {value} AS val FROM {self.table} l, u WHERE l.geom && u.geom AND NOT ST_CoveredBy(l.geom, u.geom) '
+                f'UNION SELECT {value} AS val FROM {self.table} l, u WHERE NOT (l.geom && u.geom) AND NOT ST_IsEmpty(l.geom)) '
+                f'SELECT {select} FROM {self.table} l '
+                f'WHERE NOT EXISTS (SELECT 1 FROM diff WHERE diff.val IS NOT DISTINCT FROM {value}) ORDER BY l.fid'
+            )
+            params += [column_name, column_name] + columns + [column_name]
+
+        else:
+            query += f'SELECT {select} FROM {self.table} l JOIN q ON ST_Intersects(l.geom, q.geom) ORDER BY l.fid, q.idx'
+            params += columns
+
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        return gpd.GeoDataFrame(df, geometry=gpd.GeoSeries([None] * len(df), crs=self.layer.crs), crs=self.layer.crs)
@@ -0,0 +1,127 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from sqs.utils.geometry_tier import POLYGON_GEOM_TYPES, make_valid, intersecting_rows
+
+import logging
+logger = logging.getLogger(__name__)
+
+OVERLAY = 'overlay'
+SINDEX = 'sindex'
+
+
+def layer_geometry(layer_gdf, idx):
+    '''
+    Geometry of the layer rows idx - invalid geometries made valid, only if all layer geometries are polygons (same
+    rule as gpd.overlay(make_valid=True)). Validity is checked for the rows idx only, not the whole layer.
+    '''
+    geometry = np.asarray(layer_gdf.geometry.values)[idx]
+    if layer_gdf.geom_type.isin(POLYGON_GEOM_TYPES).all():
+        invalid = ~shapely.is_valid(geometry)
+        if invalid.any():
+            geometry[invalid] = shapely.make_valid(geometry[invalid])
+    return geometry
+
+
+def intersecting_pairs(layer_gdf, shapefile_geometry):
+    '''
+    (layer row, shapefile row) pairs that intersect - candidates from the layer spatial index, then intersects
+    evaluated against the prepared shapefile geometry. Sorted by layer row, then shapefile row (the row order of
+    gpd.overlay(how='intersection')).
+
+    Returns: idx_layer, idx_shapefile (numpy arrays)
+    '''
+    shapely.prepare(shapefile_geometry)
+    idx_shapefile, idx_layer = layer_gdf.sindex.query(shapefile_geometry)
+
+    intersects = shapely.intersects(shapefile_geometry[idx_shapefile], layer_geometry(layer_gdf, idx_layer))
+    idx_layer = idx_layer[intersects]
+    idx_shapefile = idx_shapefile[intersects]
+
+    order = np.lexsort((idx_shapefile, idx_layer))
+    return idx_layer[order], idx_shapefile[order]
+
+
+def not_covered_rows(layer_gdf, shapefile_geometry):
+    '''
+    Boolean mask of the layer rows not covered by the union of the shapefile geometries - the rows returned by
+    gpd.overlay(how='difference') (non-empty difference).
+
+        1. layer features outside the shapefile bounding boxes (spatial index) --> not covered
+        2. layer features covered by a single (prepared) shapefile feature     --> covered
+        3. remaining candidates --> exact check against the (prepared) union of the shapefile features
+    '''
+    not_covered = ~shapely.is_empty(np.asarray(layer_gdf.geometry.values))
+
+    shapely.prepare(shapefile_geometry)
+    idx_shapefile, idx_layer = layer_gdf.sindex.query(shapefile_geometry)
+    if len(idx_layer) == 0:
+        return not_covered
+
+    covers = shapely.covers(shapefile_geometry[idx_shapefile], layer_geometry(layer_gdf, idx_layer))
+    idx_covered = np.unique(idx_layer[covers])
+    not_covered[idx_covered] = False
+
+    idx_candidates = np.setdiff1d(idx_layer, idx_covered)
+    if len(idx_candidates) > 0 and len(shapefile_geometry) > 1:
+        shapefile_union = shapely.union_all(shapefile_geometry)
+        shapely.prepare(shapefile_union)
+        not_covered[idx_candidates] = ~shapely.covered_by(layer_geometry(layer_gdf, idx_candidates), shapefile_union)
+
+    return not_covered
+
+
+def overlay_mask(layer_gdf, shapefile_gdf, how, column_name, tier_gdf=None):
+    '''
+    Boolean mask of the layer rows matching the proposal (shapefile_gdf, in the layer CRS), for how='Outside' and 
+    how='Inside' (see overlay_rows())
+
+    Returns: pd.Series (bool), aligned to layer_gdf
+    '''
+    shapefile_geometry = make_valid(shapefile_gdf.geometry)
+
+    if how == 'Inside':
+        diff_values = layer_gdf.loc[not_covered_rows(layer_gdf, shapefile_geometry), column_name].unique()
+        return ~layer_gdf[column_name].isin(diff_values)
+
+    overlay_gdf = intersecting_rows(layer_gdf, shapefile_gdf, tier_gdf, clip=False) if tier_gdf is not None else None
+    if overlay_gdf is None:
+        idx_layer, _ = intersecting_pairs(layer_gdf, shapefile_geometry)
+        overlay_values = layer_gdf[column_name].iloc[idx_layer].unique()
+    else:
+        overlay_values = overlay_gdf[column_name].unique()
+
+    return ~layer_gdf[column_name].isin(overlay_values)
+
+
+def overlay_rows(layer_gdf, shapefile_gdf, how, column_name, tier_gdf=None):
+    '''
+    Layer rows matching the proposal (shapefile_gdf, in the layer CRS) - the same rows and geometries as
+    DisturbanceLayerQueryHelper.get_overlay_gdf() with settings.LAYER_OVERLAY_ENGINE='overlay', without running the
+    overlays on the whole layer.
+
+        Overlapping -- one row per intersecting (layer feature, shapefile feature) pair, with the intersection geometry 
+                       (computed for the matching pairs only)
+        Outside     -- layer features whose column_name value is not a value of the 'Overlapping' rows
+        Inside      -- layer features whose column_name value is not a value of the features not covered by the shapefile
+                       (no difference geometries computed)
+
+    'Outside' and 'Inside' rows hold the layer feature geometry, as the 'overlay' engine results.
+
+    tier_gdf: geometry tier of layer_gdf (see sqs.utils.geometry_tier) - used for the 'Overlapping' rows if provided
+
+    Returns: GeoDataFrame
+    '''
+    if how in ['Outside', 'Inside']:
+        return layer_gdf[overlay_mask(layer_gdf, shapefile_gdf, how, column_name, tier_gdf=tier_gdf)]
+
+    overlay_gdf = intersecting_rows(layer_gdf, shapefile_gdf, tier_gdf) if tier_gdf is not None else None
+    if overlay_gdf is None:
+        shapefile_geometry = make_valid(shapefile_gdf.geometry)
+        idx_layer, idx_shapefile = intersecting_pairs(layer_gdf, shapefile_geometry)
+        overlay_gdf = layer_gdf.iloc[idx_layer].reset_index(drop=True)
+        geometry = shapely.intersection(layer_geometry(layer_gdf, idx_layer), shapefile_geometry[idx_shapefile])
+        overlay_gdf[overlay_gdf.geometry.name] = gpd.GeoSeries(geometry, index=overlay_gdf.index, crs=layer_gdf.crs)
+
+    return overlay_gdf
@@ -0,0 +1,324 @@
+from django.conf import settings
+from django.db import connections
+
+import pytz
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from sqs.utils.loader_utils import DbLayerProvider, get_system_memory_stats
+from sqs.utils.geoquery_utils import DisturbanceLayerQueryHelper, attribute_result
+from sqs.pool_worker import init_worker
+
+import logging
+logger = logging.getLogger(__name__)
+
+# approx. memory of a decoded layer gdf, per vertex (coordinates, GEOS geometry objects and attribute columns)
+BYTES_PER_VERTEX = 64
+
+# pool workers start from a fresh interpreter (see sqs.pool_worker) - no copy of the parent's DB connections or state
+POOL_START_METHOD = 'spawn'
+
+
+def chunk_stats_delta(layer_provider, chunk_stats_before):
+    ''' layer reads (DbLayerProvider.chunk_stats) of a single work unit - the layer provider is shared by the units of a layer '''
+    return {stat: layer_provider.chunk_stats[stat] - chunk_stats_before[stat] for stat in chunk_stats_before}
+
+
+def pool_worker_settings():
+    '''
+    Settings of the parent process applied in the pool workers (see sqs.pool_worker.init_worker()) - the scalar settings
+    (feature flags, sizes, paths), including overridden settings, and the database names.
+
+    Returns: worker_settings, database_names
+    '''
+    worker_settings = {}
+    for name in dir(settings):
+        value = getattr(settings, name)
+        if name.isupper() and isinstance(value, (bool, int, float, str, type(None))):
+            worker_settings[name] = value
+
+    database_names = {alias: connections[alias].settings_dict['NAME'] for alias in settings.DATABASES}
+    return worker_settings, database_names
+
+
+def execute_layer_units(proposal_geojson, proposal, units):
+    '''
+    Process pool worker - runs the overlays for the work units of a single layer, using a DisturbanceLayerQueryHelper
+    for the request proposal. units are the worker units (see QueryPlanner.worker_unit()).
+
+    Returns: [(unit idx, overlay_gdf, actual_cost, status, chunk_stats)]
+    '''
+    lq_helper = DisturbanceLayerQueryHelper([], proposal_geojson, proposal)
+    results = []
+    layer_provider = None
+    for unit in units:
+        start_time = time.time()
+        if layer_provider is None:
+            layer_provider = DbLayerProvider(unit['layer_name'], url=unit['layer']['layer']['layer_url'])
+        chunk_stats_before = dict(layer_provider.chunk_stats)
+        try:
+            layer_info, overlay_gdf = lq_helper.get_layer_overlay_gdf(unit['layer'], layer_provider, unit['layer_info'], unit['columns'])
+            overlay_gdf = attribute_result(overlay_gdf)
+            status = 'done'
+        except Exception as e:
+            overlay_gdf = None
+            status = 'error'
+            logger.error(f'Query planner: error executing work unit {unit["layer_name"]}, how {unit["how"]}\n{str(e)}')
+
+        results.append((unit['idx'], overlay_gdf, round(time.time() - start_time, 3), status, chunk_stats_delta(layer_provider, chunk_stats_before)))
+
+    return results
+
+
+class QueryPlanner():
+    '''
+    Up-front planning stage for the DAS masterlist_questions payload. Runs before the proposal schema walk
+    (DisturbancePrefillData), so that all layer I/O is done in one place, once per work unit.
+
+        1. plan()    -- scans masterlist_questions for the distinct work units, ie. the overlay memo keys
+                        (layer name/version, buffer, how, columns), and estimates the cost of each (layer vertices read)
+        2. execute() -- runs the overlay for each work unit, in cost order (concurrently for different layers, in a process
+                        pool, if settings.LAYER_PROCESS_POOL_SIZE > 1), and stores the result in the request overlay memo
+                        (DisturbanceLayerQueryHelper.overlay_memo). find_radiobutton/find_checkbox/find_select/find_multiselect/
+                        find_other then only run the DefaultOperator step for each question.
+
+    NOTE: all questions in masterlist_questions are planned, including those the schema walk never reaches (unanswered
+          conditions branches, radiobutton/select options after the first one found - settings.USE_LAZY_EVALUATION).
+          Off by default (settings.USE_QUERY_PLANNER) - it trades more layer I/O and a larger overlay memo for running
+          the layer work concurrently.
+
+    Work units are ordered by layer (all units for a layer run together, so the layer is decoded once and then served
+    from the layer cache), the most expensive layer first - the peak memory use is reached while the process is fresh.
+
+    Usage:
+        from sqs.utils.query_planner import QueryPlanner
+
+        planner = QueryPlanner(dlq.lq_helper)
+        planner.plan()
+        planner.execute()
+        planner.summary()
+    '''
+
+    def __init__(self, lq_helper):
+        self.lq_helper = lq_helper
+        self.units = []
+
+    def plan(self):
+        ''' Returns the list of work units (dict), in execution order '''
+        today = datetime.now(pytz.timezone(settings.TIME_ZONE))
+        units = {}
+        layer_providers = {}
+
+        for question_group in self.lq_helper.masterlist_questions:
+            for cddp_question in question_group.get('questions', []):
+                for layer in cddp_question.get('layers', []):
+                    try:
+                        if self.lq_helper.is_layer_expired(layer, today):
+                            continue
+
+                        layer_name = layer['layer']['layer_name']
+                        if layer_name not in layer_providers:
+                            layer_providers[layer_name] = DbLayerProvider(layer_name, url=layer['layer']['layer_url'])
+                        layer_provider = layer_providers[layer_name]
+
+                        layer_info = layer_provider.get_layer_info()
+                        if self.lq_helper.get_prior_result(cddp_question, layer, layer_info) is not None:
+                            # reused from the prior request (see DisturbanceLayerQueryHelper.set_prior_results())
+                            continue
+                        if self.lq_helper.get_cached_result(layer, layer_info) is not None:
+                            # result in the spatial result cache (see SpatialResultCache)
+                            continue
+
+                        columns = self.lq_helper.get_layer_columns(layer)
+                        key = self.lq_helper.get_overlay_memo_key(layer, layer_info, layer['how'], layer['column_name'], columns)
+                        if key in units:
+                            units[key]['questions'] += 1
+                            continue
+
+                        units[key] = dict(
+                            key=key,
+                            layer=layer,
+                            layer_provider=layer_provider,
+                            layer_info=layer_info,
+                            columns=columns,
+                            layer_name=layer_name,
+                            layer_version=layer_info['layer_version'],
+                            how=layer['how'],
+                            buffer=key[2],
+                            estimated_cost=self.estimate_cost(layer, layer_provider, layer_info),
+                            actual_cost=None,
+                            chunk_stats=None,
+                            questions=1,
+                            status='planned',
+                        )
+
+                    except Exception as e:
+                        # not planned - the question layer is processed (and the error reported) by spatial_join_gbq()
+                        logger.warning(f'Query planner: layer not planned {layer.get("layer")}\n{str(e)}')
+
+        layer_costs = {}
+        for unit in units.values():
+            layer_costs[unit['layer_name']] = layer_costs.get(unit['layer_name'], 0) + unit['estimated_cost']
+
+        self.units = sorted(units.values(), key=lambda unit: (-layer_costs[unit['layer_name']], unit['layer_name'], -unit['estimated_cost']))
+        logger.info(f'Query plan: {len(self.units)} work units, {len(layer_costs)} layers')
+        for unit in self.units:
+            logger.info(self.unit_summary(unit))
+
+        return self.units
+
+    def estimate_cost(self, layer, layer_provider, layer_info):
+        '''
+        Estimated cost of the work unit, in layer vertices read. 'Outside' reads all split files, 'Overlapping' and 'Inside'
+        only the split files that can intersect the proposal (see DisturbanceLayerQueryHelper.get_query_gdf()). Nothing is 
+        read for 'Overlapping' and 'Inside' if the proposal cannot intersect the layer extent.
+        '''
+        try:
+            # checked for all units (memoised) - also reported in the question metrics for units run in a pool worker
+            if self.lq_helper.is_layer_disjoint(layer, layer_provider, layer_info) and layer['how'] != 'Outside':
+                return 0
+
+            shapefile_gdf = self.lq_helper.get_shapefile_gdf(layer, layer_info['layer_crs'])
+            query_gdf = self.lq_helper.get_query_gdf(shapefile_gdf, layer['how'])
+            return layer_provider.get_layer_obj().estimate_read_cost(query_gdf)
+        except Exception as e:
+            logger.warning(f'Query planner: cost not estimated {layer_info["layer_name"]}\n{str(e)}')
+        return 0
+
+    def execute(self):
+        '''
+        Runs the overlay for each work unit, and stores the results in the request overlay memo. Work units for different
+        layers run concurrently in a process pool if settings.LAYER_PROCESS_POOL_SIZE > 1.
+        '''
+        units = []
+        layer_groups = {}
+        for idx, unit in enumerate(self.units):
+            if unit['key'] in self.lq_helper.overlay_memo:
+                unit['status'] = 'memo'
+            else:
+                units.append(unit)
+                layer_groups.setdefault(unit['layer_name'], []).append(idx)
+
+        if settings.LAYER_PROCESS_POOL_SIZE > 1 and len(layer_groups) > 1:
+            self.execute_pool(list(layer_groups.values()), settings.LAYER_PROCESS_POOL_SIZE)
+        else:
+            for unit in units:
+                self.execute_unit(unit)
+
+        return self.summary()
+
+    def execute_unit(self, unit):
+        start_time = time.time()
+        chunk_stats_before = dict(unit['layer_provider'].chunk_stats)
+        try:
+            layer_info, overlay_gdf = self.lq_helper.get_layer_overlay_gdf(
+                unit['layer'], unit['layer_provider'], unit['layer_info'], unit['columns']
+            )
+            status = 'done'
+        except Exception as e:
+            # no memo entry - spatial_join_gbq() runs (and reports) the overlay for the question
+            overlay_gdf = None
+            status = 'error'
+            logger.error(f'Query planner: error executing work unit {unit["layer_name"]}, how {unit["how"]}\n{str(e)}')
+
+        self.set_result(unit, overlay_gdf, status, round(time.time() - start_time, 3), chunk_stats_delta(unit['layer_provider'], chunk_stats_before))
+
+    def set_result(self, unit, overlay_gdf, status, actual_cost, chunk_stats):
+        unit['status'] = status
+        unit['actual_cost'] = actual_cost
+        unit['chunk_stats'] = chunk_stats
+        if status == 'error':
+            self.lq_helper.planner_stats['errors'] += 1
+        elif status == 'done':
+            self.lq_helper.set_overlay_memo(unit['key'], overlay_gdf)
+            self.lq_helper.planner_stats['executed'] += 1
+            # layer reads reported in the metrics of the first question using the result (see DisturbanceLayerQueryHelper.set_metrics())
+            self.lq_helper.planner_chunk_stats[unit['key']] = chunk_stats
+        logger.info(self.unit_summary(unit))
+
+    def estimated_memory(self, unit_idxs):
+        ''' estimated memory (MB) to decode the layer of the work units '''
+        return max(self.units[idx]['estimated_cost'] for idx in unit_idxs) * BYTES_PER_VERTEX / 1024**2
+
+    def worker_unit(self, idx):
+        ''' work unit sent to a pool worker - without the (parent process) layer provider '''
+        unit = self.units[idx]
+        return dict(
+            idx=idx, layer=unit['layer'], layer_info=unit['layer_info'], columns=unit['columns'], layer_name=unit['layer_name'], 
+            how=unit['how']
+        )
+
+    def execute_pool(self, layer_groups, pool_size):
+        '''
+        Runs the work units in a process pool - one task per layer, so each layer is decoded once, in one worker. The 
+        workers are spawned (POOL_START_METHOD) and set up Django and their own DB connections (sqs.pool_worker), the 
+        parent process connections are left open. Each task is sent the proposal and its work units.
+
+        Admission is memory-aware - a layer task is only submitted while the available system memory, less the estimated 
+        memory of the running tasks and of the new task, stays above settings.LAYER_PROCESS_POOL_MIN_FREE_MEM (MB). 
+        Otherwise it waits for a running task to complete. A task is always submitted if none are running.
+        '''
+        pending = list(layer_groups)
+        running = {}
+        with ProcessPoolExecutor(
+            max_workers=pool_size, mp_context=multiprocessing.get_context(POOL_START_METHOD), initializer=init_worker, 
+            initargs=pool_worker_settings()
+        ) as executor:
+            while pending or running:
+                while pending and len(running) < pool_size:
+                    reserved_mem = sum(self.estimated_memory(unit_idxs) for unit_idxs in running.values())
+                    required_mem = self.estimated_memory(pending[0])
+                    avail_mem = get_system_memory_stats()['avail_mem']
+                    if running and avail_mem - reserved_mem - required_mem < settings.LAYER_PROCESS_POOL_MIN_FREE_MEM:
+                        logger.info(
+                            f'Query planner: waiting for memory - available {avail_mem:,} MB, reserved {int(reserved_mem):,} MB, '
+                            f'required {int(required_mem):,} MB'
+                        )
+                        break
+
+                    unit_idxs = pending.pop(0)
+                    units = [self.worker_unit(idx) for idx in unit_idxs]
+                    future = executor.submit(execute_layer_units, self.lq_helper.proposal_geojson, self.lq_helper.proposal, units)
+                    running[future] = unit_idxs
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit_idxs = running.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # worker failed (eg. killed) - run the layer work units serially
+                        logger.error(f'Query planner: process pool task failed, running serially\n{str(e)}')
+                        for idx in unit_idxs:
+                            self.execute_unit(self.units[idx])
+                        continue
+
+                    for idx, overlay_gdf, actual_cost, status, chunk_stats in results:
+                        self.set_result(self.units[idx], overlay_gdf, status, actual_cost, chunk_stats)
+
+    def unit_summary(self, unit):
+        return (
+            f'Query plan unit: {unit["layer_name"]} (version {unit["layer_version"]}), how {unit["how"]}, buffer {unit["buffer"]}, '
+            f'questions {unit["questions"]}, estimated cost {unit["estimated_cost"]:,} vertices, actual cost {unit["actual_cost"]}s, '
+            f'status {unit["status"]}'
+        )
+
+    def summary(self):
+        ''' Inspectable plan - list of work units with their estimated (vertices) and actual (secs) costs '''
+        return [
+            dict(
+                layer_name=unit['layer_name'],
+                layer_version=unit['layer_version'],
+                how=unit['how'],
+                buffer=unit['buffer'],
+                columns=unit['columns'],
+                questions=unit['questions'],
+                estimated_cost=unit['estimated_cost'],
+                actual_cost=unit['actual_cost'],
+                chunk_stats=unit['chunk_stats'],
+                status=unit['status'],
+            )
+            for unit in self.units
+        ]
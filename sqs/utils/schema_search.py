@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from functools import cached_property
 import json
 
 import logging
@@ -7,9 +8,35 @@ logger = logging.getLogger(__name__)
 
 
 class SchemaSearch():
+    '''
+    Search of the (flattened) proposal data. The data is flattened once, on first search, and indexed by the case-folded 
+    flattened key and key path components - search() and search_data() are dictionary lookups.
+    '''
     def __init__(self, dictionary):
         self.dictionary = dictionary
 
+    @cached_property
+    def flat_items(self):
+        ''' [(flattened key, value)] of the proposal data, in _flatten() order '''
+        return list(self._flatten(self.dictionary).items())
+
+    @cached_property
+    def key_index(self):
+        ''' case-folded flattened key --> positions in flat_items '''
+        index = {}
+        for pos, (k, v) in enumerate(self.flat_items):
+            index.setdefault(k.casefold(), []).append(pos)
+        return index
+
+    @cached_property
+    def component_index(self):
+        ''' case-folded key path component --> positions in flat_items of the flattened keys with that component '''
+        index = {}
+        for pos, (k, v) in enumerate(self.flat_items):
+            for component in dict.fromkeys(x.casefold() for x in k.split('.')):
+                index.setdefault(component, []).append(pos)
+        return index
+
     def search(self, search_list):
         """
         Search proposal schema for flattened key and corresponding value given flattened_key 
@@ -24,14 +51,8 @@ class SchemaSearch():
             -->{'1ProposalSummary1.Section1-0': 'JM Test'}
         """
 
-        result = {}
-        flat_dict = self._flatten(self.dictionary)
-        for k, v in flat_dict.items():
-            for search_item in search_list:
-                if k.lower()==search_item.lower():
-                    result.update( {k: v} )
-
-        return result
+        positions = sorted({pos for search_item in search_list for pos in self.key_index.get(search_item.casefold(), [])})
+        return dict(self.flat_items[pos] for pos in positions)
 
     def search_data(self, search_str, checkbox=False):
         """
@@ -46,20 +67,19 @@ class SchemaSearch():
             search_schema.search_data('Section1-0')
             --> 'Test Response'
         """
+        try:
+            positions = self.component_index.get(search_str.casefold(), [])
+        except:
+            positions = []
+
         res = {}
-        flat_dict = self._flatten(self.dictionary)
-        for k, v in flat_dict.items():
-            try:
-                if search_str.lower() in k.lower():
-                    key_list = k.split('.')
-                    key = key_list[-1]
-                    if search_str.lower() in [x.lower() for x in key_list]:
-                        if checkbox:
-                            res[key] = v.strip() if isinstance(v, str) else v
-                        else:
-                            return v.strip() if isinstance(v, str) else v
-            except:
-                pass
+        for pos in positions:
+            k, v = self.flat_items[pos]
+            key = k.split('.')[-1]
+            if checkbox:
+                res[key] = v.strip() if isinstance(v, str) else v
+            else:
+                return v.strip() if isinstance(v, str) else v
 
         return res if res else None
 
@@ -81,8 +101,7 @@ class SchemaSearch():
                      'Section12-0-Yes1': 'twooption'}
         """
         result = {}
-        flat_dict = self._flatten(self.dictionary)
-        for k, v in flat_dict.items():
+        for k, v in self.flat_items:
             key = k.split('.')[-1]
             result.update( {key: v} )
 
@@ -0,0 +1,53 @@
+from django.test import TestCase
+import geopandas as gpd
+import shapely
+
+from sqs.utils.helper import DefaultOperator
+
+import logging
+logger = logging.getLogger(__name__)
+logging.disable(logging.CRITICAL)
+
+VALUES = ['Kimberley', 'Swan', 'swan ', None, 'Pilbara', 'Swan', '10', 'T', 5, 2.5, '  ']
+
+
+class DefaultOperatorTests(TestCase):
+    '''
+    Vectorised comparison operators - row order, repeated matches and '!' negation
+
+    To run:
+        ./manage.py test tests.test_default_operator.DefaultOperatorTests
+    '''
+
+    @classmethod
+    def setUpClass(self):
+        super().setUpClass()
+        self.gdf = gpd.GeoDataFrame({'region': VALUES}, geometry=[shapely.Point(0, 0)] * len(VALUES), crs='EPSG:4283')
+
+    def row_filter(self, operator, value, gdf=None):
+        layer = dict(column_name='region', operator=operator, value=value, layer=dict(layer_name='cddp:dpaw_regions'))
+        return DefaultOperator(layer, self.gdf if gdf is None else gdf, 'checkbox').row_filter
+
+    def test_text_operators(self):
+        self.assertEqual(self.row_filter('Equals', 'SWAN'), [1, 2, 5])
+        self.assertEqual(self.row_filter('Contains', 'wa'), [1, 2, 5])
+        self.assertEqual(self.row_filter('Contains', '!wa'), [0, 3, 4, 6, 7, 8, 9, 10])
+        self.assertEqual(self.row_filter('Like', 'k*'), [0])
+        self.assertEqual(self.row_filter('OR', 'kimberley|Pilbara'), [0, 4])
+        self.assertEqual(self.row_filter('OR', '!kimberley|Pilbara'), [1, 2, 3, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(self.row_filter('IsNotNull', ''), list(range(10)))
+
+    def test_numeric_operators(self):
+        ''' non-numeric values (eg. 'T') never match, and do not fail the comparison '''
+        self.assertEqual(self.row_filter('GreaterThan', '4'), [6, 8])
+        self.assertEqual(self.row_filter('LessThan', '4'), [9])
+        self.assertEqual(self.row_filter('Equals', '10'), [6])
+        self.assertEqual(self.row_filter('Equals', '5.0'), [8])
+
+    def test_categorical_column(self):
+        ''' same row filter for the categorical (dictionary-encoded) column '''
+        cat_gdf = self.gdf.copy()
+        cat_gdf['region'] = cat_gdf['region'].astype(str).where(cat_gdf['region'].notna(), None).astype('category')
+        for operator, value in [('Equals', 'swan'), ('Contains', '!wa'), ('OR', 'kimberley|pilbara'), ('IsNotNull', ''), ('GreaterThan', '4')]:
+            with self.subTest(operator=operator, value=value):
+                self.assertEqual(self.row_filter(operator, value, cat_gdf), self.row_filter(operator, value))
@@ -0,0 +1,115 @@
+from django.test import TestCase, override_settings
+import geopandas as gpd
+import importlib
+import pkgutil
+
+from sqs.utils.geoquery_utils import DisturbanceLayerQueryHelper
+from sqs.utils import das_tests
+
+import logging
+logger = logging.getLogger(__name__)
+logging.disable(logging.CRITICAL)
+
+LAYERS = {
+    'sqs/utils/das_tests/layers/cddp_dpaw_regions.json': 'region',
+    'sqs/utils/das_tests/layers/cddp_local_gov_authority.json': 'lga_label',
+}
+
+
+def das_test_geojsons():
+    ''' proposal GEOJSON of all das_tests fixture modules '''
+    geojsons = {}
+    for module_info in pkgutil.walk_packages(das_tests.__path__, prefix=f'{das_tests.__name__}.'):
+        module = importlib.import_module(module_info.name)
+        if hasattr(module, 'GEOJSON'):
+            geojsons[module_info.name] = module.GEOJSON
+    return geojsons
+
+
+class PredicateEngineParityTests(TestCase):
+    '''
+    Parity of settings.LAYER_OVERLAY_ENGINE='sindex' with 'overlay', over the das_tests fixture proposals and layers
+
+    To run:
+        ./manage.py test tests.test_predicate_engine.PredicateEngineParityTests
+    '''
+
+    @classmethod
+    def setUpClass(self):
+        super().setUpClass()
+        self.layer_gdfs = {filename: gpd.read_file(filename) for filename in LAYERS}
+        self.geojsons = das_test_geojsons()
+
+    def overlay_gdf(self, engine, geojson, layer_gdf, how, column_name):
+        with override_settings(LAYER_OVERLAY_ENGINE=engine):
+            helper = DisturbanceLayerQueryHelper([], geojson, {'id': 0})
+            shapefile_gdf = helper.get_shapefile_gdf(dict(buffer=None), layer_gdf.crs.srs)
+            return helper.get_overlay_gdf(layer_gdf, shapefile_gdf, how, column_name)
+
+    def assert_parity(self, how):
+        self.assertTrue(len(self.geojsons) > 0)
+        for module_name, geojson in self.geojsons.items():
+            for filename, column_name in LAYERS.items():
+                layer_gdf = self.layer_gdfs[filename]
+                columns = list(layer_gdf.columns.drop('geometry'))
+                overlay_gdf = self.overlay_gdf('overlay', geojson, layer_gdf, how, column_name)
+                sindex_gdf = self.overlay_gdf('sindex', geojson, layer_gdf, how, column_name)
+
+                with self.subTest(fixture=module_name, layer=filename, how=how):
+                    self.assertTrue(
+                        overlay_gdf[columns].reset_index(drop=True).equals(sindex_gdf[columns].reset_index(drop=True))
+                    )
+                    self.assertTrue(
+                        overlay_gdf.geometry.reset_index(drop=True).geom_equals(sindex_gdf.geometry.reset_index(drop=True)).all()
+                    )
+
+    def test_overlapping_parity(self):
+        ''' Overlapping - same layer rows, in the same order, and intersection geometries as the intersection overlay '''
+        self.assert_parity('Overlapping')
+
+    def test_outside_parity(self):
+        ''' Outside - same layer rows and geometries as the intersection overlay '''
+        self.assert_parity('Outside')
+
+    def test_inside_parity(self):
+        ''' Inside - same layer rows and geometries as the difference overlay '''
+        self.assert_parity('Inside')
+
+
+class AttributeOnlyResultTests(TestCase):
+    '''
+    settings.USE_LAYER_ATTRIBUTE_ONLY - 'Outside'/'Inside' results without geometry, same attribute rows
+
+    To run:
+        ./manage.py test tests.test_predicate_engine.AttributeOnlyResultTests
+    '''
+
+    @classmethod
+    def setUpClass(self):
+        super().setUpClass()
+        self.filename = 'sqs/utils/das_tests/layers/cddp_dpaw_regions.json'
+        self.layer_gdf = gpd.read_file(self.filename)
+        self.geojson = next(iter(das_test_geojsons().values()))
+
+    def overlay_gdf(self, engine, attribute_only, how):
+        with override_settings(LAYER_OVERLAY_ENGINE=engine, USE_LAYER_ATTRIBUTE_ONLY=attribute_only):
+            helper = DisturbanceLayerQueryHelper([], self.geojson, {'id': 0})
+            shapefile_gdf = helper.get_shapefile_gdf(dict(buffer=None), self.layer_gdf.crs.srs)
+            return helper.get_overlay_gdf(self.layer_gdf, shapefile_gdf, how, 'region', split_file='cddp_dpaw_regions.json')
+
+    def test_attribute_only(self):
+        columns = list(self.layer_gdf.columns.drop('geometry'))
+        for engine in ['sindex', 'overlay']:
+            for how in ['Outside', 'Inside']:
+                with self.subTest(engine=engine, how=how):
+                    overlay_gdf = self.overlay_gdf(engine, False, how)
+                    attr_df = self.overlay_gdf(engine, True, how)
+
+                    self.assertNotIn('geometry', attr_df.columns)
+                    self.assertEqual(list(attr_df.index.names), ['split_file', 'feature_idx'])
+                    self.assertEqual(attr_df.index.get_level_values('feature_idx').tolist(), overlay_gdf.index.tolist())
+                    self.assertTrue(attr_df[columns].reset_index(drop=True).equals(overlay_gdf[columns].reset_index(drop=True)))
+
+    def test_overlapping_geometry(self):
+        ''' 'Overlapping' results keep the geometry column '''
+        self.assertIn('geometry', self.overlay_gdf('sindex', True, 'Overlapping').columns)
@@ -0,0 +1,140 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+
+from sqs.utils.das_schema_utils import DisturbanceLayerQuery
+from sqs.utils.loader_utils import DbLayerProvider
+from sqs.utils.layer_cache import layer_cache
+from sqs.utils.das_tests.equals import checkbox_equals as cb
+
+import logging
+logger = logging.getLogger(__name__)
+logging.disable(logging.CRITICAL)
+
+
+@override_settings(USE_QUERY_PLANNER=True)
+class QueryPlannerTests(TestCase):
+    '''
+    To run:
+        ./manage.py test tests.test_query_planner.QueryPlannerTests
+    '''
+
+    @classmethod
+    def setUpClass(self):
+        super().setUpClass()
+        cache.clear()
+
+        url='https://kmi.dbca.wa.gov.au/geoserver/dummy'
+        DbLayerProvider(layer_name='cddp:local_gov_authority', url=url).get_layer_from_file('sqs/utils/das_tests/layers/cddp_local_gov_authority.json')
+        DbLayerProvider(layer_name='cddp:dpaw_regions', url=url).get_layer_from_file('sqs/utils/das_tests/layers/cddp_dpaw_regions.json')
+
+    @classmethod
+    def tearDownClass(self):
+        cache.clear()
+        super().tearDownClass()
+
+    def test_plan_distinct_units(self):
+        ''' one work unit per distinct (layer, buffer, how, columns), all executed before the schema walk '''
+        dlq = DisturbanceLayerQuery(cb.MASTERLIST_QUESTIONS_GBQ, cb.GEOJSON, cb.PROPOSAL)
+        units = dlq.query_planner.plan()
+        keys = [unit['key'] for unit in units]
+        layer_entries = sum(len(q['layers']) for group in cb.MASTERLIST_QUESTIONS_GBQ for q in group['questions'])
+
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertTrue(0 < len(units) <= layer_entries)
+
+        summary = dlq.query_planner.execute()
+        self.assertTrue(all(unit['status'] == 'done' and unit['actual_cost'] is not None for unit in summary))
+        self.assertEqual(set(dlq.lq_helper.overlay_memo), set(keys))
+
+    def test_planned_query_response(self):
+        ''' response with the query planner matches the response without it '''
+        with override_settings(USE_QUERY_PLANNER=False):
+            res = DisturbanceLayerQuery(cb.MASTERLIST_QUESTIONS_GBQ, cb.GEOJSON, cb.PROPOSAL).query()
+
+        dlq = DisturbanceLayerQuery(cb.MASTERLIST_QUESTIONS_GBQ, cb.GEOJSON, cb.PROPOSAL)
+        planned_res = dlq.query()
+        self.assertEqual(planned_res['data'], res['data'])
+        self.assertEqual(dlq.lq_helper.planner_stats['executed'], len(dlq.query_planner.units))
+        # planned overlays are not overlay memo misses
+        self.assertEqual(dlq.lq_helper.overlay_memo_stats['misses'], 0)
+
+        # layer reads of the work units reported in the question metrics (units not used by a question are left in planner_chunk_stats)
+        chunks_read = sum(unit['chunk_stats']['chunks_read'] for unit in dlq.query_planner.units)
+        self.assertTrue(chunks_read > 0)
+        self.assertEqual(
+            sum(metric['chunks_read'] for metric in dlq.lq_helper.metrics) + sum(i['chunks_read'] for i in dlq.lq_helper.planner_chunk_stats.values()),
+            chunks_read
+        )
+
+    def test_lazy_evaluation_response(self):
+        ''' response with lazy radiobutton/select evaluation matches the eager evaluation of all questions '''
+        with override_settings(USE_LAZY_EVALUATION=False):
+            dlq = DisturbanceLayerQuery(cb.MASTERLIST_QUESTIONS_GBQ, cb.GEOJSON, cb.PROPOSAL)
+            res = dlq.query()
+            evaluated = dlq.lq_helper.lazy_stats['evaluated']
+
+        dlq = DisturbanceLayerQuery(cb.MASTERLIST_QUESTIONS_GBQ, cb.GEOJSON, cb.PROPOSAL)
+        lazy_res = dlq.query()
+        self.assertEqual(lazy_res['data'], res['data'])
+        self.assertTrue(dlq.lq_helper.lazy_stats['evaluated'] <= evaluated)
+
+    def test_lazy_evaluation_skipped(self):
+        ''' questions evaluated in option order, remaining (question, layer) pairs counted as skipped once the generator is closed '''
+        layer = dict(layer=dict(layer_name='cddp:dpaw_regions', layer_url=''), expiry='2000-01-01')
+        masterlist_questions = [
+            dict(
+                question_group='1.0 Region?',
+                questions=[
+                    dict(masterlist_question=dict(question='1.0 Region?'), answer_mlq=answer, other_data={}, layers=[layer])
+                    for answer in ['Kimberley', 'Pilbara', 'Swan']
+                ]
+            )
+        ]
+        dlq = DisturbanceLayerQuery(masterlist_questions, cb.GEOJSON, cb.PROPOSAL)
+
+        question_iter = dlq.lq_helper.spatial_join_gbq_iter('1.0 Region?', 'radiobuttons', answers=['swan', 'kimberley'])
+        self.assertEqual(next(question_iter)['answer'], 'Swan')
+        question_iter.close()
+        self.assertEqual(dlq.lq_helper.lazy_stats, dict(evaluated=1, skipped=2))
+
+
+@override_settings(USE_QUERY_PLANNER=True)
+class QueryPlannerPoolTests(TransactionTestCase):
+    '''
+    Process pool workers (settings.LAYER_PROCESS_POOL_SIZE) - TransactionTestCase, the layers loaded by the test must be
+    committed to be read by the workers (own DB connections)
+
+    To run:
+        ./manage.py test tests.test_query_planner.QueryPlannerPoolTests
+    '''
+
+    def setUp(self):
+        cache.clear()
+        url='https://kmi.dbca.wa.gov.au/geoserver/dummy'
+        DbLayerProvider(layer_name='cddp:local_gov_authority', url=url).get_layer_from_file('sqs/utils/das_tests/layers/cddp_local_gov_authority.json')
+        DbLayerProvider(layer_name='cddp:dpaw_regions', url=url).get_layer_from_file('sqs/utils/das_tests/layers/cddp_dpaw_regions.json')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_process_pool_response(self):
+        ''' response and metrics with the layer work units run in a process pool match serial mode '''
+        def query():
+            # cold layer cache for both modes - the layer reads are part of the metrics
+            layer_cache.clear()
+            dlq = DisturbanceLayerQuery(cb.MASTERLIST_QUESTIONS_GBQ, cb.GEOJSON, cb.PROPOSAL)
+            res = dlq.query()
+            metrics = [{k: v for k, v in metric.items() if k not in ['time', 'time_retrieve_layer']} for metric in dlq.lq_helper.metrics]
+            return res['data'], metrics, dlq.lq_helper.planner_stats
+
+        with override_settings(LAYER_PROCESS_POOL_SIZE=0):
+            serial_data, serial_metrics, serial_stats = query()
+
+        with override_settings(LAYER_PROCESS_POOL_SIZE=2):
+            pool_data, pool_metrics, pool_stats = query()
+
+        self.assertEqual(pool_data, serial_data)
+        self.assertEqual(pool_metrics, serial_metrics)
+        # work units run in the workers, without errors
+        self.assertEqual(pool_stats, serial_stats)
+        self.assertEqual(pool_stats['errors'], 0)
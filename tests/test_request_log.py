@@ -1,11 +1,14 @@
 from django.test import TestCase
 #import unittest
 from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from unittest import mock
 import requests
 
 from sqs.utils.das_schema_utils import DisturbanceLayerQuery, DisturbancePrefillData
 from sqs.utils.loader_utils import DbLayerProvider
 from sqs.components.gisquery.models import LayerRequestLog
+from sqs.components.gisquery.utils import RequestCacheStream
 #from tests.no_createdb_test_runner import NoCreateDbTestRunner
 
 from sqs.utils.das_tests.request_log.das_query import DAS_QUERY_JSON
@@ -92,3 +95,77 @@ class SetupRequestLogTests(TestCase):
         self.assertTrue(history['num_layers_in_request'] == 1)
 
 
+
+    def test_query_stream(self):
+        ''' tests the streamed query records (DisturbanceLayerQuery.query_stream()) against the query() response '''
+        logger.info("Method: test_query_stream.")
+        res = DisturbanceLayerQuery(self.masterlist_questions, self.geojson, self.proposal).query()
+
+        self.dlq = DisturbanceLayerQuery(self.masterlist_questions, self.geojson, self.proposal)
+        records = list(self.dlq.query_stream(use_planner=False))
+
+        data = {}
+        for record in records:
+            if record['record'] == 'question_group':
+                data.update(record['data'])
+        layer_results = [record for record in records if record['record'] == 'layer_result']
+
+        self.assertEqual([data], res['data'])
+        self.assertEqual(len(layer_results), len(res['layer_data']))
+        self.assertEqual(self.dlq.response['data'], res['data'])
+        self.assertFalse(any(record['record'] == 'query_plan' for record in records))
+        self.assertEqual(self.dlq.errors, [])
+
+    def test_query_stream_errors(self):
+        ''' error stopping the schema walk recorded in DisturbanceLayerQuery.errors - the streamed response ends with an error record '''
+        logger.info("Method: test_query_stream_errors.")
+        dlq = DisturbanceLayerQuery(self.masterlist_questions, self.geojson, self.proposal)
+        with mock.patch.object(dlq.prefill_obj, 'prefill_items', side_effect=Exception('schema walk error')):
+            records = list(dlq.query_stream(use_planner=False))
+
+        self.assertEqual(records, [])
+        self.assertEqual(dlq.errors, ['schema walk error'])
+        self.assertIsNotNone(dlq.response)
+
+
+class PriorSpatialResultsTests(TestCase):
+    '''
+    To run:
+        ./manage.py test tests.test_request_log.PriorSpatialResultsTests
+    '''
+
+    def create_log(self, request_type, results):
+        request_log = LayerRequestLog.create_log(DAS_QUERY_JSON, request_type)
+        request_log.spatial_results = [dict(key=[question, '', '{}'], res=res) for question, res in results]
+        request_log.save()
+        return request_log
+
+    def test_prior_spatial_results(self):
+        ''' latest result per (question, layer), merged back to the latest FULL request '''
+        self.create_log('FULL', [('Q3', 'full_old')])
+        self.create_log('FULL', [('Q1', 'full'), ('Q2', 'full')])
+        self.create_log('REFRESH_SINGLE', [('Q1', 'refresh')])
+        request_log = self.create_log('REFRESH_SINGLE', [])
+
+        results = {result['key'][0]: result['res'] for result in request_log.prior_spatial_results()}
+        self.assertEqual(results, dict(Q1='refresh', Q2='full'))
+        self.assertNotIn('spatial_results', request_log.response)
+
+
+class RequestCacheStreamTests(TestCase):
+    '''
+    To run:
+        ./manage.py test tests.test_request_log.RequestCacheStreamTests
+    '''
+
+    def test_close_before_first_record(self):
+        ''' request cache key deleted when the streamed response is closed before the first record is sent (client disconnect) '''
+        cache_key = 'DAS_FULL_0'
+        cache.set(cache_key, dict(app_id=0), 60)
+
+        def records():
+            yield 'record\n'
+
+        response = StreamingHttpResponse(RequestCacheStream(records(), cache_key), content_type='application/x-ndjson')
+        response.close()
+        self.assertIsNone(cache.get(cache_key))
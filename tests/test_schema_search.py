@@ -0,0 +1,77 @@
+from django.test import TestCase
+
+from sqs.utils.schema_search import SchemaSearch
+from sqs.utils.das_tests.equals import checkbox_equals as cb
+
+import logging
+logger = logging.getLogger(__name__)
+logging.disable(logging.CRITICAL)
+
+PROPOSAL_DATA = [{
+    'Section1-2': ['Nungarin', 'Beverley'],
+    'Section10-2': ' Pingelly ',
+    'radioSection': [{'Section12-0': 'yes', 'Section12-0-YesGroup': [{'Section12-0-Yes1': 'twooption'}]}],
+    'checkboxSection': [{'Section11-0': [{'Section11-0-1': 'on', 'Section11-0-2': 'on'}]}],
+    'proposalSummarySection': [{'Section0-0': 'nan. GOLDFIELDS', 'section0-0': None}],
+}]
+
+
+def search_data_scan(search_schema, search_str, checkbox=False):
+    ''' reference search_data() - scan of the flattened proposal data '''
+    res = {}
+    for k, v in search_schema._flatten(search_schema.dictionary).items():
+        key_list = k.split('.')
+        if search_str.casefold() in [x.casefold() for x in key_list]:
+            if checkbox:
+                res[key_list[-1]] = v.strip() if isinstance(v, str) else v
+            else:
+                return v.strip() if isinstance(v, str) else v
+    return res if res else None
+
+
+class SchemaSearchTests(TestCase):
+    '''
+    Indexed SchemaSearch - same results as a scan of the flattened proposal data
+
+    To run:
+        ./manage.py test tests.test_schema_search.SchemaSearchTests
+    '''
+
+    def assert_search_data(self, data):
+        search_schema = SchemaSearch(data)
+        names = {k.split('.')[-1] for k in search_schema._flatten(data)} | {'checkboxSection', 'SECTION12-0', 'Section1', 'missing'}
+        for name in names:
+            for checkbox in [False, True]:
+                with self.subTest(name=name, checkbox=checkbox):
+                    self.assertEqual(search_schema.search_data(name, checkbox), search_data_scan(search_schema, name, checkbox))
+
+    def test_search_data(self):
+        self.assert_search_data(PROPOSAL_DATA)
+        self.assert_search_data(cb.TEST_RESPONSE['data'])
+
+    def test_search_data_values(self):
+        search_schema = SchemaSearch(PROPOSAL_DATA)
+        self.assertEqual(search_schema.search_data('section10-2'), 'Pingelly')
+        self.assertEqual(search_schema.search_data('Section1-2'), ['Nungarin', 'Beverley'])
+        self.assertEqual(search_schema.search_data('Section11-0', checkbox=True), {'Section11-0-1': 'on', 'Section11-0-2': 'on'})
+        self.assertIsNone(search_schema.search_data('missing'))
+        self.assertIsNone(search_schema.search_data(None))
+
+    def test_search(self):
+        search_schema = SchemaSearch(PROPOSAL_DATA)
+        self.assertEqual(
+            search_schema.search(['CHECKBOXSECTION.Section11-0.section11-0-1', 'section1-2']),
+            {'Section1-2': ['Nungarin', 'Beverley'], 'checkboxSection.Section11-0.Section11-0-1': 'on'}
+        )
+        self.assertEqual(
+            list(search_schema.search(['proposalSummarySection.Section0-0'])),
+            ['proposalSummarySection.Section0-0', 'proposalSummarySection.section0-0']
+        )
+
+    def test_flattened_once(self):
+        ''' proposal data flattened on the first search only '''
+        search_schema = SchemaSearch(PROPOSAL_DATA)
+        search_schema.search_data('Section1-2')
+        search_schema._flatten = None
+        self.assertEqual(search_schema.search_data('Section12-0'), 'yes')
+        self.assertEqual(search_schema.get_flat_dict()['Section12-0-Yes1'], 'twooption')